@@ -1,4 +1,5 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from .models import (
     Facility,
     User,
@@ -6,8 +7,15 @@ from .models import (
     VaccineMaster,
     Vaccination,
     SMSLog,
+    OutboundMessage,
     FacilityVaccinationDay,
+    Tombstone,
+    VaccinationSummary,
+    Watermark,
+    DataValuePush,
 )
+from .duplicates import find_candidates
+from .search import MAX_RESULTS, normalize_phone, prepare, search_children
 
 
 @admin.register(Facility)
@@ -37,8 +45,46 @@ class UserAdmin(admin.ModelAdmin):
     list_filter = ("role", "facility")
 
 
+class ChildAdminForm(forms.ModelForm):
+    allow_duplicate = forms.BooleanField(
+        required=False,
+        help_text="Save even though the child looks like an existing record",
+    )
+
+    class Meta:
+        model = Child
+        fields = "__all__"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors or cleaned_data.get("allow_duplicate"):
+            return cleaned_data
+        child = Child(
+            pk=self.instance.pk,
+            full_name=cleaned_data["full_name"],
+            caregiver_contact=cleaned_data["caregiver_contact"],
+            date_of_birth=cleaned_data["date_of_birth"],
+        )
+        prepare(child)
+        duplicates = find_candidates(child)
+        if duplicates:
+            raise forms.ValidationError(
+                "Possible duplicate of %(children)s. Check the records or tick "
+                "'Allow duplicate' to save anyway.",
+                params={
+                    "children": ", ".join(
+                        f"{c.uid} ({c.full_name}, born {c.date_of_birth})"
+                        for c in duplicates
+                    )
+                },
+                code="duplicate",
+            )
+        return cleaned_data
+
+
 @admin.register(Child)
 class ChildAdmin(admin.ModelAdmin):
+    form = ChildAdminForm
     list_display = (
         "id",
         "full_name",
@@ -48,13 +94,42 @@ class ChildAdmin(admin.ModelAdmin):
         "caregiver_contact",
         "facility",
     )
-    search_fields = ("full_name", "caregiver_name", "caregiver_contact")
+    search_fields = ("full_name",)
+    search_help_text = (
+        "Child or caregiver name (spelling variants match) or caregiver phone"
+    )
     list_filter = ("sex", "facility")
 
+    def get_search_results(self, request, queryset, search_term):
+        # Index lookups via api.search instead of icontains scans
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if normalize_phone(term) and not any(c.isalpha() for c in term):
+            children = search_children(phone=term, limit=MAX_RESULTS)
+        else:
+            children = search_children(q=term, caregiver=term, limit=MAX_RESULTS)
+        if len(children) == MAX_RESULTS:
+            self.message_user(
+                request,
+                f"Showing the {MAX_RESULTS} best matches only; refine the search "
+                "to find others.",
+                messages.WARNING,
+            )
+        return queryset.filter(pk__in=[c.pk for c in children]), False
+
 
 @admin.register(VaccineMaster)
 class VaccineMasterAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "dose_number", "interval_days", "order")
+    list_display = (
+        "id",
+        "name",
+        "dose_number",
+        "interval_days",
+        "min_interval_days",
+        "grace_days",
+        "order",
+    )
     list_filter = ("name",)
     ordering = ("order",)
 
@@ -79,3 +154,42 @@ class SMSLogAdmin(admin.ModelAdmin):
     list_display = ("id", "child", "message", "status", "sent_at")
     list_filter = ("status", "sent_at")
     search_fields = ("child__full_name", "message")
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ("id", "phone", "status", "attempts", "provider", "created_at")
+    list_filter = ("status", "provider")
+    search_fields = ("phone", "message")
+
+
+@admin.register(VaccinationSummary)
+class VaccinationSummaryAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "facility",
+        "vaccine",
+        "month",
+        "given",
+        "on_time",
+        "missed",
+        "scheduled",
+    )
+    list_filter = ("state", "vaccine", "month")
+
+
+@admin.register(Watermark)
+class WatermarkAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "value")
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ("id", "model", "object_id", "facility_id", "deleted_at")
+    list_filter = ("model",)
+
+
+@admin.register(DataValuePush)
+class DataValuePushAdmin(admin.ModelAdmin):
+    list_display = ("id", "period", "status", "sent", "total", "updated_at")
+    list_filter = ("status",)
@@ -0,0 +1,273 @@
+"""
+Load-test runner for the API.
+
+Scenarios are driven either in-process through Django's test ``Client``
+(no server needed) or over HTTP against a running server, from a pool of
+worker threads. Requests authenticate with a JWT minted for the given
+user, so the server must share this project's ``SECRET_KEY``. Writing
+scenarios change data: run against a disposable database filled with
+``generate_synthetic_data``.
+"""
+import datetime
+import itertools
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.db import connection
+from django.test import Client
+
+
+class InProcessTransport:
+    def __init__(self, token):
+        self.token = token
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = Client()
+        response = client.generic(
+            method,
+            path,
+            json.dumps(body) if body is not None else "",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response.status_code
+
+
+class HTTPTransport:
+    def __init__(self, token, base_url, timeout=60):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, body=None):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(body).encode() if body is not None else None,
+            method=method,
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Content-Type": "application/json",
+            },
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+
+class Exhausted(Exception):
+    """
+    Raised by a scenario that has no fixture rows, or no more, to use.
+    """
+
+
+class Fixtures:
+    """
+    Ids sampled from the database once, before timing starts.
+    """
+
+    def __init__(self, seed=0, sample=5000):
+        from .models import Child, Facility, Vaccination
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.facility_ids = list(Facility.objects.values_list("id", flat=True)[:500])
+        self.child_ids = list(Child.objects.values_list("id", flat=True)[:sample])
+        self.open_doses = list(
+            Vaccination.objects.filter(status="scheduled").values_list(
+                "id", flat=True
+            )[:sample]
+        )
+        self.series = "Penta"
+        self.counter = itertools.count()
+
+    def pick(self, values, name):
+        # An empty database gives empty samples; stop the scenario as for
+        # used-up doses instead of failing every request with IndexError
+        if not values:
+            raise Exhausted(f"no {name} to pick from")
+        with self.lock:
+            return self.rng.choice(values)
+
+    def next_dose(self):
+        # Each update gets its own dose; once the sample is used up the
+        # scenario stops rather than requesting ids that are not doses
+        with self.lock:
+            if not self.open_doses:
+                raise Exhausted("no scheduled doses left to update")
+            return self.open_doses.pop()
+
+
+def register_child(fx):
+    # Generated names only differ by a number, which phonetic matching
+    # ignores, so the duplicate check would answer 409 for nearly all of them
+    n = next(fx.counter)
+    return "POST", "/api/children/register/?allow_duplicate=true", {
+        "full_name": f"Benchmark Child {n}",
+        "sex": "female",
+        "date_of_birth": str(datetime.date.today()),
+        "place_of_birth": "facility",
+        "caregiver_name": "Benchmark",
+        "caregiver_contact": f"0809{n:07d}",
+        "caregiver_address": "-",
+        "facility": fx.pick(fx.facility_ids, "facilities"),
+    }
+
+
+def update_vaccination(fx):
+    return "PATCH", f"/api/vaccinations/{fx.next_dose()}/update/", {
+        "status": "given",
+        "actual_date": str(datetime.date.today()),
+    }
+
+
+SCENARIOS = {
+    "register_child": register_child,
+    "update_vaccination": update_vaccination,
+    "list_facilities": lambda fx: ("GET", "/api/facilities/", None),
+    "list_users": lambda fx: ("GET", "/api/users/", None),
+    "child_vaccinations": lambda fx: (
+        "GET",
+        f"/api/children/{fx.pick(fx.child_ids, 'children')}/vaccinations/",
+        None,
+    ),
+    "defaulters": lambda fx: ("GET", "/api/reports/defaulters/", None),
+    "compliance": lambda fx: ("GET", "/api/reports/compliance/", None),
+    "coverage": lambda fx: (
+        "GET",
+        f"/api/reports/coverage/?level=lga&series={fx.series}",
+        None,
+    ),
+    "dropout_rate": lambda fx: (
+        "GET",
+        f"/api/reports/dropout_rate/{fx.series}/",
+        None,
+    ),
+    "dropout_rates": lambda fx: ("GET", "/api/reports/dropout_rates/", None),
+}
+
+
+def summarize(latencies, errors, statuses, elapsed):
+    """
+    Latency percentiles (ms) and throughput for one scenario.
+    """
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": dict(sorted(statuses.items())),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+    if latencies:
+        ms = sorted(value * 1000 for value in latencies)
+        cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+        result.update(
+            mean_ms=round(statistics.fmean(ms), 2),
+            p50_ms=round(cuts[49], 2),
+            p95_ms=round(cuts[94], 2),
+            p99_ms=round(cuts[98], 2),
+            max_ms=round(ms[-1], 2),
+        )
+    return result
+
+
+def run_scenario(build, transport, fixtures, requests, concurrency):
+    """
+    Send ``requests`` requests built by ``build`` from ``concurrency``
+    threads and summarize them. A scenario whose fixtures run out stops
+    early and is marked ``exhausted``.
+    """
+    latencies = []
+    statuses = {}
+    errors = 0
+    exhausted = False
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def worker():
+        nonlocal errors, exhausted
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                try:
+                    method, path, body = build(fixtures)
+                except Exhausted:
+                    exhausted = True
+                    return
+                started = time.perf_counter()
+                try:
+                    code = transport.request(method, path, body)
+                except Exception as exc:
+                    code = type(exc).__name__
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[str(code)] = statuses.get(str(code), 0) + 1
+                    if not isinstance(code, int) or code >= 400:
+                        errors += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result = summarize(latencies, errors, statuses, time.perf_counter() - started)
+    if exhausted:
+        result["exhausted"] = True
+    return result
+
+
+def run(user, scenarios, requests=200, concurrency=4, base_url=None, seed=0, log=None):
+    """
+    Run the named scenarios one after another and return the report that
+    ``run_benchmark`` writes as JSON.
+    """
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from .models import Child, Facility, Vaccination
+
+    token = str(RefreshToken.for_user(user).access_token)
+    if base_url:
+        transport = HTTPTransport(token, base_url)
+    else:
+        transport = InProcessTransport(token)
+    fixtures = Fixtures(seed=seed)
+
+    report = {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "target": base_url or "in-process",
+        "database": connection.vendor,
+        "concurrency": concurrency,
+        "requests_per_scenario": requests,
+        "dataset": {
+            "facilities": Facility.objects.count(),
+            "children": Child.objects.count(),
+            "vaccinations": Vaccination.objects.count(),
+        },
+        "scenarios": {},
+    }
+    for name in scenarios:
+        result = run_scenario(
+            SCENARIOS[name], transport, fixtures, requests, concurrency
+        )
+        report["scenarios"][name] = result
+        if log:
+            log(name, result)
+    return report
@@ -0,0 +1,196 @@
+"""
+Cached vaccine catalogue.
+
+Each process keeps an immutable snapshot of ``VaccineMaster``: the doses in
+schedule order, by id and grouped by series. A snapshot is trusted for
+``CATALOGUE_TIMEOUT`` seconds, so warm reads cost no query and no cache
+lookup. After that the process compares the snapshot's version token with
+the one in the cache named by ``CATALOGUE_CACHE``, which every worker
+process must share (see ``api.utils.shared_cache``), and reloads only when
+another process changed the catalogue; without a shared cache it simply
+reloads. VaccineMaster save/delete signals (see ``api/signals.py``) drop
+this process's snapshot and replace the token when the change commits;
+``QuerySet.update()`` bypasses them, call ``invalidate()`` after one.
+"""
+import time
+import uuid
+import weakref
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from api.utils import shared_cache
+
+VERSION_KEY = "vaccine_catalogue:version"
+DEFAULT_TIMEOUT = 30
+
+# (catalogue, monotonic time it was last confirmed current)
+_snapshot = None
+
+
+class Vaccine(NamedTuple):
+    id: int
+    name: str
+    dose_number: int
+    interval_days: int
+    order: int
+    series: str
+    min_interval_days: Optional[int]
+    grace_days: int
+
+
+FIELDS = Vaccine._fields
+
+
+class Catalogue:
+    """
+    Read-only view of the catalogue at one version. ``vaccines`` is in
+    schedule order, ``by_id`` maps ids to doses and ``series`` maps each
+    series to its doses in order.
+    """
+
+    __slots__ = ("version", "vaccines", "by_id", "series", "_series_names")
+
+    def __init__(self, version, vaccines):
+        vaccines = tuple(sorted(vaccines, key=lambda v: v.order))
+        series = {}
+        for vaccine in vaccines:
+            series.setdefault(vaccine.series, []).append(vaccine)
+        values = {
+            "version": version,
+            "vaccines": vaccines,
+            "by_id": MappingProxyType({v.id: v for v in vaccines}),
+            "series": MappingProxyType(
+                {name: tuple(doses) for name, doses in series.items()}
+            ),
+            "_series_names": {name.lower(): name for name in series},
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Catalogue snapshots are read-only")
+
+    def __len__(self):
+        return len(self.vaccines)
+
+    def get_series(self, name):
+        """
+        Doses of a series in order, matching its name case-insensitively;
+        empty when there is no such series.
+        """
+        name = self._series_names.get(name.lower())
+        return self.series[name] if name else ()
+
+    def first_dose(self, series):
+        doses = self.get_series(series)
+        return doses[0] if doses else None
+
+    def last_dose(self, series):
+        doses = self.get_series(series)
+        return doses[-1] if doses else None
+
+    def multi_dose_series(self):
+        """
+        ``{series: doses}`` for the series with a first and a last dose,
+        the ones dropout is reported for.
+        """
+        return {name: doses for name, doses in self.series.items() if len(doses) > 1}
+
+
+def _version_cache():
+    alias = getattr(settings, "CATALOGUE_CACHE", None)
+    return shared_cache(alias) if alias else None
+
+
+def _load(version):
+    from .models import VaccineMaster
+
+    rows = VaccineMaster.objects.values_list(*FIELDS)
+    return Catalogue(version, (Vaccine(*row) for row in rows))
+
+
+def get_catalogue():
+    """
+    The current catalogue. The snapshot is reused for ``CATALOGUE_TIMEOUT``
+    seconds, then reloaded with one query unless the shared version shows
+    it is still current.
+    """
+    global _snapshot
+    if _uncommitted_change():
+        # This transaction changed the catalogue and may still roll back
+        return _load(None)
+    started = time.monotonic()
+    snapshot = _snapshot
+    timeout = getattr(settings, "CATALOGUE_TIMEOUT", DEFAULT_TIMEOUT)
+    if snapshot is not None and started - snapshot[1] < timeout:
+        return snapshot[0]
+
+    cache = _version_cache()
+    version = None
+    if cache is not None:
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        if snapshot is not None and snapshot[0].version == version:
+            _snapshot = (snapshot[0], started)
+            return snapshot[0]
+
+    # The version is read before the rows, so a change committed in between
+    # leaves this snapshot outdated rather than mislabelled
+    catalogue = _load(version)
+    _snapshot = (catalogue, started)
+    return catalogue
+
+
+def invalidate():
+    """
+    Make this process reload the catalogue on its next read, and every
+    other process once it next checks the shared version.
+    """
+    global _snapshot
+    _snapshot = None
+    cache = _version_cache()
+    if cache is not None:
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class _Change:
+    """
+    An uncommitted catalogue change, registered with ``on_commit``. Django
+    drops the callback when its transaction or savepoint rolls back, which
+    frees the change; the connection only holds it weakly.
+    """
+
+    committed = False
+
+    def __call__(self):
+        self.committed = True
+        invalidate()
+
+
+def _changes(connection):
+    changes = getattr(connection, "_catalogue_changes", None)
+    if changes is None:
+        changes = connection._catalogue_changes = weakref.WeakSet()
+    return changes
+
+
+def _uncommitted_change():
+    changes = getattr(transaction.get_connection(), "_catalogue_changes", ())
+    return any(not change.committed for change in list(changes))
+
+
+def changed():
+    """
+    Record a VaccineMaster change: reads in the changing transaction see it
+    uncached, and every process reloads once it commits.
+    """
+    change = _Change()
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        _changes(connection).add(change)
+    transaction.on_commit(change)
@@ -0,0 +1,161 @@
+"""
+Duplicate child detection.
+
+Candidates are found by blocking: children born within
+``DUPLICATE_DOB_WINDOW_DAYS`` of each other who share either the
+``block_key`` (the sorted phonetic codes of the name, see api.search) or the
+normalized caregiver phone. Both are indexed together with the date of
+birth, so a lookup is two index probes reading outwards from the child's
+date of birth, the nearest births first. Candidates are then confirmed by name
+similarity, which keeps twins (same phone and birthday, different first
+names) apart.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+from api.search import name_codes
+
+DEFAULT_BATCH_SIZE = 5000
+# Share of phonetic name codes two children must have in common
+MIN_SIMILARITY = 0.5
+# Rows read per registration check; more is a data problem, not a duplicate
+MAX_CANDIDATES = 50
+
+
+def dob_window():
+    return datetime.timedelta(days=getattr(settings, "DUPLICATE_DOB_WINDOW_DAYS", 31))
+
+
+def similarity(name_a, name_b):
+    """
+    Jaccard similarity of the phonetic codes of two normalized names.
+    """
+    a, b = set(name_codes(name_a)), set(name_codes(name_b))
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def find_candidates(child, limit=10):
+    """
+    Existing children that ``child`` (saved or not, prepared with
+    ``api.search.prepare``) probably duplicates, most similar first, each
+    with a ``duplicate_score`` attribute.
+    """
+    from .models import Child
+
+    block = Q()
+    if child.block_key:
+        block |= Q(block_key=child.block_key)
+    if child.phone_e164:
+        block |= Q(phone_e164=child.phone_e164)
+    if not block:
+        return []
+
+    window = dob_window()
+    dob = child.date_of_birth
+    matches = Child.objects.filter(block)
+    if child.pk:
+        matches = matches.exclude(pk=child.pk)
+    # The births nearest to the child's, read outwards from its date of
+    # birth along the index on each side
+    later = matches.filter(
+        date_of_birth__range=(dob, dob + window)
+    ).order_by("date_of_birth", "id")
+    earlier = matches.filter(
+        date_of_birth__range=(dob - window, dob - datetime.timedelta(days=1))
+    ).order_by("-date_of_birth", "-id")
+    nearest = sorted(
+        [*later[:MAX_CANDIDATES], *earlier[:MAX_CANDIDATES]],
+        key=lambda c: (abs(c.date_of_birth - dob), c.pk),
+    )
+
+    found = []
+    for candidate in nearest[:MAX_CANDIDATES]:
+        score = similarity(child.name_normalized, candidate.name_normalized)
+        if score >= MIN_SIMILARITY:
+            candidate.duplicate_score = round(score, 2)
+            found.append(candidate)
+    found.sort(key=lambda c: (-c.duplicate_score, c.pk))
+    return found[:limit]
+
+
+class Clusters:
+    """
+    Union-find over the ids of children linked as duplicates.
+    """
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, pk):
+        root = self.parent.setdefault(pk, pk)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while pk != root:
+            self.parent[pk], pk = root, self.parent[pk]
+        return root
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+    def groups(self):
+        grouped = {}
+        for pk in self.parent:
+            grouped.setdefault(self.find(pk), []).append(pk)
+        return sorted(sorted(ids) for ids in grouped.values())
+
+
+def link_block(rows, window, clusters):
+    """
+    Cluster the rows of one block (``(id, dob, normalized name)`` tuples
+    sorted by date of birth). Each row joins the first open cluster whose
+    first child has a similar name and was born within ``window`` before it,
+    or starts a new one; anchoring on the first child stops a common name
+    from chaining every birth across the years into one cluster.
+    """
+    anchors = []
+    for pk, dob, name in rows:
+        anchors = [a for a in anchors if dob - a[1] <= window]
+        for anchor_pk, _, anchor_name in anchors:
+            if similarity(name, anchor_name) >= MIN_SIMILARITY:
+                clusters.union(pk, anchor_pk)
+                break
+        else:
+            anchors.append((pk, dob, name))
+
+
+def find_duplicates(batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Cluster existing children that look like duplicates of each other.
+
+    Streams the table twice in index order, once by name block and once by
+    caregiver phone, ``batch_size`` rows at a time, so memory holds one
+    block plus the ids already linked. Returns a sorted list of clusters,
+    each a sorted list of child ids.
+    """
+    from .models import Child
+
+    window = dob_window()
+    clusters = Clusters()
+    scanned = 0
+    for column in ("block_key", "phone_e164"):
+        rows = (
+            Child.objects.exclude(**{column: ""})
+            .order_by(column, "date_of_birth")
+            .values_list(column, "id", "date_of_birth", "name_normalized")
+            .iterator(chunk_size=batch_size)
+        )
+        current, block = None, []
+        for key, pk, dob, name in rows:
+            if key != current:
+                link_block(block, window, clusters)
+                current, block = key, []
+            block.append((pk, dob, name))
+            scanned += 1
+            if progress and scanned % batch_size == 0:
+                progress(scanned)
+        link_block(block, window, clusters)
+    return clusters.groups()
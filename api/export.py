@@ -0,0 +1,285 @@
+"""
+Streaming export of the immunization registry: one row per dose, joined
+with its child, facility and vaccine. Caregiver contact details are not
+exported.
+
+The compiled query runs on Django's chunked cursor (server-side on
+PostgreSQL) and rows are fetched and written chunk by chunk, so memory use
+does not depend on the size of the export. Values come straight from the
+database driver, skipping the ORM's per-value converters; timestamps are
+UTC. CSV and NDJSON need nothing extra; Parquet and
+Arrow IPC need ``pyarrow``.
+"""
+import csv
+import datetime
+import io
+import json
+import zlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
+from api.catalogue import get_catalogue
+
+# (column, ORM path, Arrow type name). Facility and vaccine columns are
+# read once per export into lookup tables instead of joined into every row.
+CHILD_COLUMNS = [
+    ("vaccination_id", "id", "int64"),
+    ("child_uid", "child__uid", "string"),
+    ("sex", "child__sex", "string"),
+    ("date_of_birth", "child__date_of_birth", "date32"),
+    ("place_of_birth", "child__place_of_birth", "string"),
+]
+FACILITY_COLUMNS = [
+    ("facility_code", "code", "string"),
+    ("facility_name", "name", "string"),
+    ("ward", "ward", "string"),
+    ("lga", "lga", "string"),
+    ("state", "state", "string"),
+]
+VACCINE_COLUMNS = [
+    ("vaccine", "name", "string"),
+    ("dose_number", "dose_number", "int32"),
+    ("series", "series", "string"),
+]
+DOSE_COLUMNS = [
+    ("scheduled_date", "scheduled_date", "date32"),
+    ("actual_date", "actual_date", "date32"),
+    ("status", "status", "string"),
+    ("batch_number", "batch_number", "string"),
+    ("last_updated", "last_updated", "timestamp"),
+]
+COLUMNS = CHILD_COLUMNS + FACILITY_COLUMNS + VACCINE_COLUMNS + DOSE_COLUMNS
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+DEFAULT_CHUNK_SIZE = 20000
+
+
+def export_rows(facility=None, state=None, lga=None, date_from=None, date_to=None):
+    """
+    The doses to export. ``facility`` is an id or code; the dates bound
+    ``scheduled_date`` (inclusive).
+    """
+    from .models import Vaccination
+
+    rows = Vaccination.objects.all()
+    if facility:
+        if str(facility).isdigit():
+            rows = rows.filter(child__facility_id=facility)
+        else:
+            rows = rows.filter(child__facility__code=facility)
+    if state:
+        rows = rows.filter(child__facility__state__iexact=state)
+    if lga:
+        rows = rows.filter(child__facility__lga__iexact=lga)
+    if date_from:
+        rows = rows.filter(scheduled_date__gte=date_from)
+    if date_to:
+        rows = rows.filter(scheduled_date__lte=date_to)
+    return rows.order_by()
+
+
+def select_columns(rows, text=False):
+    """
+    ``rows`` as tuples of the child columns, facility id, vaccine id and
+    dose columns. With ``text`` the database returns dates and timestamps
+    already formatted, which text formats would otherwise parse and format
+    again for every value.
+    """
+
+    def column(path, kind):
+        if text and kind in ("date32", "timestamp"):
+            return Cast(path, TextField())
+        return path
+
+    return rows.values_list(
+        *(column(path, kind) for _, path, kind in CHILD_COLUMNS),
+        "child__facility_id",
+        "vaccine_id",
+        *(column(path, kind) for _, path, kind in DOSE_COLUMNS),
+    )
+
+
+def joined(chunks):
+    """
+    Expand the facility and vaccine ids of ``select_columns`` rows into
+    their columns, giving rows in ``COLUMNS`` order.
+    """
+    from .models import Facility
+
+    facilities = {
+        row[0]: row[1:]
+        for row in Facility.objects.values_list(
+            "id", *(path for _, path, _ in FACILITY_COLUMNS)
+        )
+    }
+    vaccines = {
+        vaccine.id: tuple(getattr(vaccine, path) for _, path, _ in VACCINE_COLUMNS)
+        for vaccine in get_catalogue().vaccines
+    }
+    n = len(CHILD_COLUMNS)
+    for chunk in chunks:
+        yield [
+            row[:n] + facilities[row[n]] + vaccines[row[n + 1]] + row[n + 2 :]
+            for row in chunk
+        ]
+
+
+def chunked(rows, chunk_size):
+    """
+    Run the ``rows`` query and yield its result in lists of ``chunk_size``.
+    """
+    sql, params = rows.query.sql_with_params()
+    with connections[rows.db].chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def write_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in COLUMNS])
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def write_ndjson(chunks):
+    names = [name for name, _, _ in COLUMNS]
+    encode = json.JSONEncoder(default=_json_value).encode
+    for chunk in chunks:
+        yield "".join(
+            encode(dict(zip(names, row))) + "\n" for row in chunk
+        ).encode()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImproperlyConfigured(
+            "Parquet and Arrow exports require pyarrow (pip install pyarrow)"
+        )
+    return pyarrow
+
+
+class _Drain:
+    """
+    Write-only file object collecting what Arrow writes so it can be
+    yielded as it is produced.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def arrow_schema(pa):
+    types = {
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "string": pa.string(),
+        "date32": pa.date32(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(name, types[kind]) for name, _, kind in COLUMNS])
+
+
+def write_arrow(chunks, parquet=False):
+    pa = _pyarrow()
+    schema = arrow_schema(pa)
+    sink = _Drain()
+    if parquet:
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for chunk in chunks:
+        columns = list(zip(*chunk))
+        writer.write_batch(
+            pa.record_batch(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+        )
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def gzipped(parts):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(fmt, rows, compress=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the encoded export of ``rows`` (from ``export_rows``) in ``fmt``
+    as bytes chunks, gzip-compressed if ``compress``.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    if fmt in ("parquet", "arrow"):
+        _pyarrow()
+    text = fmt in ("csv", "ndjson")
+    chunks = joined(chunked(select_columns(rows, text=text), chunk_size))
+    if fmt == "csv":
+        parts = write_csv(chunks)
+    elif fmt == "ndjson":
+        parts = write_ndjson(chunks)
+    else:
+        parts = write_arrow(chunks, parquet=fmt == "parquet")
+    return gzipped(parts) if compress else parts
+
+
+def filename(fmt, compress=False):
+    name = f"registry-{datetime.date.today():%Y%m%d}.{FORMATS[fmt][1]}"
+    return name + ".gz" if compress else name
@@ -0,0 +1,116 @@
+"""
+Cached facility vaccination calendars.
+
+Each facility's allowed weekdays are stored as a 7-entry table giving, for
+every weekday, the number of days to the next allowed vaccination day, so
+moving a date is a single lookup. Each process keeps the tables it read for
+``FACILITY_CALENDAR_TIMEOUT`` seconds. When ``FACILITY_CALENDAR_CACHE``
+names a Django cache every worker shares (see ``api.utils.shared_cache``),
+processes also fill their misses from it before querying the database.
+Tables are invalidated when a FacilityVaccinationDay save/delete commits
+(see ``api/signals.py``) in the committing process and the shared cache;
+other processes see the change once their copy times out.
+``QuerySet.update()`` bypasses those signals, and the timeout bounds how
+long such a change goes unseen.
+"""
+import datetime
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from api.utils import shared_cache
+
+NO_RESTRICTION = (0, 0, 0, 0, 0, 0, 0)
+CACHE_KEY = "facility_calendar:{}"
+DEFAULT_TIMEOUT = 60
+
+# {facility_id: (offsets, monotonic expiry time)} read by this process
+_local = {}
+
+
+def build_offsets(days):
+    """
+    Return the "next allowed day" offset table for a set of weekdays.
+    """
+    if not days:
+        return NO_RESTRICTION
+    return tuple(min((day - weekday) % 7 for day in days) for weekday in range(7))
+
+
+def _cache():
+    alias = getattr(settings, "FACILITY_CALENDAR_CACHE", None)
+    return shared_cache(alias) if alias else None
+
+
+def get_offsets_many(facility_ids, refresh=False):
+    """
+    Return ``{facility_id: offsets}``, loading all cache misses in one query.
+    ``refresh`` skips the caches, for callers that must see every committed
+    change.
+    """
+    from .models import FacilityVaccinationDay
+
+    ids = set(facility_ids)
+    current = time.monotonic()
+    found = {}
+    if not refresh:
+        for i in ids:
+            entry = _local.get(i)
+            if entry is not None and entry[1] > current:
+                found[i] = entry[0]
+
+    missing = ids - found.keys()
+    if not missing:
+        return found
+    cache = _cache()
+    timeout = getattr(settings, "FACILITY_CALENDAR_TIMEOUT", DEFAULT_TIMEOUT)
+    loaded = {}
+    if cache is not None and not refresh:
+        hits = cache.get_many([CACHE_KEY.format(i) for i in missing])
+        loaded = {
+            i: hits[CACHE_KEY.format(i)] for i in missing if CACHE_KEY.format(i) in hits
+        }
+        missing -= loaded.keys()
+    if missing:
+        days = defaultdict(set)
+        rows = FacilityVaccinationDay.objects.filter(
+            facility_id__in=missing
+        ).values_list("facility_id", "day_of_week")
+        for facility_id, day in rows:
+            days[facility_id].add(day)
+        queried = {i: build_offsets(days[i]) for i in missing}
+        if cache is not None:
+            cache.set_many(
+                {CACHE_KEY.format(i): v for i, v in queried.items()}, timeout
+            )
+        loaded.update(queried)
+    for i, offsets in loaded.items():
+        _local[i] = (offsets, current + timeout)
+    found.update(loaded)
+    return found
+
+
+def get_offsets(facility_id, refresh=False):
+    return get_offsets_many([facility_id], refresh)[facility_id]
+
+
+def shift_to_facility_day(date, offsets):
+    """
+    Move ``date`` forward to the next allowed day using an offset table.
+    """
+    return date + datetime.timedelta(days=offsets[date.weekday()])
+
+
+def invalidate(facility_id):
+    _local.pop(facility_id, None)
+    cache = _cache()
+    if cache is not None:
+        cache.delete(CACHE_KEY.format(facility_id))
+
+
+def reset():
+    """
+    Forget every calendar this process has read.
+    """
+    _local.clear()
@@ -0,0 +1,113 @@
+import threading
+import time
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, DatabaseError
+from django.test.utils import override_settings
+
+from api.models import Child, Facility
+
+
+class Command(BaseCommand):
+    help = (
+        "Register children concurrently from many threads and check that the "
+        "generated UIDs never collide. Writes to the configured database; the "
+        "benchmark facility and its children are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            default="1,2,4,8",
+            help="Comma separated thread counts to run, e.g. 1,2,4,8",
+        )
+        parser.add_argument(
+            "--per-thread", type=int, default=100, help="Children per thread"
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=settings.UID_LEASE_BLOCK_SIZE,
+            help="UID_LEASE_BLOCK_SIZE to use (1 = plain atomic increments)",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the benchmark data"
+        )
+
+    def handle(self, *args, **options):
+        thread_counts = [int(n) for n in options["threads"].split(",") if n]
+        per_thread = options["per_thread"]
+
+        facility, _ = Facility.objects.get_or_create(
+            code="BENCHUID",
+            defaults={"name": "UID Benchmark", "ward": "-", "lga": "BE", "state": "BE"},
+        )
+        baseline = None
+        try:
+            with override_settings(UID_LEASE_BLOCK_SIZE=options["block_size"]):
+                for n in thread_counts:
+                    rate = self.run_round(facility, n, per_thread)
+                    if baseline is None:
+                        baseline = rate / n
+                    self.stdout.write(
+                        f"  scaling vs 1 thread: {rate / (baseline * n):.2f}"
+                    )
+        finally:
+            if not options["keep"]:
+                Child.objects.filter(facility=facility).delete()
+                facility.delete()
+
+    def run_round(self, facility, threads, per_thread):
+        uids = []
+        errors = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(threads)
+
+        def worker():
+            created = []
+            failed = []
+            start_barrier.wait()
+            try:
+                for i in range(per_thread):
+                    child = Child(
+                        full_name=f"Bench Child {i}",
+                        sex="female",
+                        date_of_birth=datetime.date.today(),
+                        place_of_birth="facility",
+                        caregiver_name="Bench",
+                        caregiver_contact="0",
+                        caregiver_address="-",
+                        facility=facility,
+                    )
+                    try:
+                        child.save()
+                        created.append(child.uid)
+                    except DatabaseError as exc:
+                        failed.append(str(exc))
+            finally:
+                connection.close()
+            with lock:
+                uids.extend(created)
+                errors.extend(failed)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        duplicates = len(uids) - len(set(uids))
+        rate = len(uids) / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"threads={threads} created={len(uids)} errors={len(errors)} "
+            f"duplicates={duplicates} elapsed={elapsed:.2f}s rate={rate:.1f}/s"
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"  first error: {errors[0]}"))
+        if duplicates:
+            self.stdout.write(self.style.ERROR("  UID collision detected"))
+        return rate
@@ -0,0 +1,101 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.dhis2 import (
+    PushError,
+    data_elements,
+    data_values,
+    month_range,
+    push,
+    write_file,
+)
+
+
+def month(value):
+    return datetime.datetime.strptime(value, "%Y-%m").date()
+
+
+class Command(BaseCommand):
+    help = (
+        "Build DHIS2 dataValueSets of doses given per facility, vaccine, month "
+        "and age band, and write them to a file or push them to DHIS2_URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month",
+            type=month,
+            help="First month to report, YYYY-MM (default: last month)",
+        )
+        parser.add_argument(
+            "--months", type=int, default=1, help="Number of months to report"
+        )
+        parser.add_argument("--output", help="Write the payload to this JSON file")
+        parser.add_argument(
+            "--push", action="store_true", help="Push to the DHIS2 server in chunks"
+        )
+        parser.add_argument("--url", help="DHIS2 base URL (default: DHIS2_URL)")
+        parser.add_argument("--chunk-size", type=int, help="Data values per request")
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Push from the beginning instead of resuming",
+        )
+
+    def handle(self, *args, **options):
+        if not options["output"] and not options["push"]:
+            raise CommandError("Give --output and/or --push")
+        last_month = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+        first = options["month"] or last_month
+        start, end = month_range(first, max(1, options["months"]))
+        elements, unmapped = data_elements()
+        if not elements:
+            raise CommandError("No vaccine has a UID in DHIS2_DATA_ELEMENTS")
+        if unmapped:
+            self.stderr.write(
+                self.style.WARNING(
+                    "Not reported, no UID in DHIS2_DATA_ELEMENTS: "
+                    + ", ".join(unmapped)
+                )
+            )
+        started = time.perf_counter()
+
+        if options["output"]:
+            count = write_file(options["output"], data_values(start, end))
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Wrote {count} data values to {options['output']} "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            )
+
+        if options["push"]:
+            if not (options["url"] or getattr(settings, "DHIS2_URL", "")):
+                raise CommandError("Set DHIS2_URL or pass --url")
+
+            def progress(state):
+                self.stdout.write(f"{state.period}: {state.sent} data values sent")
+
+            try:
+                state, counts = push(
+                    start,
+                    months=max(1, options["months"]),
+                    chunk_size=options["chunk_size"],
+                    restart=options["restart"],
+                    url=options["url"],
+                    progress=progress if options["verbosity"] > 1 else None,
+                )
+            except PushError as exc:
+                raise CommandError(
+                    f"Push failed; rerun to resume from the last accepted chunk: {exc}"
+                )
+            summary = ", ".join(f"{key}={value}" for key, value in counts.items())
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Pushed {state.sent} data values for {state.period} "
+                    f"in {time.perf_counter() - started:.2f}s ({summary})"
+                )
+            )
@@ -0,0 +1,88 @@
+import datetime
+import sys
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import (
+    DEFAULT_CHUNK_SIZE,
+    FORMATS,
+    export_rows,
+    filename,
+    stream_export,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the immunization registry (one row per dose with child, "
+        "facility and vaccine columns) as CSV, NDJSON, Parquet or Arrow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=list(FORMATS), default="csv")
+        parser.add_argument(
+            "--output",
+            help="File to write ('-' for stdout; default: registry-<date>.<ext>)",
+        )
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+        parser.add_argument("--facility", help="Facility id or code")
+        parser.add_argument("--state")
+        parser.add_argument("--lga")
+        parser.add_argument(
+            "--from",
+            dest="date_from",
+            type=datetime.date.fromisoformat,
+            help="Earliest scheduled date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--to",
+            dest="date_to",
+            type=datetime.date.fromisoformat,
+            help="Latest scheduled date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Rows fetched and encoded per chunk",
+        )
+
+    def handle(self, *args, **options):
+        rows = export_rows(
+            facility=options["facility"],
+            state=options["state"],
+            lga=options["lga"],
+            date_from=options["date_from"],
+            date_to=options["date_to"],
+        )
+        try:
+            parts = stream_export(
+                options["format"],
+                rows,
+                compress=options["gzip"],
+                chunk_size=max(1, options["chunk_size"]),
+            )
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        path = options["output"] or filename(options["format"], options["gzip"])
+        started = time.perf_counter()
+        written = 0
+        out = sys.stdout.buffer if path == "-" else open(path, "wb")
+        try:
+            for part in parts:
+                out.write(part)
+                written += len(part)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+
+        if path != "-":
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Wrote {path} ({written / 1e6:.1f} MB) in {elapsed:.2f}s"
+                )
+            )
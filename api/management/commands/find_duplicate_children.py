@@ -0,0 +1,82 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.duplicates import DEFAULT_BATCH_SIZE, find_duplicates
+from api.models import Child
+
+
+class Command(BaseCommand):
+    help = (
+        "Cluster registered children that look like duplicates (similar names "
+        "or the same caregiver phone, born close together) and write the "
+        "clusters as CSV for review."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default="-", help="CSV file to write ('-' for stdout)"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows fetched per chunk while scanning",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(scanned):
+            self.stderr.write(f"{scanned} rows scanned", ending="\r")
+            self.stderr.flush()
+
+        clusters = find_duplicates(options["batch_size"], progress=progress)
+
+        path = options["output"]
+        out = sys.stdout if path == "-" else open(path, "w", newline="")
+        try:
+            writer = csv.writer(out)
+            writer.writerow(
+                [
+                    "cluster",
+                    "id",
+                    "uid",
+                    "full_name",
+                    "date_of_birth",
+                    "caregiver_contact",
+                    "facility",
+                ]
+            )
+            # Load the children of 500 clusters per query
+            for start in range(0, len(clusters), 500):
+                group = clusters[start : start + 500]
+                children = Child.objects.select_related("facility").in_bulk(
+                    [pk for ids in group for pk in ids]
+                )
+                for number, ids in enumerate(group, start + 1):
+                    for child in (children[pk] for pk in ids if pk in children):
+                        writer.writerow(
+                            [
+                                number,
+                                child.id,
+                                child.uid,
+                                child.full_name,
+                                child.date_of_birth,
+                                child.caregiver_contact,
+                                child.facility.code,
+                            ]
+                        )
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"Found {len(clusters)} clusters covering "
+                f"{sum(len(ids) for ids in clusters)} children in "
+                f"{time.perf_counter() - started:.2f}s"
+            )
+        )
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from api.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate synthetic facilities, children, vaccination schedules "
+        "with realistic outcomes and SMS logs for load testing. Writes to the "
+        "configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--facilities", type=int, default=100)
+        parser.add_argument("--children", type=int, default=10000)
+        parser.add_argument(
+            "--sms-ratio",
+            type=float,
+            default=0.3,
+            help="Share of children with an SMS log entry",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=2000, help="Children per transaction"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed for repeatable data"
+        )
+
+    def handle(self, *args, **options):
+        def progress(counts, seconds):
+            rate = counts["children"] / seconds if seconds else 0
+            self.stdout.write(
+                f"children={counts['children']} vaccinations={counts['vaccinations']} "
+                f"sms={counts['sms']} ({rate:.0f} children/s)"
+            )
+
+        counts = generate(
+            facilities=options["facilities"],
+            children=options["children"],
+            sms_ratio=options["sms_ratio"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {counts['facilities']} facilities, {counts['children']} "
+                f"children, {counts['vaccinations']} vaccinations and "
+                f"{counts['sms']} SMS logs in {counts['seconds']:.2f}s"
+            )
+        )
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.missed_doses import DEFAULT_BATCH_SIZE, mark_missed_doses
+from api.models import Facility
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark scheduled doses past their vaccine's grace period as missed. "
+        "Report summaries of the affected facilities are rebuilt afterwards. "
+        "Intended to run daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Doses updated per transaction",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Count doses without updating them"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = mark_missed_doses(
+            batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+        codes = dict(
+            Facility.objects.filter(id__in=counts).values_list("id", "code")
+        )
+        for facility_id, count in sorted(counts.items()):
+            self.stdout.write(f"{codes.get(facility_id, facility_id)}: {count}")
+
+        verb = "Would mark" if options["dry_run"] else "Marked"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {sum(counts.values())} doses missed across "
+                f"{len(counts)} facilities in {time.perf_counter() - started:.2f}s"
+            )
+        )
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the normalized phone numbers, names and phonetic search keys "
+        "of every child. Run once after migrating an existing registry."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=2000, help="Children per transaction"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(done):
+            self.stdout.write(f"{done} children indexed", ending="\r")
+            self.stdout.flush()
+
+        done = rebuild_index(options["batch_size"], progress=progress)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {done} children in {time.perf_counter() - started:.2f}s"
+            )
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.reports import refresh_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the pre-aggregated vaccination summary tables used by the "
+        "report endpoints. Intended to run periodically (e.g. every few minutes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild every facility instead of only those changed since the last run",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=200, help="Facilities rebuilt per query"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        facilities, rows = refresh_summaries(
+            full=options["full"], chunk_size=options["chunk_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed {facilities} facilities ({rows} summary rows) "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+        )
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Facility
+from api.rescheduling import DEFAULT_BATCH_SIZE, reschedule_facility
+
+
+class Command(BaseCommand):
+    help = (
+        "Move future scheduled doses onto each facility's current vaccination "
+        "days (run after a facility changes its clinic days)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "facilities",
+            nargs="*",
+            help="Facility ids or codes (default: all facilities)",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        facilities = Facility.objects.order_by("id")
+        if options["facilities"]:
+            ids = [f for f in options["facilities"] if f.isdigit()]
+            codes = [f for f in options["facilities"] if not f.isdigit()]
+            facilities = facilities.filter(id__in=ids) | facilities.filter(
+                code__in=codes
+            )
+            if not facilities.exists():
+                raise CommandError("No matching facilities")
+
+        total_scanned = total_updated = 0
+        total_seconds = 0.0
+        for facility_id, code in facilities.values_list("id", "code"):
+            result = reschedule_facility(facility_id, batch_size=options["batch_size"])
+            total_scanned += result["scanned"]
+            total_updated += result["updated"]
+            total_seconds += result["seconds"]
+            self.stdout.write(
+                f"{code}: scanned={result['scanned']} updated={result['updated']} "
+                f"rows/s={result['rows_per_second']}"
+            )
+
+        rate = round(total_scanned / total_seconds, 1) if total_seconds else None
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done: scanned={total_scanned} updated={total_updated} "
+                f"seconds={total_seconds:.2f} rows/s={rate}"
+            )
+        )
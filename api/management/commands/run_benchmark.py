@@ -0,0 +1,76 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import SCENARIOS, run
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive API endpoints at a fixed concurrency and write p50/p95/p99 "
+        "latency and throughput per scenario to a JSON file. Runs in-process "
+        "unless --url is given. Writing scenarios change data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenarios",
+            default=",".join(SCENARIOS),
+            help=f"Comma separated, from: {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requests per scenario"
+        )
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--url", help="Base URL of a running server, e.g. http://127.0.0.1:8000"
+        )
+        parser.add_argument(
+            "--user",
+            default="benchmark",
+            help="Username to authenticate as (created as an admin if missing)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            help="JSON report path (default: benchmark-<timestamp>.json)",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [s for s in options["scenarios"].split(",") if s]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        user, created = User.objects.get_or_create(
+            username=options["user"], defaults={"role": "admin"}
+        )
+        if created:
+            user.set_unusable_password()
+            user.save()
+
+        def log(name, result):
+            self.stdout.write(
+                f"{name}: {result['requests']} requests, {result['errors']} errors, "
+                f"p50={result.get('p50_ms')}ms p95={result.get('p95_ms')}ms "
+                f"p99={result.get('p99_ms')}ms {result['throughput_rps']} req/s"
+                + (" (ran out of fixture rows)" if result.get("exhausted") else "")
+            )
+
+        report = run(
+            user,
+            scenarios,
+            requests=options["requests"],
+            concurrency=max(1, options["concurrency"]),
+            base_url=options["url"],
+            seed=options["seed"],
+            log=log,
+        )
+        path = options["output"] or (
+            f"benchmark-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+        )
+        with open(path, "w") as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.reminders import generate_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue one reminder SMS per caregiver for doses due soon. Intended to "
+        "run nightly; delivery is done by send_queued_sms."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days-ahead", type=int, default=7, help="Reminder window in days"
+        )
+        parser.add_argument(
+            "--cooldown-days",
+            type=int,
+            default=3,
+            help="Skip children sent an SMS within this many days",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Messages inserted per batch"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Count messages without queueing"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        doses, messages = generate_reminders(
+            window_days=options["days_ahead"],
+            cooldown_days=options["cooldown_days"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+        verb = "Would queue" if options["dry_run"] else "Queued"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {messages} messages covering {doses} doses "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+        )
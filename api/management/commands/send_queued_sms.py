@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.messaging import RateLimiter, process_batch
+from api.sms_providers import get_provider
+
+
+class Command(BaseCommand):
+    help = "Drain the outbound SMS queue through the configured provider."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Messages claimed per batch"
+        )
+        parser.add_argument(
+            "--max-in-flight",
+            type=int,
+            default=getattr(settings, "SMS_MAX_IN_FLIGHT", 20),
+            help="Concurrent provider requests",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of polling",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=5.0, help="Seconds between polls"
+        )
+
+    def handle(self, *args, **options):
+        provider = get_provider()
+        # One limiter for the whole run keeps the provider's rate across batches
+        limiter = RateLimiter(provider.rate_limit)
+        total = 0
+        started = time.perf_counter()
+        while True:
+            handled = process_batch(
+                provider, options["batch_size"], options["max_in_flight"], limiter
+            )
+            total += handled
+            if handled:
+                self.stdout.write(f"Processed {handled} messages")
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {total} messages in {elapsed:.2f}s")
+        )
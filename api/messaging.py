@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+import math
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from api.sms_providers import SMSDeliveryError
+
+# How long a claimed message stays reserved beyond the worst-case time to
+# send its batch; after that it is assumed lost by a crashed worker
+STALE_SENDING = datetime.timedelta(minutes=10)
+
+
+def enqueue(phone, message, child_ids):
+    """
+    Queue one SMS for delivery by the worker and return it.
+    """
+    from .models import OutboundMessage
+
+    return OutboundMessage.objects.create(
+        phone=phone, message=message, child_ids=list(child_ids)
+    )
+
+
+def claim_batch(size, lease=STALE_SENDING):
+    """
+    Atomically mark up to ``size`` due messages as "sending" for ``lease``
+    and return them. Until the lease ends no other worker claims them; the
+    claim time stored in ``updated_at`` identifies this claim when the
+    results are recorded. Uses SKIP LOCKED where supported so several
+    workers can drain the queue.
+    """
+    from .models import OutboundMessage
+
+    current = now()
+    # While "sending", next_attempt_at holds the end of the lease
+    due = OutboundMessage.objects.filter(
+        status__in=["queued", "sending"], next_attempt_at__lte=current
+    ).order_by("next_attempt_at", "id")
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:size])
+        OutboundMessage.objects.filter(id__in=[m.id for m in batch]).update(
+            status="sending", updated_at=current, next_attempt_at=current + lease
+        )
+    for message in batch:
+        message.status = "sending"
+        message.updated_at = current
+        message.next_attempt_at = current + lease
+    return batch
+
+
+def batch_duration(provider, size, max_in_flight):
+    """
+    The longest ``dispatch()`` can take for ``size`` messages: every send
+    runs into the provider's timeout and the rate limit spaces them out.
+    """
+    rounds = math.ceil(size / max_in_flight)
+    spacing = size / provider.rate_limit if provider.rate_limit else 0
+    return datetime.timedelta(seconds=rounds * provider.timeout + spacing)
+
+
+class RateLimiter:
+    """
+    Spaces calls at least ``1 / rate`` seconds apart (no limit when falsy).
+    One limiter can be shared by every batch a worker sends, so the rate
+    holds across batches rather than restarting with each one.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        # No await between reading and advancing the slot, so concurrent
+        # senders on the event loop cannot take the same one
+        current = time.monotonic()
+        delay = self._next - current
+        self._next = max(current, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def dispatch(messages, provider, max_in_flight, limiter=None):
+    """
+    Send ``messages`` concurrently with at most ``max_in_flight`` requests
+    open, each cut off after ``provider.timeout`` seconds, and the
+    provider's rate limit applied by ``limiter`` (a new one for this call
+    when None). Returns ``(message, provider_id, error)`` tuples; ``error``
+    is None on success.
+    """
+    window = asyncio.Semaphore(max_in_flight)
+    limiter = limiter or RateLimiter(provider.rate_limit)
+
+    async def send(message):
+        async with window:
+            await limiter.wait()
+            try:
+                provider_id = await asyncio.wait_for(
+                    provider.send(message.phone, message.message), provider.timeout
+                )
+                return message, provider_id, None
+            except SMSDeliveryError as exc:
+                return message, None, exc
+            except Exception as exc:
+                return message, None, SMSDeliveryError(f"{type(exc).__name__}: {exc}")
+
+    try:
+        return await asyncio.gather(*(send(m) for m in messages))
+    finally:
+        await provider.aclose()
+
+
+def record_results(results, provider_name):
+    """
+    Store delivery outcomes: sent and permanently failed messages get their
+    SMSLog rows, retryable failures are rescheduled with exponential backoff.
+    Messages another worker claimed after their lease ran out are left to
+    that worker.
+    """
+    from .models import OutboundMessage, SMSLog
+
+    max_attempts = getattr(settings, "SMS_MAX_ATTEMPTS", 5)
+    base_delay = getattr(settings, "SMS_RETRY_BASE_SECONDS", 30)
+    current = now()
+    with transaction.atomic():
+        claims = dict(
+            OutboundMessage.objects.select_for_update()
+            .filter(id__in=[message.id for message, _, _ in results], status="sending")
+            .values_list("id", "updated_at")
+        )
+        results = [
+            (message, provider_id, error)
+            for message, provider_id, error in results
+            if claims.get(message.id) == message.updated_at
+        ]
+        logs = []
+        for message, provider_id, error in results:
+            message.attempts += 1
+            message.provider = provider_name
+            message.updated_at = current
+            if error is None:
+                message.status = "sent"
+                message.provider_message_id = provider_id
+                message.last_error = ""
+            elif error.retryable and message.attempts < max_attempts:
+                message.status = "queued"
+                message.last_error = str(error)
+                message.next_attempt_at = current + datetime.timedelta(
+                    seconds=base_delay * 2 ** (message.attempts - 1)
+                )
+            else:
+                message.status = "failed"
+                message.last_error = str(error)
+            if message.status in ("sent", "failed"):
+                logs.extend(
+                    SMSLog(
+                        child_id=child_id,
+                        message=message.message,
+                        status=message.status,
+                    )
+                    for child_id in message.child_ids
+                )
+
+        OutboundMessage.objects.bulk_update(
+            [message for message, _, _ in results],
+            [
+                "status",
+                "attempts",
+                "provider",
+                "provider_message_id",
+                "last_error",
+                "next_attempt_at",
+                "updated_at",
+            ],
+        )
+        SMSLog.objects.bulk_create(logs)
+    return logs
+
+
+def process_batch(provider, size, max_in_flight, limiter=None):
+    """
+    Claim, send and record one batch. The claim's lease covers the batch's
+    worst-case send time plus ``STALE_SENDING``, so no other worker can
+    reclaim and resend a message while it is in flight. Pass the worker's
+    ``limiter`` to keep the provider's rate limit across batches. Returns
+    the number of messages handled.
+    """
+    batch = claim_batch(
+        size, lease=batch_duration(provider, size, max_in_flight) + STALE_SENDING
+    )
+    if batch:
+        results = asyncio.run(dispatch(batch, provider, max_in_flight, limiter))
+        record_results(results, provider.name)
+    return len(batch)
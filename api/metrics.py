@@ -0,0 +1,90 @@
+"""
+In-process Prometheus metrics for the request instrumentation middleware.
+
+Only histograms are needed, so the text exposition format is produced here
+rather than pulling in ``prometheus_client``. Values are per process: when
+running several workers, scrape each one (or put them behind a single
+worker for metrics).
+"""
+import bisect
+import threading
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0]
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = {key: list(value) for key, value in self._series.items()}
+        for label_values, series in sorted(snapshot.items()):
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labels, label_values)
+            )
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+LABELS = ("view", "method")
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Wall time per request.", TIME_BUCKETS, LABELS
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL queries per request.", QUERY_BUCKETS, LABELS
+)
+DB_SECONDS = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL queries per request.",
+    TIME_BUCKETS,
+    LABELS,
+)
+RENDER_SECONDS = Histogram(
+    "http_request_render_duration_seconds",
+    "Time spent rendering (serializing) the response body.",
+    TIME_BUCKETS,
+    LABELS,
+)
+
+HISTOGRAMS = (REQUEST_SECONDS, DB_QUERIES, DB_SECONDS, RENDER_SECONDS)
+
+
+def render_all():
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
@@ -0,0 +1,110 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from api import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    ``execute_wrapper`` hook counting queries and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def query_budget(budget):
+    """
+    View decorator overriding ``REQUEST_QUERY_BUDGET`` for one view, e.g.
+    for batch endpoints whose statement count grows with the payload;
+    ``None`` exempts the view.
+    """
+
+    def decorator(view):
+        view.query_budget = budget
+        return view
+
+    return decorator
+
+
+class InstrumentationMiddleware:
+    """
+    Record query count, DB time, render (serialization) time and wall time
+    for every request. They are added as a ``Server-Timing`` header,
+    observed in the histograms of ``api.metrics`` labelled by URL name, and
+    requests over ``REQUEST_QUERY_BUDGET`` queries (or their view's
+    ``query_budget``) are logged as warnings.
+
+    Render time covers ``TemplateResponse``/DRF ``Response`` rendering; the
+    body of a streaming response is produced after the middleware returns
+    and is not measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        request._render_seconds = 0.0
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.url_name or match.route) if match else "unmatched"
+        if view == "metrics":
+            return response
+
+        labels = (view, request.method)
+        metrics.REQUEST_SECONDS.observe(elapsed, *labels)
+        metrics.DB_QUERIES.observe(counter.count, *labels)
+        metrics.DB_SECONDS.observe(counter.seconds, *labels)
+        metrics.RENDER_SECONDS.observe(request._render_seconds, *labels)
+
+        if getattr(settings, "SERVER_TIMING_HEADER", True):
+            response["Server-Timing"] = (
+                f'db;dur={counter.seconds * 1000:.1f};desc="{counter.count} queries", '
+                f"render;dur={request._render_seconds * 1000:.1f}, "
+                f"total;dur={elapsed * 1000:.1f}"
+            )
+        budget = getattr(settings, "REQUEST_QUERY_BUDGET", None)
+        if match:
+            budget = getattr(match.func, "query_budget", budget)
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                "%s %s (%s) ran %d queries (budget %d) in %.1fms",
+                request.method,
+                request.path,
+                view,
+                counter.count,
+                budget,
+                elapsed * 1000,
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._render_seconds += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
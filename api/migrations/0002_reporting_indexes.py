@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='child',
+            index=models.Index(fields=['facility', 'date_of_birth'], name='child_facility_dob_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccination',
+            index=models.Index(fields=['status', 'vaccine'], name='vacc_status_vaccine_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccination',
+            index=models.Index(fields=['status', 'scheduled_date'], name='vacc_status_sched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccination',
+            index=models.Index(condition=models.Q(('status', 'missed')), fields=['child'], name='vacc_missed_child_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:35
+
+from django.db import migrations, models
+
+
+def populate_series(apps, schema_editor):
+    VaccineMaster = apps.get_model("api", "VaccineMaster")
+    vaccines = list(VaccineMaster.objects.filter(series=""))
+    for vaccine in vaccines:
+        vaccine.series = vaccine.name.rstrip("0123456789 ") or vaccine.name
+    VaccineMaster.objects.bulk_update(vaccines, ["series"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_reporting_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vaccinemaster',
+            name='series',
+            field=models.CharField(blank=True, db_index=True, max_length=50),
+        ),
+        migrations.RunPython(populate_series, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_vaccinemaster_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VaccinationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('lga', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=100)),
+                ('given', models.PositiveIntegerField(default=0)),
+                ('on_time', models.PositiveIntegerField(default=0)),
+                ('missed', models.PositiveIntegerField(default=0)),
+                ('scheduled', models.PositiveIntegerField(default=0)),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='api.facility')),
+                ('vaccine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.vaccinemaster')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'lga'], name='summary_state_lga_idx'), models.Index(fields=['vaccine', 'month'], name='summary_vaccine_month_idx')],
+                'unique_together': {('facility', 'vaccine', 'month')},
+            },
+        ),
+    ]
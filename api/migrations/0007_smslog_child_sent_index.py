@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_outbound_message_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='smslog',
+            index=models.Index(fields=['child', 'sent_at'], name='smslog_child_sent_idx'),
+        ),
+    ]
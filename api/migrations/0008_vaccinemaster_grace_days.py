@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_smslog_child_sent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vaccinemaster',
+            name='grace_days',
+            field=models.PositiveIntegerField(default=14),
+        ),
+    ]
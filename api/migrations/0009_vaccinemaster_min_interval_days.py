@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_vaccinemaster_grace_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vaccinemaster',
+            name='min_interval_days',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
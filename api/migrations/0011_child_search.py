@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-16 21:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_dhis2_data_value_push'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChildSearchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facility_id', models.BigIntegerField()),
+                ('key', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='child',
+            name='name_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='child',
+            name='phone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='child',
+            index=models.Index(fields=['phone_e164', 'facility'], name='child_phone_idx'),
+        ),
+        migrations.AddField(
+            model_name='childsearchkey',
+            name='child',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_keys', to='api.child'),
+        ),
+        migrations.AddIndex(
+            model_name='childsearchkey',
+            index=models.Index(fields=['key', 'facility_id', 'child'], name='child_search_key_idx'),
+        ),
+    ]
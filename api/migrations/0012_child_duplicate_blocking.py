@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-16 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_child_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='child',
+            name='child_phone_idx',
+        ),
+        migrations.AddField(
+            model_name='child',
+            name='block_key',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='child',
+            index=models.Index(fields=['phone_e164', 'date_of_birth'], name='child_phone_dob_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='child',
+            index=models.Index(fields=['block_key', 'date_of_birth'], name='child_block_dob_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    State-only: 0001_initial recorded django.contrib.auth's UserManager on
+    User, but the model uses api.models.UserManager, which is not
+    serialized into migrations, so makemigrations kept reporting the
+    difference. No database change.
+    """
+
+    dependencies = [
+        ('api', '0012_child_duplicate_blocking'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+            ],
+        ),
+    ]
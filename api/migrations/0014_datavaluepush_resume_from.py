@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datavaluepush',
+            name='resume_from',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,80 @@
+import collections
+import datetime
+
+from django.db.models import Q
+from django.utils.timezone import now
+
+from api.catalogue import get_catalogue
+from api.signals import doses_missed
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def mark_missed_doses(batch_size=DEFAULT_BATCH_SIZE, today=None, dry_run=False):
+    """
+    Mark scheduled doses as missed once they are more than their vaccine's
+    ``grace_days`` past ``scheduled_date``.
+
+    Vaccines are grouped by grace period so each pass is a range scan of
+    the (status, scheduled_date) index. Every batch is a short
+    ``UPDATE ... WHERE id IN (...) AND status = 'scheduled'`` in its own
+    transaction, so no lock is held across the whole table and doses
+    recorded as given in the meantime are left alone. ``last_updated`` is
+    set so summaries and sync clients pick the change up.
+
+    Returns a {facility_id: count} dict of the doses this run marked and
+    sends it with ``doses_missed``.
+    """
+    from .models import Vaccination
+
+    today = today or datetime.date.today()
+    by_grace = collections.defaultdict(list)
+    for vaccine in get_catalogue().vaccines:
+        by_grace[vaccine.grace_days].append(vaccine.id)
+
+    counts = collections.Counter()
+    for grace, vaccine_ids in sorted(by_grace.items()):
+        overdue = Vaccination.objects.filter(
+            status="scheduled",
+            scheduled_date__lt=today - datetime.timedelta(days=grace),
+            vaccine_id__in=vaccine_ids,
+        ).order_by("scheduled_date", "id")
+
+        last = None
+        while True:
+            page = overdue
+            if dry_run and last:
+                # Nothing is updated, so step past the previous batch
+                date, vac_id = last
+                page = overdue.filter(
+                    Q(scheduled_date__gt=date) | Q(scheduled_date=date, id__gt=vac_id)
+                )
+            rows = list(
+                page.values_list("scheduled_date", "id", "child__facility_id")[
+                    :batch_size
+                ]
+            )
+            if not rows:
+                break
+            last = rows[-1][:2]
+            if not dry_run:
+                ids = [row[1] for row in rows]
+                stamp = now()
+                updated = Vaccination.objects.filter(
+                    id__in=ids, status="scheduled"
+                ).update(status="missed", last_updated=stamp)
+                if updated < len(rows):
+                    # Some were recorded meanwhile; count only the doses
+                    # this update changed
+                    marked = set(
+                        Vaccination.objects.filter(
+                            id__in=ids, status="missed", last_updated=stamp
+                        ).values_list("id", flat=True)
+                    )
+                    rows = [row for row in rows if row[1] in marked]
+            counts.update(row[2] for row in rows)
+
+    counts = dict(counts)
+    if not dry_run:
+        doses_missed.send(sender=Vaccination, counts=counts, cutoff_date=today)
+    return counts
@@ -1,9 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.timezone import now
 
-from api.utils import adjust_to_facility_day
-
 
 # Custom User with roles
 class UserManager(BaseUserManager):
@@ -69,28 +67,61 @@ class Child(models.Model):
     facility = models.ForeignKey(Facility, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
+    # Search columns derived on save, see api.search
+    phone_e164 = models.CharField(max_length=16, blank=True, editable=False)
+    name_normalized = models.CharField(max_length=255, blank=True, editable=False)
+    # Sorted phonetic name codes, the duplicate detection block, see api.duplicates
+    block_key = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["facility", "date_of_birth"], name="child_facility_dob_idx"
+            ),
+            models.Index(
+                fields=["phone_e164", "date_of_birth"], name="child_phone_dob_idx"
+            ),
+            models.Index(
+                fields=["block_key", "date_of_birth"], name="child_block_dob_idx"
+            ),
+            models.Index(
+                fields=["facility", "last_updated", "id"], name="child_sync_idx"
+            ),
+        ]
 
     def save(self, *args, **kwargs):
+        from api import search
+
         creating = self.pk is None
+        search.prepare(self)
         if not self.uid:
-            self.facility.reg_counter += 1
-            self.facility.save()
-            self.uid = f"{self.facility.state[:2].upper()}{self.facility.lga[:2].upper()}{self.facility.code}{self.facility.reg_counter:04d}"
-        super().save(*args, **kwargs)
+            from api.uids import next_reg_number
+
+            # Reserved before the transaction below so the facility row is
+            # not locked while the schedule and search keys are written
+            self.uid = self.build_uid(self.facility, next_reg_number(self.facility))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if creating:
+                self.generate_vaccination_schedule()
+            search.index_children([self], replace=not creating)
 
-        if creating:
-            self.generate_vaccination_schedule()
+    @staticmethod
+    def build_uid(facility, counter):
+        return f"{facility.state[:2].upper()}{facility.lga[:2].upper()}{facility.code}{counter:04d}"
 
     def generate_vaccination_schedule(self):
-        from .models import VaccineMaster, Vaccination
-        import datetime
+        from api.scheduling import generate_schedules
 
-        vaccines = VaccineMaster.objects.all().order_by("order")
-        for v in vaccines:
-            scheduled = self.date_of_birth + datetime.timedelta(days=v.interval_days)
-            scheduled = adjust_to_facility_day(scheduled, self.facility)
+        return generate_schedules([self])
 
-            Vaccination.objects.create(child=self, vaccine=v, scheduled_date=scheduled)
+
+def default_series(name):
+    """
+    Series a vaccine belongs to when none is given, e.g. "Penta3" -> "Penta".
+    """
+    return name.rstrip("0123456789 ") or name
 
 
 class VaccineMaster(models.Model):
@@ -98,6 +129,12 @@ class VaccineMaster(models.Model):
     dose_number = models.PositiveIntegerField(default=1)  # e.g., 1 for OPV1, 2 for OPV2
     interval_days = models.PositiveIntegerField()  # days after birth
     order = models.PositiveIntegerField()  # sequence across all vaccines
+    # Series used for dropout reporting, e.g. OPV and bOPV are distinct series
+    series = models.CharField(max_length=50, blank=True, db_index=True)
+    # Minimum days after the previous dose of the same series (catch-up rule)
+    min_interval_days = models.PositiveIntegerField(null=True, blank=True)
+    # Days after the scheduled date before an ungiven dose is marked missed
+    grace_days = models.PositiveIntegerField(default=14)
 
     class Meta:
         unique_together = ("name", "dose_number")
@@ -106,6 +143,11 @@ class VaccineMaster(models.Model):
     def __str__(self):
         return f"{self.name} Dose {self.dose_number}"
 
+    def save(self, *args, **kwargs):
+        if not self.series:
+            self.series = default_series(self.name)
+        super().save(*args, **kwargs)
+
 
 class Vaccination(models.Model):
     child = models.ForeignKey(
@@ -129,6 +171,23 @@ class Vaccination(models.Model):
 
     class Meta:
         unique_together = ("child", "vaccine")
+        indexes = [
+            # Report hot paths: dropout counts, compliance and defaulters
+            models.Index(fields=["status", "vaccine"], name="vacc_status_vaccine_idx"),
+            models.Index(
+                fields=["status", "scheduled_date"], name="vacc_status_sched_idx"
+            ),
+            models.Index(
+                fields=["child"],
+                condition=models.Q(status="missed"),
+                name="vacc_missed_child_idx",
+            ),
+            models.Index(fields=["last_updated", "id"], name="vacc_sync_idx"),
+            # Monthly doses-given aggregation (DHIS2 data values)
+            models.Index(
+                fields=["status", "actual_date"], name="vacc_status_actual_idx"
+            ),
+        ]
 
 
 class SMSLog(models.Model):
@@ -139,6 +198,44 @@ class SMSLog(models.Model):
         max_length=20, choices=[("sent", "Sent"), ("failed", "Failed")]
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["child", "sent_at"], name="smslog_child_sent_idx"),
+        ]
+
+
+class OutboundMessage(models.Model):
+    """
+    Durable SMS queue drained by the ``send_queued_sms`` worker command.
+    One message may cover several children (e.g. siblings); an SMSLog row
+    is written for each of them once the delivery outcome is known.
+    """
+
+    STATUSES = [
+        ("queued", "Queued"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+    phone = models.CharField(max_length=20)
+    message = models.TextField()
+    child_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUSES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    provider = models.CharField(max_length=50, blank=True)
+    provider_message_id = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="outbound_due_idx"
+            ),
+        ]
+
 
 class FacilityVaccinationDay(models.Model):
     DAYS = [
@@ -161,3 +258,100 @@ class FacilityVaccinationDay(models.Model):
 
     def __str__(self):
         return f"{self.facility.name} - {self.get_day_of_week_display()}"
+
+
+class Watermark(models.Model):
+    """
+    Progress marker for incremental background jobs (e.g. summary refresh).
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+
+class VaccinationSummary(models.Model):
+    """
+    Pre-aggregated Vaccination counts per facility, vaccine and scheduled
+    month. Rebuilt per facility by ``api.reports.refresh_summaries``.
+    """
+
+    facility = models.ForeignKey(
+        Facility, on_delete=models.CASCADE, related_name="summaries"
+    )
+    vaccine = models.ForeignKey(VaccineMaster, on_delete=models.CASCADE)
+    month = models.DateField()  # first day of the scheduled month
+    lga = models.CharField(max_length=100)
+    state = models.CharField(max_length=100)
+    given = models.PositiveIntegerField(default=0)
+    on_time = models.PositiveIntegerField(default=0)
+    missed = models.PositiveIntegerField(default=0)
+    scheduled = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("facility", "vaccine", "month")
+        indexes = [
+            models.Index(fields=["state", "lga"], name="summary_state_lga_idx"),
+            models.Index(fields=["vaccine", "month"], name="summary_vaccine_month_idx"),
+        ]
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted row, so offline clients can drop it on their next sync.
+    """
+
+    model = models.CharField(max_length=50)  # e.g. "child", "vaccination"
+    object_id = models.BigIntegerField()
+    facility_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["facility_id", "deleted_at", "id"], name="tombstone_sync_idx"
+            ),
+        ]
+
+
+class ChildSearchKey(models.Model):
+    """
+    Phonetic name key of a child, see api.search. ``facility_id`` is copied
+    from the child so a facility-scoped lookup is a single index range.
+    """
+
+    child = models.ForeignKey(
+        Child, on_delete=models.CASCADE, related_name="search_keys"
+    )
+    facility_id = models.BigIntegerField()
+    key = models.CharField(max_length=32)  # e.g. "n:md", "p:bl:md"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["key", "facility_id", "child"], name="child_search_key_idx"
+            ),
+        ]
+
+
+class DataValuePush(models.Model):
+    """
+    Progress of sending one period's DHIS2 data values, so an interrupted
+    push resumes from the facility the last accepted chunk ended in.
+    """
+
+    STATUSES = [("running", "Running"), ("done", "Done"), ("failed", "Failed")]
+
+    period = models.CharField(max_length=20, unique=True)  # e.g. "202609"
+    status = models.CharField(max_length=20, choices=STATUSES, default="running")
+    sent = models.PositiveIntegerField(default=0)  # data values accepted so far
+    # Facility id the next run starts from (its values are sent again)
+    resume_from = models.BigIntegerField(null=True, blank=True)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.period} ({self.status}, {self.sent} sent)"
@@ -0,0 +1,80 @@
+from django.conf import settings
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def get_limit(request, default=None):
+    """
+    Page size from ``?limit=``, capped at ``API_MAX_PAGE_SIZE``.
+    """
+    default = default or getattr(settings, "API_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, "API_MAX_PAGE_SIZE", MAX_PAGE_SIZE)
+    try:
+        limit = int(request.query_params.get("limit", default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def cursor_paginate(queryset, request, default=None):
+    """
+    Keyset pagination on ``id``: returns ``(rows, next_cursor)`` where
+    ``?cursor=`` is the last id of the previous page.
+    """
+    limit = get_limit(request, default)
+    try:
+        cursor = int(request.query_params.get("cursor", 0))
+    except ValueError:
+        cursor = 0
+    rows = list(queryset.filter(id__gt=cursor).order_by("id")[: limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+
+def paginate(queryset, request, default=None):
+    """
+    Paginate ``queryset`` by ``?cursor=`` (keyset on id) when given, else by
+    ``?offset=``. Returns ``(rows, meta)``; ``meta`` holds the value to send
+    back for the next page (``next_cursor`` or ``next_offset``), or None.
+    """
+    if "cursor" in request.query_params:
+        rows, next_cursor = cursor_paginate(queryset, request, default)
+        return rows, {"next_cursor": next_cursor}
+
+    limit = get_limit(request, default)
+    try:
+        offset = max(0, int(request.query_params.get("offset", 0)))
+    except ValueError:
+        offset = 0
+    rows = list(queryset.order_by("id")[offset : offset + limit + 1])
+    next_offset = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_offset = offset + limit
+    return rows, {"next_offset": next_offset}
+
+
+def requested_fields(request, serializer_class):
+    """
+    Field names asked for with ``?fields=a,b,c`` that the serializer knows,
+    or None to return every field.
+    """
+    raw = request.query_params.get("fields")
+    if not raw:
+        return None
+    known = serializer_class().fields
+    fields = [f.strip() for f in raw.split(",")]
+    return [f for f in fields if f in known and not known[f].write_only] or None
+
+
+def project(queryset, fields):
+    """
+    Restrict the columns fetched by ``queryset`` to ``fields`` (plus id).
+    """
+    if not fields:
+        return queryset
+    concrete = {f.name for f in queryset.model._meta.concrete_fields}
+    return queryset.only("id", *[f for f in fields if f in concrete])
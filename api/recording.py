@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.utils.timezone import now
+
+from api.scheduling import reschedule_after
+from api.serializers import VaccinationEditSerializer, VaccinationSerializer
+
+
+def apply_vaccination_edits(edits, user, detect_conflicts=False):
+    """
+    Apply a batch of dose recordings.
+
+    Edits are validated together with ``VaccinationEditSerializer(many=True)``,
+    then, in one transaction, the target rows are fetched and locked with
+    one ``select_for_update().in_bulk()`` and all changes are written with
+    one ``bulk_update``. With ``detect_conflicts``
+    an edit carrying the ``last_updated`` value the client last saw is
+    rejected when the row has changed on the server since. Returns one
+    result per edit, in order.
+    """
+    from .models import Vaccination
+
+    serializer = VaccinationEditSerializer(data=edits, many=True)
+    if serializer.is_valid():
+        errors = [{}] * len(edits)
+        validated = list(serializer.validated_data)
+    else:
+        errors = serializer.errors
+        valid = [i for i, e in enumerate(errors) if not e]
+        retry = VaccinationEditSerializer(data=[edits[i] for i in valid], many=True)
+        retry.is_valid(raise_exception=True)
+        validated = [None] * len(edits)
+        for i, data in zip(valid, retry.validated_data):
+            validated[i] = data
+
+    with transaction.atomic():
+        # Locked until the edits are written, so two devices cannot both pass
+        # the conflict check against the same version of a row
+        rows = Vaccination.objects.select_for_update().in_bulk(
+            [data["vac_id"] for data in validated if data is not None]
+        )
+
+        results = []
+        changed = {}
+        recorded = []
+        fields = {"health_worker", "last_updated"}
+        stamp = now()
+        for index, data in enumerate(validated):
+            if data is None:
+                results.append(
+                    {
+                        "vac_id": edits[index].get("vac_id")
+                        if isinstance(edits[index], dict)
+                        else None,
+                        "status": "error",
+                        "errors": errors[index],
+                    }
+                )
+                continue
+            vac_id = data.pop("vac_id")
+            seen = data.pop("last_updated", None)
+            vaccination = rows.get(vac_id)
+            if vaccination is None:
+                results.append({"vac_id": vac_id, "status": "not_found"})
+                continue
+            if vac_id in changed:
+                results.append({"vac_id": vac_id, "status": "duplicate"})
+                continue
+            if (
+                detect_conflicts
+                and seen is not None
+                and vaccination.last_updated > seen
+            ):
+                results.append(
+                    {
+                        "vac_id": vac_id,
+                        "status": "conflict",
+                        "server": VaccinationSerializer(vaccination).data,
+                    }
+                )
+                continue
+
+            for name, value in data.items():
+                setattr(vaccination, name, value)
+                fields.add(name)
+            vaccination.health_worker = user
+            vaccination.last_updated = stamp
+            changed[vac_id] = vaccination
+            if "status" in data or "actual_date" in data:
+                recorded.append(vaccination)
+            results.append({"vac_id": vac_id, "status": "updated"})
+
+        if changed:
+            Vaccination.objects.bulk_update(list(changed.values()), sorted(fields))
+            reschedule_after(recorded)
+
+    for result in results:
+        if result["status"] == "updated":
+            result["last_updated"] = stamp
+    return results
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from api import search
+from api.catalogue import get_catalogue
+from api.scheduling import generate_schedules
+from api.uids import reserve_reg_numbers
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def get_chunk_size(value=None):
+    """
+    Resolve the import chunk size from a request value or settings.
+    """
+    default = getattr(settings, "BATCH_REGISTRATION_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+    try:
+        size = int(value) if value else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, default * 10))
+
+
+def parse_upload(upload):
+    """
+    Read child rows from an uploaded CSV or NDJSON file.
+    The format is chosen from the file extension, then the content type.
+    """
+    name = (upload.name or "").lower()
+    content_type = getattr(upload, "content_type", "") or ""
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig")
+
+    if name.endswith(".csv") or "csv" in content_type:
+        return [dict(row) for row in csv.DictReader(text)]
+
+    rows = []
+    for lineno, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            raise ValueError(f"Invalid JSON on line {lineno}")
+    return rows
+
+
+def import_children(validated_rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert validated child rows in chunks, one transaction per chunk.
+
+    ``validated_rows`` is a list of ``(row_index, validated_data)`` pairs.
+    A chunk that fails to save is rolled back on its own and the import
+    carries on with the next one. Returns ``(created, failed)``:
+    ``{row_index: child}`` for every row that was created and
+    ``{row_index: error}`` for the rows of failed chunks, so a client can
+    resubmit exactly those.
+    """
+    from .models import Child
+
+    vaccines = get_catalogue().vaccines
+    created = {}
+    failed = {}
+
+    for start in range(0, len(validated_rows), chunk_size):
+        chunk = validated_rows[start : start + chunk_size]
+        by_facility = {}
+        for index, data in chunk:
+            by_facility.setdefault(data["facility"].pk, []).append((index, data))
+        try:
+            # Numbers are reserved in their own short transactions, so the
+            # facility rows stay unlocked while the chunk is written; a
+            # failed chunk leaves a gap in the numbering
+            children = []
+            for rows in by_facility.values():
+                facility = rows[0][1]["facility"]
+                counter = reserve_reg_numbers(facility, len(rows))
+                for offset, (index, data) in enumerate(rows):
+                    child = Child(**data)
+                    child.uid = Child.build_uid(facility, counter + offset)
+                    search.prepare(child)
+                    children.append((index, child))
+
+            with transaction.atomic():
+                Child.objects.bulk_create([c for _, c in children])
+                generate_schedules([c for _, c in children], vaccines=vaccines)
+                search.index_children([c for _, c in children])
+        except DatabaseError as exc:
+            failed.update((index, str(exc)) for index, _ in chunk)
+        else:
+            created.update(children)
+    return created, failed
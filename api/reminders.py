@@ -0,0 +1,141 @@
+import datetime
+import itertools
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import now
+
+DEFAULT_TEMPLATE = (
+    "Immunization reminder from {facility}: {doses}. "
+    "Please bring your child's card."
+)
+
+
+def render_reminder(facility, children):
+    """
+    One SMS for a caregiver. ``children`` is a list of
+    ``(name, [(vaccine, date), ...])`` in schedule order.
+    """
+    template = getattr(settings, "REMINDER_TEMPLATE", DEFAULT_TEMPLATE)
+    parts = []
+    for name, doses in children:
+        by_date = {}
+        for vaccine, date in doses:
+            by_date.setdefault(date, []).append(vaccine)
+        due = "; ".join(
+            f"{', '.join(vaccines)} on {date:%a %d %b}"
+            for date, vaccines in by_date.items()
+        )
+        parts.append(f"{name} is due for {due}")
+    return template.format(facility=facility, doses=" | ".join(parts))
+
+
+def caregiver_groups(rows):
+    """
+    Group reminder ``rows`` (see ``generate_reminders``) by caregiver
+    number, yielding ``(phone, rows)``.
+
+    Rows with a stored E.164 number are streamed in number order. The few
+    without one (not backfilled yet, or not a valid number) are normalized
+    here, held in memory and merged into the group of the same number, or
+    given their own group after the stream.
+    """
+    from .search import normalize_phone
+
+    loose = {}
+    unindexed = rows.filter(child__phone_e164="").order_by("child_id", "scheduled_date")
+    for row in unindexed.iterator():
+        phone = normalize_phone(row[1]) or row[1]
+        loose.setdefault(phone, []).append(row)
+
+    stream = (
+        rows.exclude(child__phone_e164="")
+        .order_by("child__phone_e164", "child_id", "scheduled_date")
+        .iterator(chunk_size=5000)
+    )
+    for phone, group in itertools.groupby(stream, key=lambda row: row[0]):
+        yield phone, itertools.chain(group, loose.pop(phone, ()))
+    yield from loose.items()
+
+
+def generate_reminders(
+    window_days=7, cooldown_days=3, batch_size=1000, today=None, dry_run=False
+):
+    """
+    Queue one reminder SMS per caregiver for doses due in the next
+    ``window_days`` days.
+
+    Doses are streamed in caregiver order with a server-side cursor, so
+    memory holds a single caregiver's group at a time; siblings sharing a
+    number get one message, whatever way it was written. Children sent an
+    SMS in the last ``cooldown_days`` days are excluded in the query
+    itself, and children of messages still queued or being sent are
+    skipped. Messages are bulk-inserted into the outbound queue
+    ``batch_size`` at a time. Returns ``(doses, messages)``.
+    """
+    from .models import OutboundMessage, SMSLog, Vaccination
+
+    today = today or datetime.date.today()
+    recent = SMSLog.objects.filter(
+        child_id=OuterRef("child_id"),
+        sent_at__gte=now() - datetime.timedelta(days=cooldown_days),
+    )
+    # Their SMSLog rows are only written once delivery is known
+    queued = set()
+    for child_ids in (
+        OutboundMessage.objects.filter(status__in=["queued", "sending"])
+        .values_list("child_ids", flat=True)
+        .iterator()
+    ):
+        queued.update(child_ids)
+    rows = (
+        Vaccination.objects.filter(
+            status="scheduled",
+            scheduled_date__gte=today,
+            scheduled_date__lte=today + datetime.timedelta(days=window_days),
+        )
+        .exclude(Exists(recent))
+        .values_list(
+            "child__phone_e164",
+            "child__caregiver_contact",
+            "child_id",
+            "child__full_name",
+            "child__facility__name",
+            "vaccine__name",
+            "vaccine__dose_number",
+            "scheduled_date",
+        )
+    )
+
+    pending = []
+    doses = messages = 0
+    for phone, group in caregiver_groups(rows):
+        children = {}
+        facility = None
+        for _, _, child_id, name, facility_name, vaccine, dose, date in group:
+            if child_id in queued:
+                continue
+            doses += 1
+            facility = facility or facility_name
+            label = vaccine if vaccine[-1:].isdigit() else f"{vaccine}{dose}"
+            children.setdefault(child_id, (name, []))[1].append((label, date))
+        if not children:
+            continue
+
+        pending.append(
+            OutboundMessage(
+                phone=phone,
+                message=render_reminder(facility, list(children.values())),
+                child_ids=list(children),
+            )
+        )
+        if len(pending) >= batch_size:
+            messages += len(pending)
+            if not dry_run:
+                OutboundMessage.objects.bulk_create(pending)
+            pending = []
+
+    messages += len(pending)
+    if pending and not dry_run:
+        OutboundMessage.objects.bulk_create(pending)
+    return doses, messages
@@ -0,0 +1,296 @@
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils.timezone import now
+
+
+SUMMARY_WATERMARK = "vaccination_summary"
+# Re-read rows touched slightly before the last watermark so writes from
+# transactions that were still open during the previous refresh are not lost
+SUMMARY_OVERLAP = datetime.timedelta(minutes=5)
+
+
+def use_summaries():
+    """
+    Reports read the summary tables once they have been built, unless
+    ``REPORTS_USE_SUMMARIES`` is turned off.
+    """
+    from .models import Watermark
+
+    if not getattr(settings, "REPORTS_USE_SUMMARIES", True):
+        return False
+    return Watermark.objects.filter(name=SUMMARY_WATERMARK).exists()
+
+
+def compliance_counts():
+    """
+    Return ``(given, on_time)`` across all vaccinations.
+    """
+    from .models import Vaccination, VaccinationSummary
+
+    if use_summaries():
+        totals = VaccinationSummary.objects.aggregate(
+            given=Sum("given"), on_time=Sum("on_time")
+        )
+    else:
+        totals = Vaccination.objects.aggregate(
+            given=Count("id", filter=Q(status="given")),
+            on_time=Count(
+                "id", filter=Q(status="given", actual_date__lte=F("scheduled_date"))
+            ),
+        )
+    return totals["given"] or 0, totals["on_time"] or 0
+
+
+def dropout_counts(series):
+    """
+    Count children given the first and the last dose of each series.
+
+    ``series`` maps a series name to its ordered doses (e.g. the catalogue's
+    ``multi_dose_series()``). All series are counted with one query grouped
+    by vaccine, so no join with the catalogue table is needed; returns
+    ``{series: (first_count, last_count)}``.
+    """
+    from .models import Vaccination, VaccinationSummary
+
+    ids = {doses[0].id for doses in series.values()}
+    ids.update(doses[-1].id for doses in series.values())
+    if not ids:
+        return {}
+
+    if use_summaries():
+        rows = (
+            VaccinationSummary.objects.filter(vaccine_id__in=ids)
+            .values_list("vaccine_id")
+            .annotate(given=Sum("given"))
+        )
+    else:
+        rows = (
+            Vaccination.objects.filter(status="given", vaccine_id__in=ids)
+            .values_list("vaccine_id")
+            .annotate(given=Count("id"))
+        )
+    given = dict(rows.order_by())
+    return {
+        name: (given.get(doses[0].id) or 0, given.get(doses[-1].id) or 0)
+        for name, doses in series.items()
+    }
+
+
+COVERAGE_LEVELS = {
+    "state": ["state"],
+    "lga": ["state", "lga"],
+    "ward": ["state", "lga", "ward"],
+    "facility": ["id", "code", "name", "state", "lga", "ward"],
+}
+COVERAGE_FILTERS = ("state", "lga", "ward")
+
+
+def _rate(part, whole):
+    return round((part / whole) * 100, 2) if whole else 0
+
+
+def coverage_report(level, filters, doses):
+    """
+    Compliance, dropout and defaulter counts per geographic unit.
+
+    ``level`` is one of ``COVERAGE_LEVELS``; ``filters`` narrows the
+    facilities by state/lga/ward and ``doses`` are the doses of the series
+    dropout is reported for (``Catalogue.get_series()``, not empty). Dose
+    counts come from one grouped query
+    (summary tables when available) and defaulters from a second one.
+    Results are cached per level, filters and series for
+    ``REPORT_CACHE_TIMEOUT`` seconds.
+    """
+    from .models import Vaccination, VaccinationSummary
+
+    series_name = doses[0].series
+    params = "|".join(f"{f}={filters.get(f) or ''}" for f in COVERAGE_FILTERS)
+    digest = hashlib.md5(f"{params}|{series_name}".encode()).hexdigest()
+    key = f"coverage:{level}:{digest}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    fields = COVERAGE_LEVELS[level]
+    first_id = doses[0].id
+    last_id = doses[-1].id if len(doses) > 1 else None
+
+    if use_summaries():
+        # state and lga are copied onto the summary rows and indexed
+        # (summary_state_lga_idx), so they need no join with Facility
+        def path(name):
+            return name if name in ("state", "lga") else f"facility__{name}"
+
+        base = VaccinationSummary.objects
+        totals = {
+            "total_given": Sum("given"),
+            "total_on_time": Sum("on_time"),
+            "started": Sum("given", filter=Q(vaccine_id=first_id)),
+            "completed": Sum("given", filter=Q(vaccine_id=last_id)),
+        }
+    else:
+
+        def path(name):
+            return f"child__facility__{name}"
+
+        base = Vaccination.objects
+        totals = {
+            "total_given": Count("id", filter=Q(status="given")),
+            "total_on_time": Count(
+                "id", filter=Q(status="given", actual_date__lte=F("scheduled_date"))
+            ),
+            "started": Count("id", filter=Q(status="given", vaccine_id=first_id)),
+            "completed": Count("id", filter=Q(status="given", vaccine_id=last_id)),
+        }
+
+    where = {path(name): value for name, value in filters.items() if value}
+    group = [path(name) for name in fields]
+    rows = base.filter(**where).values(*group).annotate(**totals).order_by(*group)
+
+    defaulter_where = {
+        f"child__facility__{name}": value for name, value in filters.items() if value
+    }
+    defaulter_group = [f"child__facility__{name}" for name in fields]
+    defaulters = {
+        tuple(row[g] for g in defaulter_group): row["defaulters"]
+        for row in Vaccination.objects.filter(status="missed", **defaulter_where)
+        .values(*defaulter_group)
+        .annotate(defaulters=Count("child", distinct=True))
+        .order_by()
+    }
+
+    results = []
+    for row in rows:
+        unit = {name: row[path(name)] for name in fields}
+        given = row["total_given"] or 0
+        on_time = row["total_on_time"] or 0
+        started = row["started"] or 0
+        completed = row["completed"] or 0
+        results.append(
+            dict(
+                unit,
+                given=given,
+                on_time=on_time,
+                compliance_rate=_rate(on_time, given),
+                started=started,
+                completed=completed,
+                dropout_rate=_rate(started - completed, started),
+                defaulters=defaulters.get(tuple(unit[name] for name in fields), 0),
+            )
+        )
+
+    report = {
+        "level": level,
+        "filters": {f: filters[f] for f in COVERAGE_FILTERS if filters.get(f)},
+        "series": series_name,
+        "results": results,
+    }
+    cache.set(key, report, getattr(settings, "REPORT_CACHE_TIMEOUT", 300))
+    return report
+
+
+def rebuild_facility_summaries(facility_ids):
+    """
+    Recompute every summary row of the given facilities with one grouped
+    query and replace them in a single transaction.
+    """
+    from .models import Facility, Vaccination, VaccinationSummary
+
+    facility_ids = list(facility_ids)
+    rows = (
+        Vaccination.objects.filter(child__facility_id__in=facility_ids)
+        .annotate(month=TruncMonth("scheduled_date"))
+        .values("child__facility_id", "vaccine_id", "month")
+        .annotate(
+            given=Count("id", filter=Q(status="given")),
+            on_time=Count(
+                "id", filter=Q(status="given", actual_date__lte=F("scheduled_date"))
+            ),
+            missed=Count("id", filter=Q(status="missed")),
+            scheduled=Count("id", filter=Q(status="scheduled")),
+        )
+        .order_by()
+    )
+    places = dict(
+        (pk, (lga, state))
+        for pk, lga, state in Facility.objects.filter(pk__in=facility_ids).values_list(
+            "pk", "lga", "state"
+        )
+    )
+    summaries = [
+        VaccinationSummary(
+            facility_id=row["child__facility_id"],
+            vaccine_id=row["vaccine_id"],
+            month=row["month"],
+            lga=places[row["child__facility_id"]][0],
+            state=places[row["child__facility_id"]][1],
+            given=row["given"],
+            on_time=row["on_time"],
+            missed=row["missed"],
+            scheduled=row["scheduled"],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        VaccinationSummary.objects.filter(facility_id__in=facility_ids).delete()
+        VaccinationSummary.objects.bulk_create(summaries, batch_size=1000)
+    return len(summaries)
+
+
+def changed_facilities(since):
+    """
+    Ids of facilities with children or vaccinations written or deleted
+    after ``since``.
+    """
+    from .models import Child, Tombstone, Vaccination
+
+    ids = set(
+        Vaccination.objects.filter(last_updated__gt=since)
+        .values_list("child__facility_id", flat=True)
+        .distinct()
+    )
+    ids.update(
+        Child.objects.filter(last_updated__gt=since)
+        .values_list("facility_id", flat=True)
+        .distinct()
+    )
+    ids.update(
+        Tombstone.objects.filter(deleted_at__gt=since)
+        .values_list("facility_id", flat=True)
+        .distinct()
+    )
+    return ids
+
+
+def refresh_summaries(full=False, chunk_size=200):
+    """
+    Bring the summary tables up to date.
+
+    Incremental runs rebuild only facilities touched since the stored
+    watermark (``last_updated`` and tombstone based); ``full`` rebuilds
+    every facility. Returns ``(facilities, rows)`` refreshed.
+    """
+    from .models import Facility, VaccinationSummary, Watermark
+
+    started = now()
+    watermark = Watermark.objects.filter(name=SUMMARY_WATERMARK).first()
+    if full or watermark is None:
+        facility_ids = list(Facility.objects.values_list("pk", flat=True))
+        VaccinationSummary.objects.exclude(facility_id__in=facility_ids).delete()
+    else:
+        facility_ids = sorted(changed_facilities(watermark.value - SUMMARY_OVERLAP))
+
+    rows = 0
+    for start in range(0, len(facility_ids), chunk_size):
+        rows += rebuild_facility_summaries(facility_ids[start : start + chunk_size])
+
+    Watermark.objects.update_or_create(
+        name=SUMMARY_WATERMARK, defaults={"value": started}
+    )
+    return len(facility_ids), rows
@@ -0,0 +1,68 @@
+import datetime
+import time
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from api.catalogue import get_catalogue
+from api.facility_calendar import get_offsets
+from api.scheduling import load_doses, recompute_series
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def reschedule_facility(facility_id, batch_size=DEFAULT_BATCH_SIZE, today=None):
+    """
+    Move every future, still-scheduled dose of a facility onto its current
+    vaccination days.
+
+    Dates are recomputed with ``api.scheduling.due_date`` (birth interval,
+    spacing from the previous dose of the series, never earlier than
+    ``today``) and the facility's offset table. Children are read in
+    keyset-paginated batches on ``id``, sized so a batch holds about
+    ``batch_size`` doses, and each batch is written back with one
+    ``bulk_update``. Returns counts and throughput.
+    """
+    from .models import Child, Vaccination
+
+    today = today or datetime.date.today()
+    # Another worker may have committed the day change moments ago
+    offsets = {facility_id: get_offsets(facility_id, refresh=True)}
+    vaccines = get_catalogue().by_id
+    children = Child.objects.filter(facility_id=facility_id).order_by("id")
+    per_batch = max(1, batch_size // max(1, len(vaccines)))
+
+    scanned = updated = 0
+    last_id = 0
+    started = time.perf_counter()
+    while True:
+        ids = list(
+            children.filter(id__gt=last_id).values_list("id", flat=True)[:per_batch]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        rows = load_doses(Vaccination.objects.filter(child_id__in=ids))
+        scanned += sum(
+            1 for row in rows if row.status == "scheduled" and row.scheduled_date >= today
+        )
+        changed = recompute_series(rows, vaccines, offsets, earliest=today)
+        if changed:
+            stamp = now()
+            for row in changed:
+                row.last_updated = stamp
+            with transaction.atomic():
+                Vaccination.objects.bulk_update(
+                    changed, ["scheduled_date", "last_updated"]
+                )
+            updated += len(changed)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "facility": facility_id,
+        "scanned": scanned,
+        "updated": updated,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(scanned / elapsed, 1) if elapsed else None,
+    }
@@ -0,0 +1,165 @@
+import datetime
+from collections import defaultdict
+
+from api.catalogue import get_catalogue
+from api.facility_calendar import get_offsets_many, shift_to_facility_day
+
+
+def due_date(date_of_birth, vaccine, previous=None, offsets=None, earliest=None):
+    """
+    Date a dose falls due: ``interval_days`` after birth, but no sooner than
+    the vaccine's ``min_interval_days`` after ``previous`` (the date the
+    preceding dose of its series was given or is scheduled) nor before
+    ``earliest``, moved onto a facility day when ``offsets`` is given.
+    """
+    date = date_of_birth + datetime.timedelta(days=vaccine.interval_days)
+    if previous is not None and vaccine.min_interval_days:
+        date = max(date, previous + datetime.timedelta(days=vaccine.min_interval_days))
+    if earliest is not None:
+        date = max(date, earliest)
+    if offsets is not None:
+        date = shift_to_facility_day(date, offsets)
+    return date
+
+
+def build_schedule(child, vaccines, offsets):
+    """
+    Compute (without saving) the Vaccination rows for a single child.
+    ``vaccines`` is the ordered catalogue and ``offsets`` the facility's
+    next-allowed-day table from ``api.facility_calendar``.
+    """
+    from .models import Vaccination
+
+    rows = []
+    previous = {}
+    for v in vaccines:
+        date = due_date(child.date_of_birth, v, previous.get(v.series), offsets)
+        previous[v.series] = date
+        rows.append(Vaccination(child=child, vaccine_id=v.id, scheduled_date=date))
+    return rows
+
+
+def generate_schedules(children, vaccines=None, batch_size=None):
+    """
+    Create the vaccination schedule for every child in ``children``.
+
+    The vaccine catalogue and facility calendars come from their caches,
+    dates are computed in memory and all rows are written with a single
+    ``bulk_create``, so the query count does not grow with the size of the
+    catalogue.
+    """
+    from .models import Vaccination
+
+    children = list(children)
+    if not children:
+        return []
+    if vaccines is None:
+        vaccines = get_catalogue().vaccines
+
+    offsets = get_offsets_many(c.facility_id for c in children)
+    rows = []
+    for child in children:
+        rows.extend(build_schedule(child, vaccines, offsets[child.facility_id]))
+    return Vaccination.objects.bulk_create(rows, batch_size=batch_size)
+
+
+def load_doses(vaccinations):
+    """
+    Fetch the Vaccination rows selected by ``vaccinations`` (a queryset)
+    with only the fields schedule recomputation needs; their vaccines come
+    from the catalogue instead of a join.
+    """
+    return list(
+        vaccinations.select_related("child").only(
+            "id",
+            "vaccine_id",
+            "status",
+            "scheduled_date",
+            "actual_date",
+            "child__date_of_birth",
+            "child__facility_id",
+        )
+    )
+
+
+def recompute_series(rows, vaccines, offsets, after=None, earliest=None):
+    """
+    Recompute ``scheduled_date`` of still-scheduled doses in ``rows`` (as
+    returned by ``load_doses``, with ``vaccines`` the catalogue's ``by_id``
+    mapping), walking each child's series in order so
+    every dose respects the spacing from the one before it. A given dose
+    anchors the next one on its ``actual_date``.
+
+    With ``after`` (a set of Vaccination ids) only doses following one of
+    them in their series are touched. ``earliest`` skips doses scheduled
+    before it and keeps recomputed dates on or after it. Returns the
+    changed rows, unsaved.
+    """
+    chains = defaultdict(list)
+    for row in rows:
+        chains[row.child_id, vaccines[row.vaccine_id].series].append(row)
+
+    changed = []
+    for chain in chains.values():
+        chain.sort(key=lambda row: vaccines[row.vaccine_id].order)
+        child = chain[0].child
+        active = after is None
+        previous = None
+        for row in chain:
+            if (
+                active
+                and row.status == "scheduled"
+                and (earliest is None or row.scheduled_date >= earliest)
+            ):
+                date = due_date(
+                    child.date_of_birth,
+                    vaccines[row.vaccine_id],
+                    previous,
+                    offsets[child.facility_id],
+                    earliest,
+                )
+                if date != row.scheduled_date:
+                    row.scheduled_date = date
+                    changed.append(row)
+            if after is not None and row.id in after:
+                active = True
+            if row.status == "given" and row.actual_date:
+                previous = row.actual_date
+            else:
+                previous = row.scheduled_date
+    return changed
+
+
+def reschedule_after(recorded):
+    """
+    Catch-up scheduling: after doses in ``recorded`` were given (or their
+    dates changed), move the later doses of the same children and series so
+    they keep their minimum spacing. Costs one read of the affected series
+    and one ``bulk_update``; call it in the transaction that saved
+    ``recorded``. Returns the rescheduled rows.
+    """
+    from django.utils.timezone import now
+
+    from .models import Vaccination
+
+    recorded = list(recorded)
+    if not recorded:
+        return []
+    catalogue = get_catalogue()
+    series = {catalogue.by_id[v.vaccine_id].series for v in recorded}
+    rows = load_doses(
+        Vaccination.objects.filter(
+            child_id__in={v.child_id for v in recorded},
+            vaccine_id__in=[v.id for name in series for v in catalogue.series[name]],
+        )
+    )
+    offsets = get_offsets_many(row.child.facility_id for row in rows)
+    changed = recompute_series(
+        rows, catalogue.by_id, offsets, after={v.id for v in recorded}
+    )
+    if changed:
+        stamp = now()
+        for row in changed:
+            row.last_updated = stamp
+        Vaccination.objects.bulk_update(changed, ["scheduled_date", "last_updated"])
+    return changed
@@ -0,0 +1,206 @@
+"""
+Child search keys: E.164 phone numbers, normalized names and phonetic
+name keys, so lookups are B-tree index probes on any database instead of
+``icontains`` scans.
+
+Each child gets one ``ChildSearchKey`` row per name token ("n:<code>") and
+per pair of tokens ("p:<code>:<code>"), and the same for its caregiver's
+name with a "c" prefix ("cn:<code>", "cp:<code>:<code>"). Codes come from
+``phonetic``, a
+consonant skeleton tuned for common spelling variants of Nigerian names
+(Mohammed/Muhammad, Aisha/Ayisha/Aishat, Yusuf/Yusuph, Umar/Omar).
+"""
+import itertools
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+
+MAX_RESULTS = 50
+# Rows read per key; keys are probed with LIMIT so common names stay cheap
+CANDIDATES_PER_KEY = 200
+
+_DIGRAPHS = [
+    ("ph", "f"),
+    ("gh", "g"),
+    ("kh", "k"),
+    ("ck", "k"),
+    ("sh", "s"),
+    ("ch", "c"),
+    ("th", "t"),
+    ("dh", "d"),
+    ("q", "k"),
+    ("x", "ks"),
+]
+_SILENT = set("aeiouyhw")
+
+
+def normalize_phone(raw, country_code=None):
+    """
+    E.164 form of a phone number ("0803 123 4567" -> "+2348031234567"),
+    or "" when it cannot be one. Local numbers get ``PHONE_COUNTRY_CODE``.
+    """
+    raw = (raw or "").strip()
+    country_code = country_code or getattr(settings, "PHONE_COUNTRY_CODE", "234")
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        number = digits
+    elif raw.startswith("00"):
+        number = digits[2:]
+    elif digits.startswith(country_code) and len(digits) > len(country_code) + 8:
+        number = digits
+    elif digits.startswith("0"):
+        number = country_code + digits[1:]
+    else:
+        number = country_code + digits
+    if not 8 <= len(number) <= 15:
+        return ""
+    return "+" + number
+
+
+def normalize_name(name):
+    """
+    Lowercase ASCII letters and single spaces: "Ọlá  Adé-Bọ́lá" -> "ola ade bola".
+    """
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    ascii_name = decomposed.encode("ascii", "ignore").decode().lower()
+    return " ".join(re.sub(r"[^a-z]+", " ", ascii_name).split())
+
+
+def phonetic(token):
+    """
+    Phonetic code of one normalized name token.
+    """
+    if len(token) > 3 and token.endswith("at"):
+        token = token[:-1]  # Hausa/Yoruba "-at" variants: Aishat, Hadizat
+    for digraph, sound in _DIGRAPHS:
+        token = token.replace(digraph, sound)
+    first = "a" if token[0] in _SILENT - {"h", "w"} else token[0]
+    code = [first]
+    for char in token[1:]:
+        if char not in _SILENT and char != code[-1]:
+            code.append(char)
+    return "".join(code)[:12]
+
+
+def name_codes(normalized):
+    return sorted({phonetic(token) for token in normalized.split() if len(token) > 1})
+
+
+def name_keys(normalized, prefix=""):
+    """
+    Search keys for a normalized name: one per token and one per pair.
+    ``prefix`` is "c" for caregiver names.
+    """
+    codes = name_codes(normalized)
+    keys = [f"{prefix}n:{code}" for code in codes]
+    keys.extend(f"{prefix}p:{a}:{b}" for a, b in itertools.combinations(codes, 2))
+    return keys
+
+
+def prepare(child):
+    """
+    Fill the denormalized search columns of an unsaved or changed child.
+    """
+    child.phone_e164 = normalize_phone(child.caregiver_contact)
+    child.name_normalized = normalize_name(child.full_name)
+    child.block_key = ":".join(name_codes(child.name_normalized))[:64]
+
+
+def index_children(children, replace=False):
+    """
+    Write the name keys of saved ``children`` (prepared with ``prepare``)
+    in one bulk insert, first dropping their old keys if ``replace``.
+    """
+    from .models import ChildSearchKey
+
+    children = list(children)
+    if replace:
+        ChildSearchKey.objects.filter(child__in=children).delete()
+    ChildSearchKey.objects.bulk_create(
+        [
+            ChildSearchKey(child=child, facility_id=child.facility_id, key=key)
+            for child in children
+            for key in (
+                name_keys(child.name_normalized)
+                + name_keys(normalize_name(child.caregiver_name), prefix="c")
+            )
+        ],
+        batch_size=5000,
+    )
+
+
+def search_children(q="", phone="", facility=None, limit=20, caregiver=""):
+    """
+    Children matching a name, caregiver name and/or phone number, best
+    first, with a ``search_score`` attribute.
+
+    A phone match scores 10, each matching pair of name tokens 3 and each
+    matching token 1, for the child's and the caregiver's name alike; an
+    identical normalized child name adds 5. Every key is a limited index
+    probe, so the cost does not grow with the registry.
+    """
+    from .models import Child, ChildSearchKey
+
+    limit = max(1, min(limit, MAX_RESULTS))
+    scores = defaultdict(int)
+
+    number = normalize_phone(phone) if phone else ""
+    if number:
+        matches = Child.objects.filter(phone_e164=number)
+        if facility:
+            matches = matches.filter(facility_id=facility)
+        for pk in matches.values_list("id", flat=True)[:CANDIDATES_PER_KEY]:
+            scores[pk] += 10
+
+    normalized = normalize_name(q)
+    keys = name_keys(normalized) + name_keys(normalize_name(caregiver), prefix="c")
+    for key in keys:
+        matches = ChildSearchKey.objects.filter(key=key)
+        if facility:
+            matches = matches.filter(facility_id=facility)
+        weight = 3 if key.startswith(("p:", "cp:")) else 1
+        for pk in matches.values_list("child_id", flat=True)[:CANDIDATES_PER_KEY]:
+            scores[pk] += weight
+
+    best = sorted(scores, key=lambda pk: (-scores[pk], -pk))[: limit * 3]
+    children = list(Child.objects.filter(pk__in=best))
+    for child in children:
+        child.search_score = scores[child.pk]
+        if normalized and child.name_normalized == normalized:
+            child.search_score += 5
+    children.sort(key=lambda child: (-child.search_score, -child.pk))
+    return children[:limit]
+
+
+def rebuild_index(batch_size=2000, progress=None):
+    """
+    Recompute the search and blocking columns and keys of every child, one transaction
+    per batch of ``batch_size`` children taken in id order. Used to backfill
+    existing registries and after changing the normalization rules.
+    """
+    from django.db import transaction
+
+    from .models import Child
+
+    done, last_id = 0, 0
+    fields = ["id", "full_name", "caregiver_name", "caregiver_contact", "facility_id"]
+    derived = ["phone_e164", "name_normalized", "block_key"]
+    while True:
+        batch = list(
+            Child.objects.filter(id__gt=last_id).order_by("id").only(*fields)[
+                :batch_size
+            ]
+        )
+        if not batch:
+            return done
+        for child in batch:
+            prepare(child)
+        with transaction.atomic():
+            Child.objects.bulk_update(batch, derived)
+            index_children(batch, replace=True)
+        done += len(batch)
+        last_id = batch[-1].id
+        if progress:
+            progress(done)
@@ -7,16 +7,31 @@ from .models import (
     VaccineMaster,
     Vaccination,
     SMSLog,
+    OutboundMessage,
+    Tombstone,
 )
 
 
-class FacilitySerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Accepts ``fields=[...]`` to serialize only a subset of the declared fields.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class FacilitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Facility
         fields = "__all__"
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -31,26 +46,100 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves ids from a ``{pk: instance}`` map in the serializer context
+    (under ``cache_key``) so bulk validation does not query once per row.
+    """
+
+    def __init__(self, cache_key, **kwargs):
+        self.cache_key = cache_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        cache = self.context.get(self.cache_key)
+        if cache is None:
+            return super().to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in cache:
+            self.fail("does_not_exist", pk_value=data)
+        return cache[pk]
+
+
 class ChildSerializer(serializers.ModelSerializer):
+    facility = PreloadedPrimaryKeyRelatedField(
+        cache_key="facilities", queryset=Facility.objects.all()
+    )
+
     class Meta:
         model = Child
-        fields = "__all__"
+        # The search and duplicate detection columns stay internal
+        exclude = ["phone_e164", "name_normalized", "block_key"]
         read_only_fields = ["uid", "created_at", "last_updated"]
 
 
+class MissedDoseSerializer(serializers.ModelSerializer):
+    vaccine_name = serializers.CharField(source="vaccine.name", read_only=True)
+    dose_number = serializers.IntegerField(source="vaccine.dose_number", read_only=True)
+
+    class Meta:
+        model = Vaccination
+        fields = ["id", "vaccine", "vaccine_name", "dose_number", "scheduled_date"]
+
+
+class DefaulterSerializer(ChildSerializer):
+    # Filled by a Prefetch(to_attr="missed_doses") in the defaulters view
+    missed_doses = MissedDoseSerializer(many=True, read_only=True)
+
+
+class DuplicateCandidateSerializer(ChildSerializer):
+    # Set by api.duplicates.find_candidates
+    similarity = serializers.FloatField(source="duplicate_score", read_only=True)
+
+
+class ChildSearchResultSerializer(ChildSerializer):
+    # Set by api.search.search_children
+    score = serializers.IntegerField(source="search_score", read_only=True)
+
+
 class VaccineMasterSerializer(serializers.ModelSerializer):
     class Meta:
         model = VaccineMaster
         fields = "__all__"
 
 
-class VaccinationSerializer(serializers.ModelSerializer):
+class VaccinationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Vaccination
         fields = "__all__"
         read_only_fields = ["last_updated", "health_worker", "scheduled_date"]
 
 
+class VaccinationEditSerializer(serializers.Serializer):
+    """
+    One dose recording in a bulk or offline-sync upload. Plain fields only,
+    so validating a whole list needs no queries.
+    """
+
+    vac_id = serializers.IntegerField()
+    status = serializers.ChoiceField(
+        choices=Vaccination._meta.get_field("status").choices, required=False
+    )
+    actual_date = serializers.DateField(required=False, allow_null=True)
+    batch_number = serializers.CharField(
+        max_length=100, required=False, allow_null=True, allow_blank=True
+    )
+    geo_lat = serializers.FloatField(required=False, allow_null=True)
+    geo_long = serializers.FloatField(required=False, allow_null=True)
+    # Version the device last synced, used for conflict detection
+    last_updated = serializers.DateTimeField(required=False)
+
+
 class FacilityVaccinationDaySerializer(serializers.ModelSerializer):
     day_name = serializers.CharField(source="get_day_of_week_display", read_only=True)
 
@@ -63,3 +152,15 @@ class SMSLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = SMSLog
         fields = "__all__"
+
+
+class OutboundMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OutboundMessage
+        fields = ["id", "phone", "message", "child_ids", "status", "created_at"]
+
+
+class TombstoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tombstone
+        fields = ["model", "object_id", "deleted_at"]
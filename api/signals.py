@@ -0,0 +1,124 @@
+import threading
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from api import catalogue, facility_calendar, reports
+from api.models import (
+    Child,
+    Facility,
+    FacilityVaccinationDay,
+    Tombstone,
+    Vaccination,
+    VaccineMaster,
+)
+
+# Sent by api.missed_doses.mark_missed_doses after each run with
+# ``counts``, a {facility_id: doses marked missed} dict, and ``cutoff_date``
+doses_missed = Signal()
+# Facilities whose summaries are rebuilt together, as in refresh_summaries
+SUMMARY_CHUNK_SIZE = 200
+
+# Rows of the delete() in progress (``origin`` is the instance or queryset
+# it was called on). Django sends every pre_delete before removing any row,
+# so they are collected there and written as tombstones with one
+# bulk_create at the first post_delete, inside the delete's transaction
+_deleting = threading.local()
+
+
+def _invalidate_calendar_on_commit(facility_id):
+    # Until the change commits other workers still read the old days, so
+    # dropping the table any earlier could let them cache it again
+    transaction.on_commit(partial(facility_calendar.invalidate, facility_id))
+
+
+@receiver(post_save, sender=FacilityVaccinationDay)
+@receiver(post_delete, sender=FacilityVaccinationDay)
+def invalidate_facility_calendar(sender, instance, **kwargs):
+    _invalidate_calendar_on_commit(instance.facility_id)
+
+
+@receiver(post_save, sender=Facility)
+def reset_new_facility_calendar(sender, instance, created, **kwargs):
+    # A new facility may reuse the id of a deleted one
+    if created:
+        _invalidate_calendar_on_commit(instance.pk)
+
+
+@receiver(post_delete, sender=Facility)
+def drop_facility_calendar(sender, instance, **kwargs):
+    _invalidate_calendar_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=VaccineMaster)
+@receiver(post_delete, sender=VaccineMaster)
+def invalidate_catalogue(sender, instance, **kwargs):
+    catalogue.changed()
+
+
+@receiver(doses_missed)
+def refresh_missed_summaries(sender, counts, **kwargs):
+    # Defaulter and compliance reports read the summaries, which would
+    # otherwise count these doses as scheduled until the next refresh
+    if not counts or not reports.use_summaries():
+        return
+    facility_ids = sorted(counts)
+    for start in range(0, len(facility_ids), SUMMARY_CHUNK_SIZE):
+        reports.rebuild_facility_summaries(
+            facility_ids[start : start + SUMMARY_CHUNK_SIZE]
+        )
+
+
+def _pending(origin):
+    if getattr(_deleting, "origin", None) is not origin:
+        # A new delete; anything left over belongs to one that failed
+        _deleting.origin = origin
+        _deleting.children = {}
+        _deleting.doses = {}
+    return _deleting
+
+
+@receiver(pre_delete, sender=Child)
+def remember_child(sender, instance, origin=None, **kwargs):
+    _pending(origin).children[instance.pk] = instance.facility_id
+
+
+@receiver(pre_delete, sender=Vaccination)
+def remember_vaccination(sender, instance, origin=None, **kwargs):
+    _pending(origin).doses[instance.pk] = instance.child_id
+
+
+@receiver(post_delete, sender=Child)
+@receiver(post_delete, sender=Vaccination)
+def write_tombstones(sender, instance, origin=None, **kwargs):
+    pending = _pending(origin)
+    children, doses = pending.children, pending.doses
+    if not children and not doses:
+        return
+    pending.children, pending.doses = {}, {}
+
+    # Doses of deleted children are covered by the child's own tombstone
+    doses = {pk: child for pk, child in doses.items() if child not in children}
+    facilities = {}
+    if doses:
+        # Doses are removed before their children, which still exist here
+        facilities = dict(
+            Child.objects.filter(pk__in=set(doses.values())).values_list(
+                "pk", "facility_id"
+            )
+        )
+    Tombstone.objects.bulk_create(
+        [
+            Tombstone(model="child", object_id=pk, facility_id=facility_id)
+            for pk, facility_id in children.items()
+        ]
+        + [
+            Tombstone(
+                model="vaccination", object_id=pk, facility_id=facilities[child]
+            )
+            for pk, child in doses.items()
+            if child in facilities
+        ]
+    )
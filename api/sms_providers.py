@@ -0,0 +1,173 @@
+"""
+Pluggable SMS providers used by the outbound message worker.
+
+Providers are asynchronous so the worker can keep many requests in flight.
+The HTTP providers need ``httpx``; the fake provider needs nothing and is
+the default, so development and tests never reach a real gateway.
+"""
+import asyncio
+import collections
+import itertools
+import random
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+class SMSDeliveryError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class SMSProvider:
+    """
+    Base class: ``send`` returns the provider's message id or raises
+    ``SMSDeliveryError``. ``rate_limit`` is the maximum messages per second
+    and ``timeout`` the seconds a send may take before it is abandoned.
+    """
+
+    name = "base"
+    timeout = 10
+
+    def __init__(self, rate_limit=None, **options):
+        self.rate_limit = rate_limit
+        self.options = options
+
+    async def send(self, phone, message):
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class FakeProvider(SMSProvider):
+    """
+    Records the last ``outbox_size`` messages in memory instead of sending
+    them. ``fail_rate`` makes a share of sends fail with a retryable error;
+    ``latency`` simulates the gateway round trip in seconds.
+    """
+
+    name = "fake"
+    _ids = itertools.count(1)
+
+    def __init__(self, outbox_size=1000, **options):
+        super().__init__(**options)
+        self.outbox = collections.deque(maxlen=outbox_size)
+
+    async def send(self, phone, message):
+        latency = self.options.get("latency", 0)
+        if latency:
+            await asyncio.sleep(latency)
+        if random.random() < self.options.get("fail_rate", 0):
+            raise SMSDeliveryError("Simulated gateway failure")
+        message_id = f"fake-{next(self._ids)}"
+        self.outbox.append({"id": message_id, "phone": phone, "message": message})
+        return message_id
+
+
+class HTTPProvider(SMSProvider):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import httpx
+            except ImportError:
+                raise ImproperlyConfigured(
+                    f"The {self.name} SMS provider requires httpx (pip install httpx)"
+                )
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def post(self, url, **kwargs):
+        try:
+            response = await self.client.post(url, **kwargs)
+        except Exception as exc:  # network errors are worth retrying
+            raise SMSDeliveryError(f"{type(exc).__name__}: {exc}")
+        error = f"HTTP {response.status_code}: {response.text[:200]}"
+        if response.status_code == 429 or response.status_code >= 500:
+            raise SMSDeliveryError(error)
+        if response.status_code >= 400:
+            raise SMSDeliveryError(error, retryable=False)
+        return response.json()
+
+
+class TwilioProvider(HTTPProvider):
+    name = "twilio"
+
+    async def send(self, phone, message):
+        sid = self.options["account_sid"]
+        data = await self.post(
+            f"https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json",
+            auth=(sid, self.options["auth_token"]),
+            data={"From": self.options["sender"], "To": phone, "Body": message},
+        )
+        return data["sid"]
+
+
+class TermiiProvider(HTTPProvider):
+    name = "termii"
+
+    async def send(self, phone, message):
+        data = await self.post(
+            self.options.get("url", "https://api.ng.termii.com/api/sms/send"),
+            json={
+                "api_key": self.options["api_key"],
+                "to": phone,
+                "from": self.options["sender"],
+                "sms": message,
+                "type": "plain",
+                "channel": self.options.get("channel", "generic"),
+            },
+        )
+        return str(data["message_id"])
+
+
+class AfricasTalkingProvider(HTTPProvider):
+    name = "africastalking"
+
+    async def send(self, phone, message):
+        url = "https://api.africastalking.com/version1/messaging"
+        data = await self.post(
+            self.options.get("url", url),
+            headers={"apiKey": self.options["api_key"], "Accept": "application/json"},
+            data={
+                "username": self.options["username"],
+                "to": phone,
+                "message": message,
+                "from": self.options.get("sender", ""),
+            },
+        )
+        recipient = data["SMSMessageData"]["Recipients"][0]
+        if recipient.get("status") != "Success":
+            raise SMSDeliveryError(recipient.get("status", "Rejected"), retryable=False)
+        return recipient["messageId"]
+
+
+PROVIDERS = {
+    "fake": FakeProvider,
+    "twilio": TwilioProvider,
+    "termii": TermiiProvider,
+    "africastalking": AfricasTalkingProvider,
+}
+
+
+def get_provider():
+    """
+    Build the provider named by ``SMS_PROVIDER`` (a key of ``PROVIDERS`` or
+    a dotted path) with ``SMS_PROVIDER_OPTIONS`` as keyword arguments.
+    """
+    name = getattr(settings, "SMS_PROVIDER", "fake")
+    options = getattr(settings, "SMS_PROVIDER_OPTIONS", {})
+    provider_class = PROVIDERS.get(name) or import_string(name)
+    return provider_class(**options)
@@ -0,0 +1,261 @@
+"""
+Synthetic national-scale data for load testing and benchmarks.
+
+Rows are written in batches of children, each in its own transaction, so
+memory use stays flat however many rows are made. Doses, by far the
+largest table, skip model instances and go straight to ``executemany``.
+"""
+import datetime
+import random
+import time
+
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from api import search
+from api.facility_calendar import get_offsets_many
+from api.scheduling import due_date
+from api.uids import reserve_reg_numbers
+
+# (name, dose_number, days after birth, minimum days after the previous dose)
+NPI_CATALOGUE = [
+    ("BCG", 1, 0, None),
+    ("HepB", 1, 0, None),
+    ("OPV", 1, 0, None),
+    ("OPV", 2, 42, 28),
+    ("Penta", 1, 42, None),
+    ("PCV", 1, 42, None),
+    ("Rota", 1, 42, None),
+    ("OPV", 3, 70, 28),
+    ("Penta", 2, 70, 28),
+    ("PCV", 2, 70, 28),
+    ("Rota", 2, 70, 28),
+    ("OPV", 4, 98, 28),
+    ("Penta", 3, 98, 28),
+    ("PCV", 3, 98, 28),
+    ("IPV", 1, 98, None),
+    ("Measles", 1, 270, None),
+    ("Yellow Fever", 1, 270, None),
+    ("MenA", 1, 270, None),
+    ("Measles", 2, 450, 28),
+]
+
+STATES = {
+    "Lagos": ["Ikeja", "Surulere", "Alimosho", "Eti-Osa", "Kosofe"],
+    "Kano": ["Nassarawa", "Fagge", "Dala", "Gwale", "Tarauni"],
+    "Kaduna": ["Chikun", "Igabi", "Zaria", "Kaura"],
+    "Rivers": ["Obio-Akpor", "Port Harcourt", "Eleme", "Bonny"],
+    "Oyo": ["Ibadan North", "Ogbomosho North", "Oyo East", "Iseyin"],
+    "FCT": ["Municipal", "Bwari", "Gwagwalada", "Kuje"],
+    "Borno": ["Maiduguri", "Jere", "Konduga", "Biu"],
+    "Enugu": ["Enugu North", "Nsukka", "Udi", "Awgu"],
+    "Sokoto": ["Sokoto North", "Wamako", "Gwadabawa", "Tambuwal"],
+    "Anambra": ["Awka South", "Onitsha North", "Nnewi North", "Ihiala"],
+}
+
+FIRST_NAMES = (
+    "Amina Chinedu Tunde Ngozi Ibrahim Funmi Emeka Zainab Segun Halima Obinna "
+    "Aisha Kemi Musa"
+).split()
+LAST_NAMES = (
+    "Okafor Adeyemi Bello Eze Abubakar Ogunleye Nwosu Yusuf Okonkwo Lawal "
+    "Danjuma Ibe"
+).split()
+
+
+def ensure_catalogue():
+    """
+    Return the vaccine catalogue, creating the routine schedule if empty.
+    """
+    from .models import VaccineMaster
+
+    if not VaccineMaster.objects.exists():
+        for order, (name, dose, interval, min_interval) in enumerate(NPI_CATALOGUE):
+            VaccineMaster.objects.create(
+                name=name,
+                dose_number=dose,
+                interval_days=interval,
+                min_interval_days=min_interval,
+                order=order,
+            )
+    return list(VaccineMaster.objects.order_by("order"))
+
+
+def create_facilities(count, rng, prefix="SYN"):
+    """
+    Bulk-create ``count`` facilities spread over ``STATES``, each with one
+    to three vaccination days.
+    """
+    from .models import Facility, FacilityVaccinationDay
+
+    # Continue after the highest number used, which a count would not
+    # give once facilities have been deleted or added by hand
+    codes = Facility.objects.filter(code__startswith=prefix).values_list(
+        "code", flat=True
+    )
+    suffixes = (code[len(prefix) :] for code in codes)
+    start = max((int(s) + 1 for s in suffixes if s.isdigit()), default=0)
+    places = [(state, lga) for state, lgas in STATES.items() for lga in lgas]
+    facilities = []
+    for n in range(start, start + count):
+        state, lga = places[n % len(places)]
+        facilities.append(
+            Facility(
+                name=f"{lga} PHC {n}",
+                code=f"{prefix}{n:06d}",
+                ward=f"Ward {n % 12 + 1}",
+                lga=lga,
+                state=state,
+            )
+        )
+    facilities = Facility.objects.bulk_create(facilities, batch_size=1000)
+    FacilityVaccinationDay.objects.bulk_create(
+        [
+            FacilityVaccinationDay(facility=facility, day_of_week=day)
+            for facility in facilities
+            for day in rng.sample(range(5), rng.randint(1, 3))
+        ],
+        batch_size=5000,
+    )
+    return facilities
+
+
+def dose_outcome(vaccine, due, rng, today):
+    """
+    A plausible ``(status, actual_date)`` for a dose due on ``due``:
+    coverage falls with later doses, most given doses are on time and the
+    rest are late by up to two months.
+    """
+    if due >= today:
+        return "scheduled", None
+    if rng.random() < max(0.6, 0.95 - 0.015 * vaccine.order):
+        delay = 0 if rng.random() < 0.7 else rng.randint(1, 60)
+        return "given", min(due + datetime.timedelta(days=delay), today)
+    if due < today - datetime.timedelta(days=vaccine.grace_days):
+        return "missed", None
+    return "scheduled", None
+
+
+def insert_doses(rows):
+    """
+    Insert ``(child_id, vaccine_id, scheduled_date, status, actual_date)``
+    tuples into the Vaccination table with one ``executemany``.
+    """
+    from .models import Vaccination
+
+    meta = Vaccination._meta
+    fields = ["child", "vaccine", "scheduled_date", "status", "actual_date"]
+    columns = [meta.get_field(name).column for name in fields] + ["last_updated"]
+    sql = (
+        f"INSERT INTO {connection.ops.quote_name(meta.db_table)} "
+        f"({', '.join(connection.ops.quote_name(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    ops = connection.ops
+    stamp = ops.adapt_datetimefield_value(now())
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            sql,
+            [
+                (
+                    child_id,
+                    vaccine_id,
+                    ops.adapt_datefield_value(scheduled),
+                    status,
+                    ops.adapt_datefield_value(given),
+                    stamp,
+                )
+                for child_id, vaccine_id, scheduled, status, given in rows
+            ],
+        )
+
+
+def generate(
+    facilities=100,
+    children=10000,
+    sms_ratio=0.3,
+    batch_size=2000,
+    seed=0,
+    today=None,
+    progress=None,
+):
+    """
+    Create ``facilities`` facilities and ``children`` children (born within
+    the last two years) with full schedules, dose outcomes and SMS logs for
+    about ``sms_ratio`` of the children. ``progress`` is called with the
+    running counts after every batch. Returns the counts.
+    """
+    from .models import Child, SMSLog
+
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    vaccines = ensure_catalogue()
+    created = create_facilities(facilities, rng)
+    offsets = get_offsets_many(f.id for f in created)
+
+    counts = {"facilities": len(created), "children": 0, "vaccinations": 0, "sms": 0}
+    started = time.perf_counter()
+    for start in range(0, children, batch_size):
+        batch = []
+        for n in range(start, min(start + batch_size, children)):
+            facility = rng.choice(created)
+            batch.append(
+                Child(
+                    full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    sex=rng.choice(["male", "female"]),
+                    date_of_birth=today - datetime.timedelta(days=rng.randint(0, 730)),
+                    place_of_birth=rng.choice(["home", "facility", "facility"]),
+                    caregiver_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    caregiver_contact=f"080{rng.randint(0, 99999999):08d}",
+                    caregiver_address=f"{n % 200 + 1} {facility.lga} Road",
+                    facility=facility,
+                )
+            )
+
+        # Registration numbers are reserved with the same atomic increments
+        # as the API, so children registered meanwhile never share a UID
+        per_facility = {}
+        for child in batch:
+            per_facility.setdefault(child.facility_id, []).append(child)
+        for registered in per_facility.values():
+            facility = registered[0].facility
+            counter = reserve_reg_numbers(facility, len(registered))
+            for offset, child in enumerate(registered):
+                child.uid = Child.build_uid(facility, counter + offset)
+
+        for child in batch:
+            search.prepare(child)
+        with transaction.atomic():
+            batch = Child.objects.bulk_create(batch)
+            search.index_children(batch)
+            doses = []
+            for child in batch:
+                table = offsets[child.facility_id]
+                previous = {}
+                for vaccine in vaccines:
+                    date = due_date(
+                        child.date_of_birth, vaccine, previous.get(vaccine.series), table
+                    )
+                    status, given = dose_outcome(vaccine, date, rng, today)
+                    previous[vaccine.series] = given or date
+                    doses.append((child.id, vaccine.id, date, status, given))
+            insert_doses(doses)
+            messages = [
+                SMSLog(
+                    child=child,
+                    message=f"Reminder: {child.full_name} has an immunization due soon.",
+                    status="sent" if rng.random() < 0.95 else "failed",
+                )
+                for child in batch
+                if rng.random() < sms_ratio
+            ]
+            SMSLog.objects.bulk_create(messages, batch_size=5000)
+
+        counts["children"] += len(batch)
+        counts["vaccinations"] += len(doses)
+        counts["sms"] += len(messages)
+        if progress:
+            progress(counts, time.perf_counter() - started)
+
+    counts["seconds"] = round(time.perf_counter() - started, 3)
+    return counts
@@ -1,3 +1,2151 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import http.server
+import importlib.util
+import io
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    benchmark,
+    catalogue,
+    dhis2,
+    duplicates,
+    export,
+    facility_calendar,
+    metrics,
+    search,
+    synthetic,
+    uids,
+)
+from .messaging import (
+    STALE_SENDING,
+    RateLimiter,
+    batch_duration,
+    claim_batch,
+    enqueue,
+    process_batch,
+    record_results,
+)
+from .missed_doses import mark_missed_doses
+from .models import (
+    Child,
+    DataValuePush,
+    Facility,
+    FacilityVaccinationDay,
+    OutboundMessage,
+    SMSLog,
+    User,
+    Vaccination,
+    VaccinationSummary,
+    VaccineMaster,
+)
+from .reminders import generate_reminders
+from .reports import refresh_summaries
+from .scheduling import generate_schedules
+from .sms_providers import FakeProvider, SMSDeliveryError, SMSProvider
+from .synthetic import NPI_CATALOGUE
+
+
+class LocalCacheTestCase(TestCase):
+    """
+    Starts and ends every test with this process's vaccine catalogue
+    snapshot and facility calendars dropped: both are kept for a timeout and
+    would outlive the rolled-back test transaction, whose ids are reused.
+    """
+
+    def setUp(self):
+        catalogue.invalidate()
+        facility_calendar.reset()
+        self.addCleanup(catalogue.invalidate)
+        self.addCleanup(facility_calendar.reset)
+
+
+class FacilityAPITestCase(LocalCacheTestCase):
+    """
+    Two facilities (``facility`` and ``other``) and an API client
+    authenticated as an admin user.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility, cls.other = [
+            Facility.objects.create(
+                name=f"Facility {n}",
+                code=f"API{n}",
+                ward="W",
+                lga="Ikeja",
+                state="Lagos",
+            )
+            for n in range(2)
+        ]
+        cls.user = User.objects.create_user("tester", password="pass", role="admin")
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @classmethod
+    def create_vaccines(cls, doses, **fields):
+        """
+        Create the ``(name, dose_number, interval_days)`` doses in order as a
+        committed catalogue change, so the catalogue cache serves them.
+        """
+        with cls.captureOnCommitCallbacks(execute=True):
+            vaccines = [
+                VaccineMaster.objects.create(
+                    name=name,
+                    dose_number=dose,
+                    interval_days=days,
+                    order=order,
+                    **fields,
+                )
+                for order, (name, dose, days) in enumerate(doses)
+            ]
+        cls.addClassCleanup(catalogue.invalidate)
+        return vaccines
+
+    def create_child(self, full_name="Test Child", facility=None, **fields):
+        data = {
+            "sex": "female",
+            "date_of_birth": datetime.date.today(),
+            "place_of_birth": "facility",
+            "caregiver_name": "Caregiver",
+            "caregiver_contact": "08031234567",
+            "caregiver_address": "-",
+            **fields,
+        }
+        return Child.objects.create(
+            full_name=full_name, facility=facility or self.facility, **data
+        )
+
+
+class ReportIndexPlanTests(LocalCacheTestCase):
+    """
+    The reporting queries must be answered from the purpose-built indexes
+    added in migration 0002 rather than full scans of Vaccination/Child.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = Facility.objects.create(
+            name="Plan Facility", code="PLAN1", ward="W", lga="Ikeja", state="Lagos"
+        )
+        cls.vaccines = [
+            VaccineMaster.objects.create(
+                name="Penta", dose_number=n, interval_days=28 * n, order=n
+            )
+            for n in range(1, 4)
+        ]
+        dob = datetime.date(2025, 1, 1)
+        children = Child.objects.bulk_create(
+            Child(
+                uid=f"PLAN{i:06d}",
+                full_name=f"Child {i}",
+                sex="female",
+                date_of_birth=dob + datetime.timedelta(days=i % 365),
+                place_of_birth="facility",
+                caregiver_name="Caregiver",
+                caregiver_contact="0800000000",
+                caregiver_address="-",
+                facility=cls.facility,
+            )
+            for i in range(500)
+        )
+        statuses = ["given", "given", "scheduled", "missed"]
+        Vaccination.objects.bulk_create(
+            Vaccination(
+                child=child,
+                vaccine=vaccine,
+                scheduled_date=child.date_of_birth
+                + datetime.timedelta(days=vaccine.interval_days),
+                status=statuses[(i + j) % len(statuses)],
+            )
+            for i, child in enumerate(children)
+            for j, vaccine in enumerate(cls.vaccines)
+        )
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == "postgresql":
+            # The seeded table is small; make the planner show index usage
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+        elif connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_dropout_counts_use_status_vaccine_index(self):
+        qs = Vaccination.objects.filter(vaccine=self.vaccines[0], status="given")
+        self.assertUsesIndex(qs, "vacc_status_vaccine_idx")
+
+    def test_overdue_lookup_uses_status_scheduled_index(self):
+        qs = Vaccination.objects.filter(
+            status="scheduled", scheduled_date__lt=datetime.date(2025, 3, 1)
+        )
+        self.assertUsesIndex(qs, "vacc_status_sched_idx")
+
+    def test_compliance_uses_status_index(self):
+        qs = Vaccination.objects.filter(
+            status="given", actual_date__lte=F("scheduled_date")
+        )
+        self.assertUsesIndex(qs, "vacc_status_")
+
+    def test_defaulters_use_partial_missed_index(self):
+        qs = (
+            Vaccination.objects.filter(status="missed")
+            .values_list("child_id", flat=True)
+            .distinct()
+        )
+        self.assertUsesIndex(qs, "vacc_missed_child_idx")
+
+    def test_facility_birth_cohort_uses_composite_index(self):
+        qs = Child.objects.filter(
+            facility=self.facility, date_of_birth__gte=datetime.date(2025, 6, 1)
+        )
+        self.assertUsesIndex(qs, "child_facility_dob_idx")
+
+
+class BatchRegistrationTests(FacilityAPITestCase):
+    def payload(self, n):
+        return {
+            "full_name": f"Batch Child {n}",
+            "sex": "male",
+            "date_of_birth": "2026-01-01",
+            "place_of_birth": "home",
+            "caregiver_name": "Caregiver",
+            "caregiver_contact": f"0802{n:07d}",
+            "caregiver_address": "-",
+            "facility": self.facility.id,
+        }
+
+    def test_failed_chunk_is_reported_per_row(self):
+        # Registration numbers 1-2 go to the first chunk, 3-4 to the second,
+        # whose insert then fails on the taken uid
+        taken = self.create_child(uid=Child.build_uid(self.facility, 4))
+        Facility.objects.filter(pk=self.facility.pk).update(reg_counter=0)
+        rows = [self.payload(n) for n in range(4)]
+        response = self.client.post(
+            "/api/children/register/batch/?chunk_size=2", rows, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 2))
+        statuses = [row["status"] for row in response.data["results"]]
+        self.assertEqual(statuses, ["created", "created", "error", "error"])
+        self.assertEqual(Child.objects.exclude(pk=taken.pk).count(), 2)
+
+        # Resubmitting the failed rows creates them once
+        taken.delete()
+        response = self.client.post(
+            "/api/children/register/batch/?chunk_size=2", rows[2:], format="json"
+        )
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(Child.objects.count(), 4)
+
+
+class RegNumberLeaseTests(FacilityAPITestCase):
+    """
+    Leased blocks of registration numbers may only be handed out once the
+    reservation has committed.
+    """
+
+    def setUp(self):
+        super().setUp()
+        uids.get_leaser().reset()
+        self.addCleanup(uids.get_leaser().reset)
+
+    @override_settings(UID_LEASE_BLOCK_SIZE=5)
+    def test_committed_block_is_used_from_memory(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(uids.next_reg_number(self.facility), 1)
+        with self.assertNumQueries(0):
+            numbers = [uids.next_reg_number(self.facility) for _ in range(4)]
+        self.assertEqual(numbers, [2, 3, 4, 5])
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.reg_counter, 5)
+
+    @override_settings(UID_LEASE_BLOCK_SIZE=5)
+    def test_rolled_back_block_is_not_used(self):
+        try:
+            with transaction.atomic():
+                self.assertEqual(uids.next_reg_number(self.facility), 1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # The reservation was undone, so the same number comes back from the
+        # database rather than 2 from the dead block
+        self.assertEqual(uids.next_reg_number(self.facility), 1)
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.reg_counter, 1)
+
+
+class FacilityCalendarTests(FacilityAPITestCase):
+    """
+    Each process keeps calendars for ``FACILITY_CALENDAR_TIMEOUT`` seconds,
+    optionally filled from a shared cache, and drops them once a change to
+    the facility's days commits. Neither needs a cache table.
+    """
+
+    def shared_cache(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        return override_settings(
+            CACHES={
+                **settings.CACHES,
+                "shared": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                },
+            },
+            FACILITY_CALENDAR_CACHE="shared",
+        )
+
+    def test_day_change_is_seen_after_commit(self):
+        self.assertEqual(
+            facility_calendar.get_offsets(self.facility.id),
+            facility_calendar.NO_RESTRICTION,
+        )
+        with self.assertNumQueries(0):
+            facility_calendar.get_offsets(self.facility.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            FacilityVaccinationDay.objects.create(facility=self.facility, day_of_week=2)
+            # Not committed yet: the cached table stays in place
+            self.assertEqual(
+                facility_calendar.get_offsets(self.facility.id),
+                facility_calendar.NO_RESTRICTION,
+            )
+        self.assertEqual(
+            facility_calendar.get_offsets(self.facility.id), (2, 1, 0, 6, 5, 4, 3)
+        )
+
+    def test_unsignalled_change_is_seen_after_the_timeout(self):
+        with override_settings(FACILITY_CALENDAR_TIMEOUT=0):
+            facility_calendar.get_offsets(self.facility.id)
+        FacilityVaccinationDay.objects.bulk_create(
+            [FacilityVaccinationDay(facility=self.facility, day_of_week=2)]
+        )
+        self.assertEqual(
+            facility_calendar.get_offsets(self.facility.id), (2, 1, 0, 6, 5, 4, 3)
+        )
+        # Kept for the full timeout now, unless the caller asks for a refresh
+        FacilityVaccinationDay.objects.all().delete()
+        self.assertEqual(
+            facility_calendar.get_offsets(self.facility.id), (2, 1, 0, 6, 5, 4, 3)
+        )
+        self.assertEqual(
+            facility_calendar.get_offsets(self.facility.id, refresh=True),
+            facility_calendar.NO_RESTRICTION,
+        )
+
+    def test_shared_cache_fills_other_processes(self):
+        FacilityVaccinationDay.objects.create(facility=self.facility, day_of_week=2)
+        with self.shared_cache():
+            facility_calendar.get_offsets(self.facility.id)
+            # A process that never read the calendar
+            facility_calendar.reset()
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    facility_calendar.get_offsets(self.facility.id),
+                    (2, 1, 0, 6, 5, 4, 3),
+                )
+            facility_calendar.reset()
+            with self.captureOnCommitCallbacks(execute=True):
+                FacilityVaccinationDay.objects.all().delete()
+            self.assertEqual(
+                facility_calendar.get_offsets(self.facility.id),
+                facility_calendar.NO_RESTRICTION,
+            )
+
+    def test_fresh_deployment_needs_no_cache_table(self):
+        # What "migrate" leaves behind: no cache table was created
+        self.assertFalse(
+            {"api_shared_cache", "django_cache"}
+            & set(connection.introspection.table_names())
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/facilities/add/",
+                {"name": "New", "code": "NEW1", "ward": "W", "lga": "L", "state": "S"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/children/register/",
+                {
+                    "full_name": "First Child",
+                    "sex": "female",
+                    "date_of_birth": str(datetime.date.today()),
+                    "place_of_birth": "facility",
+                    "caregiver_name": "Caregiver",
+                    "caregiver_contact": "08031234567",
+                    "caregiver_address": "-",
+                    "facility": response.data["id"],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+
+    @override_settings(FACILITY_CALENDAR_CACHE="default")
+    def test_process_local_cache_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            facility_calendar.get_offsets(self.facility.id)
+
+
+class CoverageReportTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Facility.objects.filter(pk=cls.other.pk).update(lga="Surulere")
+        cls.vaccines = cls.create_vaccines(
+            [("Penta", 1, 42), ("Penta", 2, 70), ("Penta", 3, 98)]
+        )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def coverage(self, **params):
+        return self.client.get("/api/reports/coverage/", {"level": "lga", **params})
+
+    def test_summaries_match_live_counts(self):
+        for n, facility in enumerate([self.facility, self.facility, self.other]):
+            child = self.create_child(f"Child {n}", facility=facility)
+            given = child.vaccinations.filter(vaccine__in=self.vaccines[: 3 - n])
+            given.update(status="given", actual_date=F("scheduled_date"))
+        live = self.coverage().data
+        refresh_summaries(full=True)
+        cache.clear()
+        summary = self.coverage().data
+        self.assertEqual(summary, live)
+        self.assertEqual(
+            [(row["lga"], row["started"], row["completed"]) for row in live["results"]],
+            [("Ikeja", 2, 1), ("Surulere", 1, 0)],
+        )
+        filtered = self.coverage(lga="Surulere").data["results"]
+        self.assertEqual([row["lga"] for row in filtered], ["Surulere"])
+
+    def test_unknown_series_is_rejected(self):
+        response = self.coverage(series="Nope")
+        self.assertEqual(response.status_code, 400)
+
+
+class DefaulterListTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Facility.objects.filter(pk=cls.other.pk).update(lga="Surulere")
+        cls.bcg, cls.penta = cls.create_vaccines([("BCG", 1, 0), ("Penta", 1, 42)])
+
+    def setUp(self):
+        super().setUp()
+        today = datetime.date.today()
+        self.children = []
+        for n in range(5):
+            child = self.create_child(
+                f"Child {n}", facility=self.other if n == 4 else self.facility
+            )
+            # Every child missed BCG 10 days ago, the even ones Penta too
+            missed = child.vaccinations.filter(
+                vaccine__in=[self.bcg, self.penta] if n % 2 == 0 else [self.bcg]
+            )
+            missed.update(
+                status="missed", scheduled_date=today - datetime.timedelta(days=10)
+            )
+            self.children.append(child.id)
+        self.create_child("On Track")
+
+    def defaulters(self, **params):
+        response = self.client.get("/api/reports/defaulters/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_cursor_walks_every_defaulter_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = self.defaulters(limit=2, **({"cursor": cursor} if cursor else {}))
+            seen.extend(row["id"] for row in page["results"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.children)
+
+    def test_filters(self):
+        def ids(**params):
+            return [row["id"] for row in self.defaulters(**params)["results"]]
+
+        self.assertEqual(ids(facility=self.other.id), self.children[4:])
+        self.assertEqual(ids(lga="Ikeja"), self.children[:4])
+        penta = [self.children[n] for n in (0, 2, 4)]
+        self.assertEqual(ids(vaccine="penta"), penta)
+        self.assertEqual(ids(vaccine=str(self.penta.id)), penta)
+        self.assertEqual(ids(days_overdue=10), self.children)
+        self.assertEqual(ids(days_overdue=11), [])
+        # Only the matching missed doses are listed
+        row = self.defaulters(vaccine="Penta")["results"][0]
+        self.assertEqual([d["vaccine"] for d in row["missed_doses"]], [self.penta.id])
+
+    def test_invalid_facility_is_rejected(self):
+        response = self.client.get("/api/reports/defaulters/", {"facility": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ScheduleGenerationTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_vaccines([("BCG", 1, 0), ("Penta", 1, 42), ("Penta", 2, 43)])
+
+    def test_registration_schedules_every_dose_on_a_facility_day(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            FacilityVaccinationDay.objects.create(facility=self.facility, day_of_week=2)
+        response = self.client.post(
+            "/api/children/register/",
+            {
+                "full_name": "Ada Obi",
+                "sex": "female",
+                "date_of_birth": "2026-01-05",  # a Monday
+                "place_of_birth": "facility",
+                "caregiver_name": "Caregiver",
+                "caregiver_contact": "08031234567",
+                "caregiver_address": "-",
+                "facility": self.facility.id,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        dates = Vaccination.objects.filter(child_id=response.data["id"]).order_by(
+            "vaccine__order"
+        )
+        self.assertEqual(
+            list(dates.values_list("scheduled_date", flat=True)),
+            [
+                datetime.date(2026, 1, 7),
+                datetime.date(2026, 2, 18),
+                datetime.date(2026, 2, 18),
+            ],
+        )
+
+
+class FacilityRescheduleTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_vaccines([("BCG", 1, 0), ("Penta", 1, 14), ("Penta", 2, 28)])
+
+    def test_future_doses_move_onto_the_new_days(self):
+        child = self.create_child(
+            date_of_birth=datetime.date.today() - datetime.timedelta(days=7)
+        )
+        bcg = child.vaccinations.get(vaccine__name="BCG")
+        Vaccination.objects.filter(pk=bcg.pk).update(
+            status="given", actual_date=bcg.scheduled_date
+        )
+        # Both open doses fall on today's weekday; the clinic moves a day on
+        day = (datetime.date.today().weekday() + 1) % 7
+        with self.captureOnCommitCallbacks(execute=True):
+            FacilityVaccinationDay.objects.create(facility=self.facility, day_of_week=day)
+
+        response = self.client.post(f"/api/facilities/{self.facility.id}/reschedule/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["scanned"], response.data["updated"]), (2, 2))
+        future = child.vaccinations.filter(status="scheduled")
+        for date in future.values_list("scheduled_date", flat=True):
+            self.assertEqual(date.weekday(), day)
+            self.assertGreaterEqual(date, datetime.date.today())
+        bcg.refresh_from_db()
+        self.assertEqual(bcg.scheduled_date, bcg.actual_date)
+
+    def test_requires_an_admin(self):
+        worker = User.objects.create_user(
+            "worker", password="pass", role="health_worker"
+        )
+        self.client.force_authenticate(worker)
+        response = self.client.post(f"/api/facilities/{self.facility.id}/reschedule/")
+        self.assertEqual(response.status_code, 403)
+
+
+class DropoutReportTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_vaccines(
+            [("OPV", 1, 0), ("OPV", 2, 42), ("bOPV", 1, 0), ("bOPV", 2, 42)]
+        )
+
+    def test_series_are_counted_separately(self):
+        for n, given in enumerate([(1, 2), (1,), ()]):
+            child = self.create_child(f"Child {n}")
+            child.vaccinations.filter(
+                vaccine__series="OPV", vaccine__dose_number__in=given
+            ).update(status="given", actual_date=F("scheduled_date"))
+        bopv = self.create_child("Child B")
+        bopv.vaccinations.filter(
+            vaccine__series="bOPV", vaccine__dose_number=1
+        ).update(status="given", actual_date=F("scheduled_date"))
+
+        rates = {
+            row["vaccine_series"]: (
+                row["first_count"],
+                row["last_count"],
+                row["dropout_rate"],
+            )
+            for row in self.client.get("/api/reports/dropout_rates/").json()
+        }
+        self.assertEqual(rates, {"OPV": (2, 1, 50.0), "bOPV": (1, 0, 100.0)})
+        response = self.client.get("/api/reports/dropout_rate/OPV/")
+        self.assertEqual((response.data["started"], response.data["completed"]), (2, 1))
+
+
+class SummaryRefreshTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_vaccines([("Penta", 1, 0), ("Penta", 2, 28)])
+
+    def given(self):
+        return dict(
+            VaccinationSummary.objects.values_list("facility").annotate(
+                given=Sum("given")
+            )
+        )
+
+    def test_refresh_picks_up_an_edit(self):
+        child = self.create_child()
+        refresh_summaries(full=True)
+        self.assertEqual(self.given(), {self.facility.id: 0})
+        dose = child.vaccinations.first()
+        response = self.client.patch(
+            f"/api/vaccinations/{dose.id}/update/",
+            {"status": "given", "actual_date": str(datetime.date.today())},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        refresh_summaries()
+        self.assertEqual(self.given(), {self.facility.id: 1})
+
+    def test_refresh_picks_up_a_delete(self):
+        self.create_child("Kept", facility=self.other)
+        removed = self.create_child()
+        Vaccination.objects.update(status="given", actual_date=F("scheduled_date"))
+        refresh_summaries(full=True)
+        self.assertEqual(self.given(), {self.facility.id: 2, self.other.id: 2})
+        removed.delete()
+        refresh_summaries()
+        self.assertEqual(self.given(), {self.other.id: 2})
+
+
+class ListEndpointTests(FacilityAPITestCase):
+    def test_offset_and_cursor_pages(self):
+        first = self.client.get("/api/facilities/", {"limit": 1}).data
+        self.assertEqual([f["code"] for f in first["results"]], ["API0"])
+        second = self.client.get(
+            "/api/facilities/", {"limit": 1, "offset": first["next_offset"]}
+        ).data
+        self.assertEqual([f["code"] for f in second["results"]], ["API1"])
+        self.assertIsNone(second["next_offset"])
+
+        page = self.client.get("/api/facilities/", {"limit": 1, "cursor": 0}).data
+        rest = self.client.get(
+            "/api/facilities/", {"limit": 1, "cursor": page["next_cursor"]}
+        ).data
+        self.assertEqual([f["code"] for f in rest["results"]], ["API1"])
+
+    def test_sparse_fields_are_projected(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/facilities/", {"fields": "code,nope"})
+        self.assertEqual(response.data["results"][0], {"code": "API0"})
+        self.assertNotIn('"name"', queries.captured_queries[-1]["sql"])
+
+    @override_settings(API_MAX_PAGE_SIZE=1)
+    def test_page_size_is_capped(self):
+        response = self.client.get("/api/facilities/", {"limit": 50})
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+class BulkRecordingTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_vaccines([("BCG", 1, 0), ("HepB", 1, 0)])
+
+    def test_results_per_item(self):
+        bcg, hepb = self.create_child().vaccinations.order_by("vaccine__order")
+        today = str(datetime.date.today())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/vaccinations/bulk-update/",
+                [
+                    {"vac_id": bcg.id, "status": "given", "actual_date": today},
+                    {"vac_id": hepb.id, "status": "lost"},
+                    {"vac_id": 999999, "status": "given"},
+                    {"vac_id": bcg.id, "batch_number": "B2"},
+                ],
+                format="json",
+            )
+        self.assertEqual(
+            [r["status"] for r in response.data["results"]],
+            ["updated", "error", "not_found", "duplicate"],
+        )
+        updates = [q for q in queries.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        bcg.refresh_from_db()
+        hepb.refresh_from_db()
+        self.assertEqual((bcg.status, bcg.health_worker), ("given", self.user))
+        self.assertEqual(hepb.status, "scheduled")
+
+    def test_rejects_a_non_list_payload(self):
+        response = self.client.post(
+            "/api/vaccinations/bulk-update/", {"vac_id": 1}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CatchUpScheduleTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_vaccines(
+            [("OPV", 1, 0), ("OPV", 2, 42), ("OPV", 3, 70)], min_interval_days=28
+        )
+
+    def test_late_first_dose_pushes_the_later_ones(self):
+        today = datetime.date.today()
+        dob = today - datetime.timedelta(days=35)
+        opv1, opv2, opv3 = self.create_child(date_of_birth=dob).vaccinations.order_by(
+            "vaccine__order"
+        )
+        self.assertEqual(opv2.scheduled_date, dob + datetime.timedelta(days=42))
+
+        response = self.client.patch(
+            f"/api/vaccinations/{opv1.id}/update/",
+            {"status": "given", "actual_date": str(today)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        opv2.refresh_from_db()
+        opv3.refresh_from_db()
+        self.assertEqual(opv2.scheduled_date, today + datetime.timedelta(days=28))
+        self.assertEqual(opv3.scheduled_date, today + datetime.timedelta(days=56))
+
+
+class RegistryExportTests(FacilityAPITestCase):
+    """
+    Every export format must carry the same values as the ORM, whichever
+    path (text casts for CSV/NDJSON, raw driver values for Arrow) produced
+    them, and the filters must select the same doses as the ORM.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Facility.objects.filter(pk=cls.other.pk).update(lga="Epe", state="Ogun")
+        cls.create_vaccines([("BCG", 1, 0), ("Penta", 1, 42), ("Penta", 2, 70)])
+        # Penta 2 falls due in about three weeks
+        dob = datetime.date.today() - datetime.timedelta(days=50)
+        # Saving a child creates its schedule
+        for n in range(4):
+            Child.objects.create(
+                full_name=f"Export Child {n}",
+                sex=["female", "male"][n % 2],
+                date_of_birth=dob + datetime.timedelta(days=n),
+                place_of_birth="facility",
+                caregiver_name="Caregiver",
+                caregiver_contact="08031234567",
+                caregiver_address="-",
+                facility=[cls.facility, cls.other][n % 2],
+            )
+        Vaccination.objects.filter(vaccine__name="BCG").update(
+            status="given", actual_date=dob, batch_number="B-17"
+        )
+
+    def export(self, query=""):
+        response = self.client.get(f"/api/export/{query}")
+        self.assertEqual(response.status_code, 200, getattr(response, "data", None))
+        body = b"".join(response.streaming_content)
+        if "gzip=1" in query:
+            self.assertEqual(response["Content-Type"], "application/gzip")
+            body = gzip.decompress(body)
+        return body
+
+    def expected(self, doses=None):
+        """
+        ``{vaccination_id: row}`` for ``doses`` read through the ORM, with
+        dates and timestamps as Python values.
+        """
+        doses = (doses or Vaccination.objects.all()).select_related(
+            "child__facility", "vaccine"
+        )
+        rows = {}
+        for dose in doses:
+            child, facility, vaccine = dose.child, dose.child.facility, dose.vaccine
+            rows[dose.id] = {
+                "vaccination_id": dose.id,
+                "child_uid": child.uid,
+                "sex": child.sex,
+                "date_of_birth": child.date_of_birth,
+                "place_of_birth": child.place_of_birth,
+                "facility_code": facility.code,
+                "facility_name": facility.name,
+                "ward": facility.ward,
+                "lga": facility.lga,
+                "state": facility.state,
+                "vaccine": vaccine.name,
+                "dose_number": vaccine.dose_number,
+                "series": vaccine.series,
+                "scheduled_date": dose.scheduled_date,
+                "actual_date": dose.actual_date,
+                "status": dose.status,
+                "batch_number": dose.batch_number,
+                "last_updated": dose.last_updated,
+            }
+        return rows
+
+    def parse_text(self, row):
+        """
+        A CSV or NDJSON row with its ids as ints and its dates parsed back.
+        """
+        row = {key: None if value == "" else value for key, value in row.items()}
+        for key in ("vaccination_id", "dose_number"):
+            row[key] = int(row[key])
+        for key in ("date_of_birth", "scheduled_date", "actual_date"):
+            if row[key] is not None:
+                row[key] = datetime.date.fromisoformat(row[key])
+        stamp = datetime.datetime.fromisoformat(row["last_updated"])
+        if stamp.tzinfo is None:
+            stamp = stamp.replace(tzinfo=datetime.timezone.utc)
+        row["last_updated"] = stamp
+        return row
+
+    def assertRowsMatch(self, rows, expected=None):
+        expected = expected or self.expected()
+        self.assertEqual({row["vaccination_id"]: row for row in rows}, expected)
+
+    def test_csv(self):
+        for query in ("?output=csv", "?output=csv&gzip=1"):
+            with self.subTest(query):
+                body = self.export(query).decode()
+                self.assertEqual(
+                    body.splitlines()[0], ",".join(name for name, _, _ in export.COLUMNS)
+                )
+                rows = csv.DictReader(io.StringIO(body))
+                self.assertRowsMatch([self.parse_text(row) for row in rows])
+
+    def test_ndjson(self):
+        for query in ("?output=ndjson", "?output=ndjson&gzip=1"):
+            with self.subTest(query):
+                lines = self.export(query).splitlines()
+                rows = [json.loads(line) for line in lines]
+                self.assertEqual(list(rows[0]), [name for name, _, _ in export.COLUMNS])
+                self.assertRowsMatch([self.parse_text(row) for row in rows])
+
+    def test_filters(self):
+        today = datetime.date.today()
+        doses = Vaccination.objects.all()
+        cases = [
+            (f"facility={self.facility.id}", doses.filter(child__facility=self.facility)),
+            (f"facility={self.other.code}", doses.filter(child__facility=self.other)),
+            ("state=ogun", doses.filter(child__facility=self.other)),
+            ("lga=IKEJA", doses.filter(child__facility=self.facility)),
+            (f"from={today}", doses.filter(scheduled_date__gte=today)),
+            (f"to={today}", doses.filter(scheduled_date__lte=today)),
+            (
+                f"lga=Epe&from={today}&to={today + datetime.timedelta(days=30)}",
+                doses.filter(
+                    child__facility=self.other,
+                    scheduled_date__range=(today, today + datetime.timedelta(days=30)),
+                ),
+            ),
+        ]
+        for query, selected in cases:
+            with self.subTest(query):
+                lines = self.export(f"?output=ndjson&{query}").splitlines()
+                self.assertEqual(
+                    sorted(json.loads(line)["vaccination_id"] for line in lines),
+                    sorted(selected.values_list("id", flat=True)),
+                )
+        self.assertTrue(all(selected.exists() for _, selected in cases))
+        self.assertLess(len(cases[0][1]), doses.count())
+
+    def test_invalid_parameters(self):
+        for query in ("?output=xlsx", "?from=16-10-2026"):
+            with self.subTest(query):
+                self.assertEqual(self.client.get(f"/api/export/{query}").status_code, 400)
+
+    def test_admins_only(self):
+        worker = User.objects.create_user(
+            "exporter", password="pass", role="health_worker"
+        )
+        self.client.force_authenticate(worker)
+        self.assertEqual(self.client.get("/api/export/").status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get("/api/export/").status_code, 401)
+
+    def test_columnar_formats_need_pyarrow(self):
+        with mock.patch.dict(sys.modules, {"pyarrow": None}):
+            for fmt in ("arrow", "parquet"):
+                with self.subTest(fmt):
+                    response = self.client.get(f"/api/export/?output={fmt}")
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn("pyarrow", response.data["error"])
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "requires pyarrow")
+    def test_arrow(self):
+        import pyarrow as pa
+
+        for query in ("?output=arrow", "?output=arrow&gzip=1"):
+            with self.subTest(query):
+                table = pa.ipc.open_stream(self.export(query)).read_all()
+                self.assertEqual(table.schema, export.arrow_schema(pa))
+                self.assertRowsMatch(table.to_pylist())
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "requires pyarrow")
+    def test_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(self.export("?output=parquet")))
+        self.assertEqual(table.schema, export.arrow_schema(pa))
+        self.assertRowsMatch(table.to_pylist())
+
+    def test_command(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        path = f"{location}/registry.ndjson.gz"
+        call_command(
+            "export_registry",
+            format="ndjson",
+            gzip=True,
+            output=path,
+            facility=self.other.code,
+            chunk_size=2,
+            stdout=io.StringIO(),
+        )
+        with gzip.open(path) as f:
+            rows = [self.parse_text(json.loads(line)) for line in f]
+        self.assertRowsMatch(
+            rows,
+            self.expected(Vaccination.objects.filter(child__facility=self.other)),
+        )
+
+        path = f"{location}/registry.csv"
+        call_command(
+            "export_registry",
+            output=path,
+            date_to=datetime.date.today(),
+            stdout=io.StringIO(),
+        )
+        with open(path, newline="") as f:
+            rows = [self.parse_text(row) for row in csv.DictReader(f)]
+        self.assertRowsMatch(
+            rows,
+            self.expected(
+                Vaccination.objects.filter(scheduled_date__lte=datetime.date.today())
+            ),
+        )
+
+    @mock.patch.dict(sys.modules, {"pyarrow": None})
+    def test_command_without_pyarrow(self):
+        with self.assertRaisesMessage(CommandError, "pyarrow"):
+            call_command("export_registry", format="parquet", output="-")
+
+
+class SyncTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_vaccines([("BCG", 1, 0), ("Penta", 1, 42), ("Penta", 2, 70)])
+
+    def sync(self, token=None):
+        params = {"facility": self.facility.id, **({"token": token} if token else {})}
+        response = self.client.get("/api/sync/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_late_commit_inside_the_overlap_is_sent(self):
+        self.create_child()
+        late = self.create_child("Twin", facility=self.other)
+        first = self.sync()
+        self.assertEqual(len(first["vaccinations"]), 3)
+        # Rows stamped before the last ones sent but committed after them
+        backdate = F("last_updated") - datetime.timedelta(minutes=1)
+        Child.objects.filter(pk=late.pk).update(
+            facility=self.facility, last_updated=backdate
+        )
+        late.vaccinations.update(last_updated=backdate)
+        second = self.sync(first["token"])
+        self.assertIn(late.id, [row["id"] for row in second["children"]])
+        self.assertLessEqual(
+            set(late.vaccinations.values_list("id", flat=True)),
+            {row["id"] for row in second["vaccinations"]},
+        )
+        self.assertFalse(second["has_more"])
+
+    def test_stale_upload_is_a_conflict(self):
+        dose = self.create_child().vaccinations.first()
+        seen = dose.last_updated
+        Vaccination.objects.filter(pk=dose.pk).update(
+            batch_number="B1", last_updated=seen + datetime.timedelta(seconds=1)
+        )
+        response = self.client.post(
+            "/api/sync/upload/",
+            {"edits": [{"vac_id": dose.id, "status": "given", "last_updated": seen}]},
+            format="json",
+        )
+        result = response.data["results"][0]
+        self.assertEqual(result["status"], "conflict")
+        self.assertEqual(result["server"]["batch_number"], "B1")
+        dose.refresh_from_db()
+        self.assertEqual(dose.status, "scheduled")
+
+    def test_deletes_write_tombstones_in_one_insert(self):
+        children = [self.create_child(f"Child {n}") for n in range(3)]
+        doses = list(children[0].vaccinations.all())
+        with CaptureQueriesContext(connection) as queries:
+            Vaccination.objects.filter(pk__in=[d.pk for d in doses[:2]]).delete()
+        with CaptureQueriesContext(connection) as cascade:
+            Child.objects.filter(pk__in=[c.pk for c in children]).delete()
+        for captured in (queries, cascade):
+            inserts = [
+                q for q in captured.captured_queries if "INSERT" in q["sql"]
+            ]
+            self.assertEqual(len(inserts), 1)
+        tombstones = self.sync()["tombstones"]
+        self.assertCountEqual(
+            [(t["model"], t["object_id"]) for t in tombstones],
+            [("vaccination", d.pk) for d in doses[:2]]
+            + [("child", c.pk) for c in children],
+        )
+
+
+class MissedDoseTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        (cls.bcg,) = cls.create_vaccines([("BCG", 1, 0)], grace_days=3)
+        (cls.opv,) = cls.create_vaccines([("OPV", 1, 0)], grace_days=14)
+
+    def setUp(self):
+        super().setUp()
+        self.children = [self.create_child(), self.create_child(facility=self.other)]
+        Vaccination.objects.update(
+            scheduled_date=datetime.date.today() - datetime.timedelta(days=5)
+        )
+
+    def test_honors_each_vaccines_grace_days(self):
+        counts = mark_missed_doses()
+        self.assertEqual(counts, {self.facility.id: 1, self.other.id: 1})
+        statuses = dict(Vaccination.objects.values_list("vaccine", "status").distinct())
+        self.assertEqual(statuses, {self.bcg.id: "missed", self.opv.id: "scheduled"})
+
+    def test_counts_only_doses_this_run_marked(self):
+        given = self.children[0].vaccinations.get(vaccine=self.bcg)
+
+        def record_meanwhile():
+            # A dose recorded between the batch read and its UPDATE
+            Vaccination.objects.filter(pk=given.pk).update(status="given")
+            return now()
+
+        with mock.patch("api.missed_doses.now", side_effect=record_meanwhile):
+            counts = mark_missed_doses()
+        self.assertEqual(counts, {self.other.id: 1})
+        given.refresh_from_db()
+        self.assertEqual(given.status, "given")
+
+    def test_rebuilds_summaries_of_affected_facilities(self):
+        refresh_summaries(full=True)
+        mark_missed_doses()
+        missed = dict(
+            VaccinationSummary.objects.filter(vaccine=self.bcg).values_list(
+                "facility", "missed"
+            )
+        )
+        self.assertEqual(missed, {self.facility.id: 1, self.other.id: 1})
+
+
+class ReminderTests(FacilityAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_vaccines([("BCG", 1, 2), ("OPV", 1, 2)])
+
+    def test_siblings_share_one_message_by_normalized_number(self):
+        first = self.create_child("Ada Obi", caregiver_contact="0803 123 4567")
+        second = self.create_child("Ben Obi", caregiver_contact="+2348031234567")
+        # Registered before phone_e164 was backfilled
+        third = self.create_child("Cy Obi", caregiver_contact="08031234567")
+        Child.objects.filter(pk=third.pk).update(phone_e164="")
+        self.create_child("Other Child", caregiver_contact="08099999999")
+
+        self.assertEqual(generate_reminders(), (8, 2))
+        message = OutboundMessage.objects.get(phone="+2348031234567")
+        self.assertEqual(message.child_ids, [first.id, second.id, third.id])
+        self.assertIn("Ada Obi is due for BCG1, OPV1", message.message)
+
+    def test_cooldown_counts_sent_and_pending_messages(self):
+        logged = self.create_child("Logged", caregiver_contact="08030000001")
+        SMSLog.objects.create(child=logged, message="Earlier", status="sent")
+        pending = self.create_child("Pending", caregiver_contact="08030000002")
+        OutboundMessage.objects.create(
+            phone="+2348030000002", message="Earlier", child_ids=[pending.id]
+        )
+        sending = self.create_child("Sending", caregiver_contact="08030000003")
+        OutboundMessage.objects.create(
+            phone="+2348030000003",
+            message="Earlier",
+            child_ids=[sending.id],
+            status="sending",
+        )
+        due = self.create_child("Due", caregiver_contact="08030000004")
+
+        self.assertEqual(generate_reminders(), (2, 1))
+        message = OutboundMessage.objects.get(status="queued", phone="+2348030000004")
+        self.assertEqual(message.child_ids, [due.id])
+
+
+class InstrumentationTests(FacilityAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+
+    def test_adds_server_timing_and_observes_the_url_name(self):
+        response = self.client.get("/api/facilities/")
+        self.assertIn('desc="', response["Server-Timing"])
+        self.assertIn('view="api/facilities/",method="GET"', metrics.render_all())
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_metrics_require_the_bearer_token(self):
+        self.client.get("/api/facilities/")
+        scraper = APIClient(REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(scraper.get("/metrics").status_code, 401)
+        scraper.credentials(HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(scraper.get("/metrics").status_code, 401)
+        scraper.credentials(HTTP_AUTHORIZATION="Bearer s3cret")
+        response = scraper.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"_bucket{", response.content)
+
+    @override_settings(REQUEST_QUERY_BUDGET=0)
+    def test_queries_over_budget_are_logged_except_for_batch_views(self):
+        with self.assertLogs("api.middleware", "WARNING") as logs:
+            self.client.get("/api/facilities/")
+        self.assertIn("(budget 0)", logs.output[0])
+        edits = [{"vac_id": 0, "status": "given"}]
+        child = {
+            "full_name": "Batch Child",
+            "sex": "female",
+            "date_of_birth": str(datetime.date.today()),
+            "place_of_birth": "facility",
+            "caregiver_name": "Caregiver",
+            "caregiver_contact": "08031234567",
+            "caregiver_address": "-",
+            "facility": self.facility.id,
+        }
+        with self.assertNoLogs("api.middleware", "WARNING"):
+            self.client.post("/api/vaccinations/bulk-update/", edits, format="json")
+            self.client.post("/api/sync/upload/", {"edits": edits}, format="json")
+            response = self.client.post(
+                "/api/children/register/batch/", [child], format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Child.objects.filter(full_name="Batch Child").exists())
+
+    def test_metrics_are_disabled_without_a_token(self):
+        scraper = APIClient(HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(scraper.get("/metrics").status_code, 401)
+
+
+class ScriptedProvider(SMSProvider):
+    """
+    Answers each send with the next outcome: an id, or an error to raise.
+    """
+
+    name = "scripted"
+
+    def __init__(self, *outcomes):
+        super().__init__()
+        self.outcomes = list(outcomes)
+
+    async def send(self, phone, message):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@override_settings(SMS_MAX_ATTEMPTS=3, SMS_RETRY_BASE_SECONDS=30)
+class OutboundMessageTests(FacilityAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.child = self.create_child()
+        self.message = enqueue("+2348031234567", "Reminder", [self.child.id])
+
+    def process(self, *outcomes):
+        self.process_with(ScriptedProvider(*outcomes))
+
+    def process_with(self, provider):
+        process_batch(provider, size=10, max_in_flight=2)
+        self.message.refresh_from_db()
+
+    def make_due(self):
+        OutboundMessage.objects.update(next_attempt_at=now())
+
+    def test_claimed_messages_are_sending_until_stale(self):
+        self.assertEqual(claim_batch(10), [self.message])
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, "sending")
+        self.assertEqual(claim_batch(10), [])
+        # A worker that crashed mid-send leaves it behind until the lease ends
+        OutboundMessage.objects.update(
+            next_attempt_at=now() - datetime.timedelta(seconds=1)
+        )
+        self.assertEqual(claim_batch(10), [self.message])
+
+    def test_lease_covers_the_worst_case_batch(self):
+        provider = SMSProvider(rate_limit=5)
+        # 5 rounds of 20 sends timing out after 10s, plus 100 sends at 5/s
+        worst_case = datetime.timedelta(seconds=70)
+        self.assertEqual(batch_duration(provider, 100, 20), worst_case)
+        with mock.patch("api.messaging.claim_batch", return_value=[]) as claim:
+            process_batch(provider, size=100, max_in_flight=20)
+        claim.assert_called_once_with(100, lease=worst_case + STALE_SENDING)
+
+    def test_results_of_a_reclaimed_message_are_dropped(self):
+        [first] = claim_batch(10)
+        OutboundMessage.objects.update(
+            next_attempt_at=now() - datetime.timedelta(seconds=1)
+        )
+        [second] = claim_batch(10)
+        self.assertEqual(record_results([(first, "gw-1", None)], "scripted"), [])
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts), ("sending", 0))
+
+        record_results([(second, "gw-2", None)], "scripted")
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.provider_message_id, "gw-2")
+        self.assertEqual(SMSLog.objects.count(), 1)
+
+    def test_slow_send_times_out(self):
+        class SlowProvider(SMSProvider):
+            timeout = 0.01
+
+            async def send(self, phone, message):
+                await asyncio.sleep(1)
+
+        self.process_with(SlowProvider())
+        self.assertEqual((self.message.status, self.message.attempts), ("queued", 1))
+        self.assertIn("TimeoutError", self.message.last_error)
+
+    def test_rate_limit_holds_across_batches(self):
+        limiter = RateLimiter(rate=20)
+        asyncio.run(limiter.wait())
+        started = time.monotonic()
+        asyncio.run(limiter.wait())
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+    def test_fake_outbox_is_bounded_per_provider(self):
+        provider = FakeProvider(outbox_size=2)
+        for n in range(3):
+            asyncio.run(provider.send("+2348031234567", f"Message {n}"))
+        self.assertEqual(
+            [m["message"] for m in provider.outbox], ["Message 1", "Message 2"]
+        )
+        self.assertFalse(FakeProvider().outbox)
+
+    def test_retryable_failures_back_off_then_fail(self):
+        started = now()
+        self.process(SMSDeliveryError("busy"))
+        self.assertEqual((self.message.status, self.message.attempts), ("queued", 1))
+        self.assertGreaterEqual(
+            self.message.next_attempt_at, started + datetime.timedelta(seconds=30)
+        )
+        self.assertEqual(claim_batch(10), [])
+
+        self.make_due()
+        started = now()
+        self.process(SMSDeliveryError("busy"))
+        self.assertGreaterEqual(
+            self.message.next_attempt_at, started + datetime.timedelta(seconds=60)
+        )
+        self.assertFalse(SMSLog.objects.exists())
+
+        self.make_due()
+        self.process(SMSDeliveryError("busy"))
+        self.assertEqual((self.message.status, self.message.attempts), ("failed", 3))
+        self.assertEqual(
+            list(SMSLog.objects.values_list("child", "status")),
+            [(self.child.id, "failed")],
+        )
+
+    def test_permanent_failure_is_not_retried(self):
+        self.process(SMSDeliveryError("invalid number", retryable=False))
+        self.assertEqual((self.message.status, self.message.attempts), ("failed", 1))
+
+    def test_sent_message_is_logged_per_child(self):
+        self.process("gw-1")
+        self.assertEqual(self.message.status, "sent")
+        self.assertEqual(self.message.provider_message_id, "gw-1")
+        self.assertEqual(
+            list(SMSLog.objects.values_list("child", "status")),
+            [(self.child.id, "sent")],
+        )
+
+
+class BenchmarkTests(FacilityAPITestCase):
+    def test_register_child_scenario_creates_children(self):
+        fixtures = benchmark.Fixtures()
+        transport = benchmark.InProcessTransport(
+            str(RefreshToken.for_user(self.user).access_token)
+        )
+        codes = [
+            transport.request(*benchmark.register_child(fixtures)) for _ in range(5)
+        ]
+        self.assertEqual(codes, [201] * 5)
+        self.assertEqual(Child.objects.count(), 5)
+
+    def test_update_scenario_stops_when_doses_run_out(self):
+        fixtures = benchmark.Fixtures()
+        result = benchmark.run_scenario(
+            benchmark.update_vaccination, None, fixtures, requests=3, concurrency=1
+        )
+        self.assertTrue(result["exhausted"])
+        self.assertEqual(result["requests"], 0)
+
+    def test_scenarios_without_fixture_rows_are_exhausted(self):
+        Facility.objects.all().delete()
+        fixtures = benchmark.Fixtures()
+        for name in ("register_child", "child_vaccinations"):
+            with self.subTest(name):
+                result = benchmark.run_scenario(
+                    benchmark.SCENARIOS[name], None, fixtures, requests=3, concurrency=2
+                )
+                self.assertTrue(result["exhausted"])
+                self.assertEqual(result["requests"], 0)
+
+
+class SyntheticDataTests(LocalCacheTestCase):
+    def test_facility_codes_continue_after_the_highest(self):
+        rng = random.Random(0)
+        first = synthetic.create_facilities(3, rng)
+        first[1].delete()
+        more = synthetic.create_facilities(1, rng)
+        self.assertEqual(more[0].code, "SYN000003")
+
+    def test_reg_counters_count_registrations_made_meanwhile(self):
+        def register(counts, elapsed):
+            facility = Facility.objects.filter(code__startswith="SYN").first()
+            Child.objects.create(
+                full_name=f"Walk In {counts['children']}",
+                sex="female",
+                date_of_birth=datetime.date.today(),
+                place_of_birth="facility",
+                caregiver_name="Walk In",
+                caregiver_contact="08031234567",
+                caregiver_address="-",
+                facility=facility,
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = synthetic.generate(
+                facilities=2, children=9, batch_size=4, progress=register
+            )
+        facilities = Facility.objects.annotate(registered=Count("child"))
+        self.assertEqual(sum(f.registered for f in facilities), counts["children"] + 3)
+        for facility in facilities:
+            # API registrations lease blocks, so numbers may be skipped
+            self.assertGreaterEqual(facility.reg_counter, facility.registered)
+        uids = list(Child.objects.values_list("uid", flat=True))
+        self.assertEqual(len(uids), len(set(uids)))
+
+
+class QueryBudgetTests(LocalCacheTestCase):
+    """
+    Every endpoint in api/urls.py must stay within a fixed number of SQL
+    queries regardless of how much data is behind it. The fixture is large
+    enough (thousands of children, a full catalogue) that a per-row query
+    blows the budget immediately. Budgets count every statement, including
+    transaction savepoints and the statements SQLite splits large bulk
+    writes into (at most 999 bound parameters each).
+    """
+
+    FACILITIES = 3
+    CHILDREN_PER_FACILITY = 700
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facilities = [
+            Facility.objects.create(
+                name=f"Facility {n}",
+                code=f"QB{n}",
+                ward="Ward",
+                lga=["Ikeja", "Surulere"][n % 2],
+                state="Lagos",
+            )
+            for n in range(cls.FACILITIES)
+        ]
+        FacilityVaccinationDay.objects.bulk_create(
+            FacilityVaccinationDay(facility=facility, day_of_week=day)
+            for facility in cls.facilities
+            for day in (1, 3)
+        )
+        # Run the commit hooks so the catalogue cache treats it as committed;
+        # it is rolled back with the class, so drop the snapshot afterwards
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.vaccines = [
+                VaccineMaster.objects.create(
+                    name=name,
+                    dose_number=dose,
+                    interval_days=interval,
+                    min_interval_days=min_interval,
+                    order=order,
+                )
+                for order, (name, dose, interval, min_interval) in enumerate(
+                    NPI_CATALOGUE
+                )
+            ]
+        cls.addClassCleanup(catalogue.invalidate)
+        cls.admin = User.objects.create_user(
+            "budget-admin", password="pass", role="admin"
+        )
+
+        dob = datetime.date.today() - datetime.timedelta(days=500)
+        children = [
+            Child(
+                uid=f"QB{f}{i:06d}",
+                full_name=f"Child {f}-{i}",
+                sex="female" if i % 2 else "male",
+                date_of_birth=dob + datetime.timedelta(days=i % 480),
+                place_of_birth="facility",
+                caregiver_name="Caregiver",
+                caregiver_contact=f"080{f}{i:07d}",
+                caregiver_address="-",
+                facility=facility,
+            )
+            for f, facility in enumerate(cls.facilities)
+            for i in range(cls.CHILDREN_PER_FACILITY)
+        ]
+        for child in children:
+            search.prepare(child)
+        Child.objects.bulk_create(children)
+        search.index_children(children)
+        generate_schedules(children, vaccines=cls.vaccines, batch_size=5000)
+        cls.child = children[0]
+
+        today = datetime.date.today()
+        past = Vaccination.objects.filter(scheduled_date__lt=today)
+        missed = list(past.values_list("id", flat=True))[::3]
+        Vaccination.objects.filter(id__in=missed).update(status="missed")
+        past.exclude(status="missed").update(
+            status="given", actual_date=F("scheduled_date")
+        )
+
+    def setUp(self):
+        # Start every test from the same cache state so counts do not depend
+        # on order: report caches cold, the vaccine catalogue and facility
+        # calendars warm as every worker keeps them. Reading either is then
+        # free.
+        super().setUp()
+        cache.clear()
+        catalogue.get_catalogue()
+        facility_calendar.get_offsets_many(f.id for f in self.facilities)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertMaxQueries(self, budget, method, url, data=None, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, **kwargs)
+        self.assertLess(response.status_code, 300, getattr(response, "data", None))
+        count = len(queries.captured_queries)
+        self.assertLessEqual(
+            count,
+            budget,
+            f"{method.upper()} {url} ran {count} queries (budget {budget}):\n"
+            + "\n".join(q["sql"][:150] for q in queries.captured_queries),
+        )
+        return response
+
+    def child_payload(self, n=0):
+        return {
+            "full_name": f"New Child {n}",
+            "sex": "female",
+            "date_of_birth": str(datetime.date.today() - datetime.timedelta(days=n)),
+            "place_of_birth": "home",
+            "caregiver_name": "Caregiver",
+            "caregiver_contact": f"0809{n:07d}",
+            "caregiver_address": "-",
+            "facility": self.facilities[0].id,
+        }
+
+    def given_edit(self, vaccination):
+        return {
+            "vac_id": vaccination.id,
+            "status": "given",
+            "actual_date": str(datetime.date.today()),
+        }
+
+    # Facilities
+
+    def test_list_facilities(self):
+        self.assertMaxQueries(1, "get", "/api/facilities/")
+
+    def test_add_facility(self):
+        self.assertMaxQueries(
+            2,
+            "post",
+            "/api/facilities/add/",
+            {"name": "New", "code": "NEW1", "ward": "W", "lga": "L", "state": "S"},
+            format="json",
+        )
+
+    def test_add_facility_vaccination_day(self):
+        self.assertMaxQueries(
+            3,
+            "post",
+            "/api/facilities/vaccination-days/add/",
+            {"facility": self.facilities[0].id, "day_of_week": 5},
+            format="json",
+        )
+
+    def test_reschedule_facility(self):
+        # One batch covers the facility; each further batch adds 3 queries
+        size = self.CHILDREN_PER_FACILITY * len(NPI_CATALOGUE)
+        self.assertMaxQueries(
+            5,
+            "post",
+            f"/api/facilities/{self.facilities[0].id}/reschedule/?batch_size={size}",
+        )
+
+    # Users
+
+    def test_list_users(self):
+        self.assertMaxQueries(1, "get", "/api/users/")
+
+    def test_users_me(self):
+        self.assertMaxQueries(0, "get", "/api/users/me/")
+
+    def test_add_user(self):
+        self.assertMaxQueries(
+            2,
+            "post",
+            "/api/users/add/",
+            {"username": "worker", "password": "pass", "role": "health_worker"},
+            format="json",
+        )
+
+    # Children and vaccinations
+
+    def test_register_child(self):
+        # Includes the duplicate check, two index probes
+        self.assertMaxQueries(
+            12, "post", "/api/children/register/", self.child_payload(), format="json"
+        )
+
+    def test_register_children_batch(self):
+        # 200 children, their 3,800 doses and search keys; on SQLite the bulk
+        # inserts alone take about 40 statements, a query per row would add thousands
+        rows = [self.child_payload(n) for n in range(200)]
+        self.assertMaxQueries(
+            52, "post", "/api/children/register/batch/", rows, format="json"
+        )
+
+    def test_register_children_batch_upload(self):
+        upload = io.BytesIO(
+            "\n".join(json.dumps(self.child_payload(n)) for n in range(200)).encode()
+        )
+        upload.name = "children.ndjson"
+        self.assertMaxQueries(
+            52,
+            "post",
+            "/api/children/register/batch/",
+            {"file": upload},
+            format="multipart",
+        )
+
+    def test_search_children(self):
+        # One probe for the phone, one per name key, one to load the matches
+        response = self.assertMaxQueries(
+            5,
+            "get",
+            "/api/children/search/",
+            {"q": "Child Caregiver", "phone": "+234 800 0000001"},
+        )
+        self.assertEqual(response.data["results"][0]["id"], self.child.id + 1)
+
+    def test_child_vaccinations(self):
+        self.assertMaxQueries(2, "get", f"/api/children/{self.child.id}/vaccinations/")
+
+    def test_update_vaccination(self):
+        dose = Vaccination.objects.filter(status="scheduled").first()
+        payload = self.given_edit(dose)
+        del payload["vac_id"]
+        self.assertMaxQueries(
+            7, "patch", f"/api/vaccinations/{dose.id}/update/", payload, format="json"
+        )
+
+    def test_bulk_update_vaccinations(self):
+        # The 300-row bulk_update is two statements on SQLite
+        doses = Vaccination.objects.filter(status="scheduled")[:300]
+        self.assertMaxQueries(
+            6,
+            "post",
+            "/api/vaccinations/bulk-update/",
+            [self.given_edit(dose) for dose in doses],
+            format="json",
+        )
+
+    # Offline sync
+
+    def test_sync(self):
+        self.assertMaxQueries(
+            5, "get", f"/api/sync/?facility={self.facilities[0].id}&limit=500"
+        )
+
+    def test_sync_upload(self):
+        doses = Vaccination.objects.filter(status="scheduled")[:300]
+        self.assertMaxQueries(
+            6,
+            "post",
+            "/api/sync/upload/",
+            {"edits": [self.given_edit(dose) for dose in doses]},
+            format="json",
+        )
+
+    # SMS
+
+    def test_send_sms(self):
+        self.assertMaxQueries(
+            2,
+            "post",
+            f"/api/children/{self.child.id}/send-sms/",
+            {"message": "Reminder"},
+            format="json",
+        )
+
+    # Reports
+
+    def test_compliance_rate(self):
+        self.assertMaxQueries(2, "get", "/api/reports/compliance/")
+
+    def test_compliance_rate_from_summaries(self):
+        refresh_summaries(full=True)
+        self.assertMaxQueries(2, "get", "/api/reports/compliance/")
+
+    def test_coverage(self):
+        self.assertMaxQueries(3, "get", "/api/reports/coverage/?level=lga&series=Penta")
+
+    def test_defaulters(self):
+        self.assertMaxQueries(2, "get", "/api/reports/defaulters/?limit=200")
+
+    def test_defaulters_ndjson(self):
+        response = self.assertMaxQueries(
+            0, "get", "/api/reports/defaulters/?output=ndjson"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            lines = list(response.streaming_content)
+        self.assertTrue(lines)
+        # Streamed in chunks: queries grow with pages, not with rows
+        self.assertLessEqual(len(queries), 2 * (len(lines) // 500 + 2))
+
+    def test_export_registry(self):
+        response = self.assertMaxQueries(0, "get", "/api/export/?output=ndjson")
+        with CaptureQueriesContext(connection) as queries:
+            lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), Vaccination.objects.count())
+        # Facility lookup and the streamed query
+        self.assertLessEqual(len(queries), 2)
+
+    def test_dropout_rate(self):
+        self.assertMaxQueries(2, "get", "/api/reports/dropout_rate/Penta/")
+
+    def test_dropout_rates(self):
+        self.assertMaxQueries(2, "get", "/api/reports/dropout_rates/")
+
+    def test_dropout_rates_from_summaries(self):
+        refresh_summaries(full=True)
+        self.assertMaxQueries(2, "get", "/api/reports/dropout_rates/")
+
+
+class ChildSearchTests(FacilityAPITestCase):
+    """
+    Search must match common spelling variants of names and any format of a
+    caregiver phone number, and keep its keys in step with the children.
+    """
+
+    def register(
+        self, full_name, contact="08031234567", facility=None, caregiver="Caregiver"
+    ):
+        return Child.objects.create(
+            full_name=full_name,
+            sex="male",
+            date_of_birth=datetime.date.today(),
+            place_of_birth="home",
+            caregiver_name=caregiver,
+            caregiver_contact=contact,
+            caregiver_address="-",
+            facility=facility or self.facility,
+        )
+
+    def search(self, **params):
+        response = self.client.get("/api/children/search/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_normalize_phone(self):
+        numbers = ["0803 123 4567", "+234-803-123-4567", "2348031234567", "8031234567"]
+        for raw in numbers:
+            self.assertEqual(search.normalize_phone(raw), "+2348031234567", raw)
+        self.assertEqual(search.normalize_phone("00447911123456"), "+447911123456")
+        self.assertEqual(search.normalize_phone("123"), "")
+
+    def test_spelling_variants_match(self):
+        child = self.register("Muhammad Aishat Bello")
+        self.register("Chinedu Okafor")
+        for query in ["Mohammed Bello", "mohamed belo", "Aisha Bello", "Ayisha"]:
+            self.assertEqual(self.search(q=query), [child.id], query)
+
+    def test_ranking_and_facility_filter(self):
+        pair = self.register("Yusuf Abubakar", contact="08000000001")
+        token = self.register("Yusuph Danjuma", contact="08000000002")
+        exact = self.register(
+            "Yusuf Abubakar", contact="08000000003", facility=self.other
+        )
+        self.assertEqual(self.search(q="Yusuf Abubakar")[:2], [exact.id, pair.id])
+        self.assertCountEqual(self.search(q="Yusuph"), [pair.id, token.id, exact.id])
+        self.assertEqual(
+            self.search(q="Yusuf Abubakar", facility=self.facility.id),
+            [pair.id, token.id],
+        )
+        self.assertEqual(self.search(phone="+234 800 000 0002"), [token.id])
+
+    def test_keys_follow_updates(self):
+        child = self.register("Ngozi Eze")
+        child.full_name = "Ngozi Okonkwo"
+        child.caregiver_contact = "07011112222"
+        child.save()
+        self.assertEqual(self.search(q="Okonkwo"), [child.id])
+        self.assertEqual(self.search(q="Eze"), [])
+        self.assertEqual(self.search(phone="07011112222"), [child.id])
+
+    def test_search_columns_are_not_serialized(self):
+        self.register("Ngozi Eze")
+        response = self.client.get("/api/children/search/", {"q": "Ngozi"})
+        row = response.data["results"][0]
+        for column in ("phone_e164", "name_normalized", "block_key"):
+            self.assertNotIn(column, row)
+
+    def test_requires_a_term(self):
+        response = self.client.get("/api/children/search/")
+        self.assertEqual(response.status_code, 400)
+
+    def admin_search(self, term):
+        self.client.force_login(User.objects.create_superuser("root", password="pass"))
+        response = self.client.get(reverse("admin:api_child_changelist"), {"q": term})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_admin_matches_caregiver_names(self):
+        child = self.register("Chinedu Okafor", caregiver="Hadizat Musa")
+        namesake = self.register("Hadiza Bello")
+        self.register("Emeka Obi", caregiver="Ngozi Obi")
+        response = self.admin_search("Hadiza Musa")
+        self.assertCountEqual(response.context["cl"].result_list, [child, namesake])
+        # The API searches child names only
+        self.assertEqual(self.search(q="Hadiza Musa"), [namesake.id])
+
+    def test_admin_says_when_results_are_capped(self):
+        for _ in range(search.MAX_RESULTS):
+            self.register("Ngozi Eze")
+        response = self.admin_search("Ngozi")
+        self.assertEqual(len(response.context["cl"].result_list), search.MAX_RESULTS)
+        self.assertIn(
+            f"Showing the {search.MAX_RESULTS} best matches only",
+            [str(m) for m in response.context["messages"]][0],
+        )
+
+
+class DuplicateDetectionTests(FacilityAPITestCase):
+    """
+    Registration must flag children already on the register under another
+    spelling or at another facility, but not twins, and the batch job must
+    cluster existing duplicates.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.dob = datetime.date(2026, 3, 1)
+        cls.original = Child.objects.create(
+            full_name="Muhammad Aishat Bello",
+            sex="female",
+            date_of_birth=cls.dob,
+            place_of_birth="facility",
+            caregiver_name="Caregiver",
+            caregiver_contact="08031234567",
+            caregiver_address="-",
+            facility=cls.facility,
+        )
+
+    def payload(self, full_name, contact="07000000000", days=0, facility=None):
+        return {
+            "full_name": full_name,
+            "sex": "female",
+            "date_of_birth": str(self.dob + datetime.timedelta(days=days)),
+            "place_of_birth": "home",
+            "caregiver_name": "Caregiver",
+            "caregiver_contact": contact,
+            "caregiver_address": "-",
+            "facility": (facility or self.other).id,
+        }
+
+    def register(self, payload, query=""):
+        return self.client.post(
+            f"/api/children/register/{query}", payload, format="json"
+        )
+
+    def test_flags_respelled_child_at_another_facility(self):
+        response = self.register(self.payload("Mohammed Aisha Bello", days=5))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            [row["id"] for row in response.data["duplicates"]], [self.original.id]
+        )
+        self.assertEqual(response.data["duplicates"][0]["similarity"], 1.0)
+
+    def test_flags_same_caregiver_phone(self):
+        response = self.register(
+            self.payload("Aisha Bello", contact="+234 803 123 4567", days=-20)
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_twins_and_distant_births_are_not_flagged(self):
+        twin = self.payload("Hassan Bello", contact="0803 123 4567")
+        self.assertEqual(self.register(twin).status_code, 201)
+        later = self.payload("Muhammad Aishat Bello", days=400)
+        self.assertEqual(self.register(later).status_code, 201)
+
+    def test_allow_duplicate(self):
+        payload = self.payload("Muhammad Aishat Bello")
+        response = self.register(payload, "?allow_duplicate=true")
+        self.assertEqual(response.status_code, 201)
+
+    def test_nearest_births_are_checked_in_a_crowded_block(self):
+        # More children share the phone than one check reads, all born in the
+        # month before the duplicate, which was born on the same day
+        decoys = [
+            self.payload("Decoy Child", contact="08055555555", days=-1 - n % 30)
+            for n in range(duplicates.MAX_CANDIDATES + 10)
+        ]
+        # A longer name, so only the phone puts it in the child's block
+        target = self.payload("Ngozi Chioma Eze", contact="08055555555")
+        for data in decoys + [target]:
+            data["facility"] = self.other
+            data["date_of_birth"] = datetime.date.fromisoformat(data["date_of_birth"])
+            duplicate = Child.objects.create(**data)
+        child = Child(
+            full_name="Ngozi Eze",
+            caregiver_contact="08055555555",
+            date_of_birth=self.dob,
+        )
+        search.prepare(child)
+        self.assertEqual(
+            [c.id for c in duplicates.find_candidates(child)], [duplicate.id]
+        )
+
+    def test_find_duplicates(self):
+        def create(full_name, contact, days=0):
+            data = self.payload(full_name, contact, days)
+            data["facility"] = self.other
+            data["date_of_birth"] = self.dob + datetime.timedelta(days=days)
+            return Child.objects.create(**data).id
+
+        by_name = create("Mohamed Aisha Bello", "09099999999", days=10)
+        by_phone = create("Aishat Bello", "2348031234567", days=-3)
+        create("Hassan Bello", "08031234567")  # twin
+        pair = [create("Ngozi Eze", "08100000001"), create("Ngozi Eze", "08100000002")]
+        create("Ngozi Eze", "08100000003", days=300)
+        self.assertEqual(
+            duplicates.find_duplicates(batch_size=2),
+            sorted([sorted([self.original.id, by_name, by_phone]), pair]),
+        )
+
+
+class CatalogueTests(LocalCacheTestCase):
+    """
+    Warm catalogue reads must cost no query, and every committed
+    VaccineMaster change must reach the snapshot.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        doses = [("BCG", 1, 0), ("Penta", 1, 42), ("Penta", 2, 70), ("Penta", 3, 98)]
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.vaccines = [
+                VaccineMaster.objects.create(
+                    name=name, dose_number=dose, interval_days=days, order=order
+                )
+                for order, (name, dose, days) in enumerate(doses)
+            ]
+        cls.addClassCleanup(catalogue.invalidate)
+
+    def test_warm_reads_run_no_query(self):
+        catalogue.get_catalogue()
+        with self.assertNumQueries(0):
+            snapshot = catalogue.get_catalogue()
+        self.assertEqual(
+            [v.id for v in snapshot.vaccines], [v.id for v in self.vaccines]
+        )
+        self.assertEqual(snapshot.first_dose("penta").id, self.vaccines[1].id)
+        self.assertEqual(snapshot.last_dose("PENTA").id, self.vaccines[3].id)
+        self.assertEqual(list(snapshot.multi_dose_series()), ["Penta"])
+        self.assertEqual(snapshot.get_series("OPV"), ())
+        with self.assertRaises(AttributeError):
+            snapshot.vaccines = ()
+
+    def test_committed_change_is_reloaded(self):
+        catalogue.get_catalogue()
+        with self.captureOnCommitCallbacks(execute=True):
+            VaccineMaster.objects.filter(pk=self.vaccines[0].pk).update(order=99)
+            self.vaccines[0].refresh_from_db()
+            self.vaccines[0].save()
+        with self.assertNumQueries(1):
+            snapshot = catalogue.get_catalogue()
+        self.assertEqual(snapshot.vaccines[-1].id, self.vaccines[0].id)
+
+    @override_settings(CATALOGUE_TIMEOUT=0)
+    def test_snapshot_is_reloaded_after_the_timeout(self):
+        snapshot = catalogue.get_catalogue()
+        with self.assertNumQueries(1):
+            self.assertIsNot(catalogue.get_catalogue(), snapshot)
+
+    def test_version_change_from_another_process(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={
+                **settings.CACHES,
+                "shared": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                },
+            },
+            CATALOGUE_CACHE="shared",
+            CATALOGUE_TIMEOUT=0,
+        ):
+            snapshot = catalogue.get_catalogue()
+            # Past the timeout, an unchanged version keeps the snapshot
+            with self.assertNumQueries(0):
+                self.assertIs(catalogue.get_catalogue(), snapshot)
+            caches["shared"].set(catalogue.VERSION_KEY, "changed elsewhere", None)
+            with self.assertNumQueries(1):
+                self.assertIsNot(catalogue.get_catalogue(), snapshot)
+
+    def test_uncommitted_change_is_not_cached(self):
+        catalogue.get_catalogue()
+        try:
+            with transaction.atomic():
+                VaccineMaster.objects.create(
+                    name="OPV", dose_number=0, interval_days=0, order=10
+                )
+                self.assertEqual(len(catalogue.get_catalogue()), 5)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(len(catalogue.get_catalogue()), 4)
+
+    def test_read_in_a_transaction_after_a_rollback_is_cached(self):
+        catalogue.get_catalogue()
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    self.vaccines[0].delete()
+                    self.assertEqual(len(catalogue.get_catalogue()), 3)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            with self.assertNumQueries(0):
+                self.assertEqual(len(catalogue.get_catalogue()), 4)
+
+    def test_change_survives_a_rolled_back_savepoint(self):
+        catalogue.get_catalogue()
+        with transaction.atomic():
+            VaccineMaster.objects.create(
+                name="OPV", dose_number=0, interval_days=0, order=10
+            )
+            try:
+                with transaction.atomic():
+                    self.vaccines[0].delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.assertEqual(len(catalogue.get_catalogue()), 5)
+
+    @override_settings(CATALOGUE_CACHE="default")
+    def test_process_local_cache_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            catalogue.get_catalogue()
+
+
+class MockDHIS2(http.server.BaseHTTPRequestHandler):
+    """
+    Stands in for a DHIS2 server: records posted data values and fails the
+    request numbered ``fail_on`` once.
+    """
+
+    received = []
+    requests = 0
+    fail_on = None
+
+    def do_POST(self):
+        cls = type(self)
+        cls.requests += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if cls.requests == cls.fail_on:
+            self.send_response(503)
+            self.end_headers()
+            return
+        cls.received.extend(body["dataValues"])
+        payload = json.dumps(
+            {"status": "SUCCESS", "importCount": {"imported": len(body["dataValues"])}}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(
+    DHIS2_DATA_ELEMENTS={"Penta1": "PentaDose01", "Penta2": "PentaDose02"}
+)
+class DataValueSetTests(LocalCacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Reported before IKJ1, whose values are in the push's later chunks
+        cls.first = Facility.objects.create(
+            name="Agege PHC", code="AGG1", ward="W", lga="Agege", state="Lagos"
+        )
+        cls.facility = Facility.objects.create(
+            name="Ikeja PHC", code="IKJ1", ward="W", lga="Ikeja", state="Lagos"
+        )
+        cls.vaccines = [
+            VaccineMaster.objects.create(
+                name="Penta", dose_number=n, interval_days=28 * n, order=n
+            )
+            for n in range(1, 4)
+        ]
+        doses = []
+        for i in range(30):
+            child = Child.objects.create(
+                uid=f"D2{i:04d}",
+                full_name=f"Child {i}",
+                sex="female",
+                # 0-11m for most, 12-23m for every third child
+                date_of_birth=datetime.date(2025 if i % 3 else 2024, 1, 1),
+                place_of_birth="facility",
+                caregiver_name="Caregiver",
+                caregiver_contact="0800000000",
+                caregiver_address="-",
+                facility=cls.facility,
+            )
+            doses.extend(
+                child.vaccinations.filter(vaccine__in=cls.vaccines[: 1 + i % 3])
+            )
+        child = Child.objects.create(
+            uid="D2AGG1",
+            full_name="Child A",
+            sex="male",
+            date_of_birth=datetime.date(2025, 1, 1),
+            place_of_birth="facility",
+            caregiver_name="Caregiver",
+            caregiver_contact="0800000001",
+            caregiver_address="-",
+            facility=cls.first,
+        )
+        doses.append(child.vaccinations.get(vaccine=cls.vaccines[0]))
+        for dose in doses:
+            dose.status = "given"
+            dose.actual_date = datetime.date(2025, 9, 10)
+        Vaccination.objects.bulk_update(doses, ["status", "actual_date"])
+
+    def setUp(self):
+        super().setUp()
+        MockDHIS2.received = []
+        MockDHIS2.requests = 0
+        MockDHIS2.fail_on = None
+        self.server = http.server.HTTPServer(("127.0.0.1", 0), MockDHIS2)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_aggregates_by_vaccine_month_and_age_band(self):
+        start, end = dhis2.month_range(datetime.date(2025, 9, 1))
+        values = {
+            (v["dataElement"], v["categoryOptionCombo"]): v["value"]
+            for v in dhis2.data_values(start, end)
+            if v["orgUnit"] == "IKJ1"
+        }
+        # Penta3 has no data element UID, so it is left out
+        self.assertEqual(
+            values,
+            {
+                ("PentaDose01", "0-11m"): "20",
+                ("PentaDose01", "12-23m"): "10",
+                ("PentaDose02", "0-11m"): "20",
+            },
+        )
+        self.assertEqual(dhis2.data_elements()[1], ["Penta3"])
+
+    @override_settings(DHIS2_AGE_BAND_COMBOS={"0-11m": "AGE_LT1"})
+    def test_push_resumes_from_the_last_accepted_facility(self):
+        MockDHIS2.fail_on = 3
+        with self.assertRaises(dhis2.PushError):
+            dhis2.push(datetime.date(2025, 9, 1), chunk_size=1, url=self.url)
+        state = DataValuePush.objects.get(period="202509")
+        self.assertEqual((state.status, state.sent), ("failed", 2))
+        self.assertEqual(state.resume_from, self.facility.pk)
+
+        state, counts = dhis2.push(datetime.date(2025, 9, 1), chunk_size=1, url=self.url)
+        self.assertEqual(state.status, "done")
+        # AGG1 once; IKJ1's first value again, as part of its whole facility
+        self.assertEqual(counts, {"imported": 3})
+        received = [(v["orgUnit"], v["dataElement"]) for v in MockDHIS2.received]
+        self.assertEqual(received.count(("AGG1", "PentaDose01")), 1)
+        self.assertEqual(len(received), 5)
+        start, end = dhis2.month_range(datetime.date(2025, 9, 1))
+        self.assertCountEqual(
+            {json.dumps(v, sort_keys=True) for v in MockDHIS2.received},
+            {json.dumps(v, sort_keys=True) for v in dhis2.data_values(start, end)},
+        )
+        self.assertIn("AGE_LT1", {v["categoryOptionCombo"] for v in MockDHIS2.received})
@@ -0,0 +1,113 @@
+"""
+Allocation of the per-facility registration numbers used in child UIDs.
+
+Numbers come from ``Facility.reg_counter`` and are always reserved with an
+atomic ``UPDATE ... SET reg_counter = reg_counter + n`` so concurrent
+registrations never read-modify-write the facility row. Callers reserve
+outside their own transaction where they can, so the facility row is only
+locked for that short UPDATE. With ``UID_LEASE_BLOCK_SIZE`` above 1 each
+process leases a block of numbers per facility and hands them out from
+memory; unused numbers of a block (e.g. when a worker exits, or a
+registration rolls back) are simply skipped, so UIDs stay unique but may
+have gaps.
+"""
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+
+def reserve_reg_numbers(facility, count=1):
+    """
+    Reserve ``count`` consecutive reg_counter values for ``facility`` with a
+    single atomic UPDATE and return the first one.
+    """
+    from .models import Facility
+
+    with transaction.atomic():
+        Facility.objects.filter(pk=facility.pk).update(
+            reg_counter=F("reg_counter") + count
+        )
+        end = (
+            Facility.objects.filter(pk=facility.pk)
+            .values_list("reg_counter", flat=True)
+            .get()
+        )
+    facility.reg_counter = end
+    return end - count + 1
+
+
+class _Lease:
+    """
+    A block of reserved numbers. It only becomes ``confirmed``, and usable
+    by later registrations, once the reservation commits; a rollback drops
+    the ``on_commit`` callback and the block is never used.
+    """
+
+    __slots__ = ("next", "end", "confirmed")
+
+    def __init__(self, start, end):
+        self.next = start
+        self.end = end
+        self.confirmed = False
+
+    def confirm(self):
+        self.confirmed = True
+
+    def usable(self):
+        return self.confirmed and self.next <= self.end
+
+
+class RegNumberLeaser:
+    """
+    Hands out registration numbers from per-facility blocks reserved in bulk.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def next_number(self, facility):
+        with self._lock:
+            lease = self._leases.get(facility.pk)
+            if lease is not None and lease.usable():
+                number = lease.next
+                lease.next += 1
+                return number
+            in_transaction = transaction.get_connection().in_atomic_block
+            if lease is not None and not lease.confirmed and in_transaction:
+                # The last block waits for a commit that may never come;
+                # take single numbers rather than a block per registration
+                return reserve_reg_numbers(facility)
+            start = reserve_reg_numbers(facility, self.block_size)
+            lease = _Lease(start + 1, start + self.block_size - 1)
+            self._leases[facility.pk] = lease
+            # Runs at once outside a transaction
+            transaction.on_commit(lease.confirm)
+            return start
+
+    def reset(self):
+        with self._lock:
+            self._leases.clear()
+
+
+_leaser = None
+
+
+def get_leaser():
+    global _leaser
+    block_size = getattr(settings, "UID_LEASE_BLOCK_SIZE", 1)
+    if _leaser is None or _leaser.block_size != block_size:
+        _leaser = RegNumberLeaser(block_size)
+    return _leaser
+
+
+def next_reg_number(facility):
+    """
+    Return the next registration number for ``facility``.
+    """
+    if getattr(settings, "UID_LEASE_BLOCK_SIZE", 1) <= 1:
+        return reserve_reg_numbers(facility)
+    return get_leaser().next_number(facility)
@@ -5,14 +5,21 @@ urlpatterns = [
     # Facility
     path("facilities/", views.list_facilities),
     path("facilities/add/", views.add_facility),
+    path("facilities/vaccination-days/add/", views.add_facility_vaccination_day),
+    path(
+        "facilities/<int:facility_id>/reschedule/", views.reschedule_facility_doses
+    ),
     # Users
     path("users/", views.list_users),
     path("users/me/", views.users_me),
     path("users/add/", views.add_user),
     # Children & Vaccinations
     path("children/register/", views.register_child),
+    path("children/register/batch/", views.register_children_batch),
+    path("children/search/", views.child_search, name="search_children"),
     path("children/<int:child_id>/vaccinations/", views.child_vaccinations),
     path("reports/compliance/", views.compliance_rate, name="compliance_rate"),
+    path("reports/coverage/", views.coverage, name="coverage"),
     path("reports/defaulters/", views.defaulters, name="defaulters"),
     path(
         "reports/dropout_rate/<str:vaccine_name>/",
@@ -22,6 +29,12 @@ urlpatterns = [
     path("reports/dropout_rates/", views.dropout_rates, name="dropout_rates"),
     # Vaccination update
     path("vaccinations/<int:vac_id>/update/", views.update_vaccination),
+    path("vaccinations/bulk-update/", views.bulk_update_vaccinations),
+    # Registry export
+    path("export/", views.export_registry, name="export_registry"),
+    # Offline sync
+    path("sync/", views.sync),
+    path("sync/upload/", views.sync_upload),
     # SMS
     path("children/<int:child_id>/send-sms/", views.send_sms),
 ]
@@ -1,4 +1,7 @@
-import datetime
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
 
 
 def adjust_to_facility_day(date, facility):
@@ -6,17 +9,20 @@ def adjust_to_facility_day(date, facility):
     Given a scheduled date, move it to the nearest facility vaccination day.
     If facility has no fixed days, return the original date.
     """
-    days = list(facility.vaccination_days.values_list("day_of_week", flat=True))
-    if not days:
-        return date  # no restriction, keep original date
+    from api.facility_calendar import get_offsets, shift_to_facility_day
 
-    # If exact match, return
-    if date.weekday() in days:
-        return date
+    return shift_to_facility_day(date, get_offsets(facility.pk))
 
-    # Find nearest upcoming vaccination day
-    for i in range(1, 8):
-        candidate = date + datetime.timedelta(days=i)
-        if candidate.weekday() in days:
-            return candidate
-    return date  # fallback
+
+def shared_cache(alias):
+    """
+    The Django cache ``alias``, which must be visible to every worker
+    process; process-local backends are rejected.
+    """
+    cache = caches[alias]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            f"Cache {alias!r} is local to one process; configure a shared "
+            "backend (database, Redis or Memcached) for it"
+        )
+    return cache
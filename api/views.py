@@ -1,24 +1,65 @@
-from django.http import JsonResponse
-from rest_framework.decorators import api_view, permission_classes
+import datetime
+import hmac
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.utils.timezone import now
+from django.views.decorators.http import require_GET
 from datetime import timedelta
 from django.shortcuts import render
-from django.db.models import F, Min, Max
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from .models import Facility, User, Child, VaccineMaster, Vaccination, SMSLog
+from .models import Facility, User, Child, Vaccination
+from .pagination import (
+    cursor_paginate,
+    get_limit,
+    paginate,
+    project,
+    requested_fields,
+)
+from .reports import (
+    COVERAGE_FILTERS,
+    COVERAGE_LEVELS,
+    compliance_counts,
+    coverage_report,
+    dropout_counts,
+)
+from .catalogue import get_catalogue
+from .duplicates import find_candidates
+from .export import FORMATS, export_rows, filename, stream_export
+from .messaging import enqueue
+from .metrics import render_all as render_metrics
+from .middleware import query_budget
+from .recording import apply_vaccination_edits
+from .registration import get_chunk_size, import_children, parse_upload
+from .rescheduling import DEFAULT_BATCH_SIZE, reschedule_facility
+from .scheduling import reschedule_after
+from .search import MAX_RESULTS, prepare, search_children
+from .sync import facility_changes
 from .serializers import (
     FacilitySerializer,
     UserSerializer,
     ChildSerializer,
+    ChildSearchResultSerializer,
+    DefaulterSerializer,
+    DuplicateCandidateSerializer,
+    TombstoneSerializer,
+    VaccinationEditSerializer,
     VaccinationSerializer,
-    SMSLogSerializer,
+    OutboundMessageSerializer,
     FacilityVaccinationDaySerializer,
 )
 
@@ -31,6 +72,39 @@ auth_param = openapi.Parameter(
     required=True,
 )
 
+# Common list parameters for Swagger
+list_params = [
+    openapi.Parameter(
+        "limit",
+        openapi.IN_QUERY,
+        description="Page size (capped at API_MAX_PAGE_SIZE)",
+        type=openapi.TYPE_INTEGER,
+    ),
+    openapi.Parameter("offset", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    openapi.Parameter(
+        "cursor",
+        openapi.IN_QUERY,
+        description="Last id of the previous page (keyset pagination)",
+        type=openapi.TYPE_INTEGER,
+    ),
+    openapi.Parameter(
+        "fields",
+        openapi.IN_QUERY,
+        description="Comma separated fields to return, e.g. id,name,code",
+        type=openapi.TYPE_STRING,
+    ),
+]
+
+
+def list_response(request, queryset, serializer_class):
+    """
+    Paginated, optionally field-projected response for a list endpoint.
+    """
+    fields = requested_fields(request, serializer_class)
+    rows, meta = paginate(project(queryset, fields), request)
+    serializer = serializer_class(rows, many=True, fields=fields)
+    return Response({"results": serializer.data, **meta})
+
 
 # -------------------------------
 # Facility Management
@@ -71,18 +145,60 @@ def add_facility_vaccination_day(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@swagger_auto_schema(
+    method="post",
+    operation_summary="Reschedule Facility Doses (Admin Only)",
+    operation_description=(
+        "Moves future, still-scheduled doses of the facility onto its current "
+        "vaccination days. Run after the facility changes its clinic days."
+    ),
+    manual_parameters=[
+        auth_param,
+        openapi.Parameter(
+            "batch_size",
+            openapi.IN_QUERY,
+            description="Rows per batch",
+            type=openapi.TYPE_INTEGER,
+        ),
+    ],
+    responses={
+        200: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "facility": openapi.Schema(type=openapi.TYPE_INTEGER),
+                "scanned": openapi.Schema(type=openapi.TYPE_INTEGER),
+                "updated": openapi.Schema(type=openapi.TYPE_INTEGER),
+                "seconds": openapi.Schema(type=openapi.TYPE_NUMBER),
+                "rows_per_second": openapi.Schema(type=openapi.TYPE_NUMBER),
+            },
+        ),
+        403: "Unauthorized",
+    },
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def reschedule_facility_doses(request, facility_id):
+    if request.user.role != "admin":
+        return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
+    facility = get_object_or_404(Facility, id=facility_id)
+    try:
+        batch_size = int(request.query_params.get("batch_size", DEFAULT_BATCH_SIZE))
+    except ValueError:
+        batch_size = DEFAULT_BATCH_SIZE
+    result = reschedule_facility(facility.id, batch_size=max(1, batch_size))
+    return Response(result)
+
+
 @swagger_auto_schema(
     method="get",
     operation_summary="List All Facilities",
-    manual_parameters=[auth_param],
+    manual_parameters=[auth_param, *list_params],
     responses={200: FacilitySerializer(many=True)},
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_facilities(request):
-    facilities = Facility.objects.all()
-    serializer = FacilitySerializer(facilities, many=True)
-    return Response(serializer.data)
+    return list_response(request, Facility.objects.all(), FacilitySerializer)
 
 
 # -------------------------------
@@ -110,15 +226,13 @@ def add_user(request):
 @swagger_auto_schema(
     method="get",
     operation_summary="List Users",
-    manual_parameters=[auth_param],
+    manual_parameters=[auth_param, *list_params],
     responses={200: UserSerializer(many=True)},
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_users(request):
-    users = User.objects.all()
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    return list_response(request, User.objects.all(), UserSerializer)
 
 @swagger_auto_schema(
     method="get",
@@ -139,43 +253,186 @@ def users_me(request):
 @swagger_auto_schema(
     method="post",
     operation_summary="Register Child and Auto-Schedule Vaccines",
-    manual_parameters=[auth_param],
+    operation_description=(
+        "Rejects the child with 409 and the matching records when it looks like "
+        "a child already registered (similar name and a birth date close by, or "
+        "the same caregiver phone). Pass `allow_duplicate=true` to register "
+        "anyway."
+    ),
+    manual_parameters=[
+        auth_param,
+        openapi.Parameter(
+            "allow_duplicate", openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN
+        ),
+    ],
     request_body=ChildSerializer,
-    responses={201: ChildSerializer},
+    responses={
+        201: ChildSerializer,
+        409: DuplicateCandidateSerializer(many=True),
+    },
 )
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def register_child(request):
     serializer = ChildSerializer(data=request.data)
     if serializer.is_valid():
+        if request.query_params.get("allow_duplicate") != "true":
+            child = Child(**serializer.validated_data)
+            prepare(child)
+            duplicates = find_candidates(child)
+            if duplicates:
+                return Response(
+                    {
+                        "error": "Possible duplicate of an existing child",
+                        "duplicates": DuplicateCandidateSerializer(
+                            duplicates, many=True
+                        ).data,
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+        # Child.save() builds the vaccination schedule in bulk
         child = serializer.save()
+        return Response(ChildSerializer(child).data, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        # Auto-generate vaccination schedule
-        vaccines = VaccineMaster.objects.all().order_by("order")
-        for v in vaccines:
-            Vaccination.objects.create(
-                child=child,
-                vaccine=v,
-                scheduled_date=child.date_of_birth + timedelta(days=v.interval_days),
+
+@query_budget(None)
+@swagger_auto_schema(
+    method="post",
+    operation_summary="Batch Register Children",
+    operation_description=(
+        "Accepts a JSON array of children, or a multipart upload of a CSV or "
+        "NDJSON file in the `file` field. Rows are imported in chunks of "
+        "`chunk_size` and a result is returned for every row. A chunk that "
+        "fails to save is rolled back on its own and its rows are reported as "
+        "errors, so they can be resubmitted without duplicating the others."
+    ),
+    manual_parameters=[
+        auth_param,
+        openapi.Parameter(
+            "chunk_size",
+            openapi.IN_QUERY,
+            description="Rows per transaction",
+            type=openapi.TYPE_INTEGER,
+        ),
+    ],
+    request_body=ChildSerializer(many=True),
+    responses={200: "Per-row results", 400: "Malformed payload"},
+)
+@api_view(["POST"])
+@parser_classes([JSONParser, MultiPartParser, FormParser])
+@permission_classes([IsAuthenticated])
+def register_children_batch(request):
+    if "file" in request.FILES:
+        try:
+            rows = parse_upload(request.FILES["file"])
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        rows = request.data
+    if not isinstance(rows, list):
+        return Response(
+            {"error": "Expected a JSON array or a CSV/NDJSON file upload"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Resolve every referenced facility once instead of once per row
+    facility_ids = set()
+    for row in rows:
+        try:
+            facility_ids.add(int(row.get("facility")))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    context = {"facilities": Facility.objects.in_bulk(facility_ids)}
+
+    serializer = ChildSerializer(data=rows, many=True, context=context)
+    if serializer.is_valid():
+        valid = list(enumerate(serializer.validated_data))
+        errors = [{}] * len(rows)
+    else:
+        errors = serializer.errors
+        valid_indexes = [i for i, e in enumerate(errors) if not e]
+        retry = ChildSerializer(
+            data=[rows[i] for i in valid_indexes], many=True, context=context
+        )
+        retry.is_valid(raise_exception=True)
+        valid = list(zip(valid_indexes, retry.validated_data))
+
+    chunk_size = get_chunk_size(request.query_params.get("chunk_size"))
+    created, failed = import_children(valid, chunk_size=chunk_size)
+    for index, error in failed.items():
+        errors[index] = {"non_field_errors": [f"Not saved: {error}"]}
+
+    results = []
+    for index in range(len(rows)):
+        if index in created:
+            child = created[index]
+            results.append(
+                {"row": index, "status": "created", "id": child.pk, "uid": child.uid}
             )
+        else:
+            results.append({"row": index, "status": "error", "errors": errors[index]})
+    return Response(
+        {"created": len(created), "failed": len(rows) - len(created), "results": results}
+    )
 
-        return Response(ChildSerializer(child).data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method="get",
+    operation_summary="Search Children",
+    operation_description=(
+        "Find children by name and/or caregiver phone number. Names match "
+        "spelling variants (Mohammed/Muhammad, Aishat/Aisha) and phone numbers "
+        "match in any local or international format. Results are ranked best "
+        "first with a `score`."
+    ),
+    manual_parameters=[
+        auth_param,
+        openapi.Parameter("q", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter("phone", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter("facility", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter(
+            "limit",
+            openapi.IN_QUERY,
+            description=f"Maximum results (default 20, at most {MAX_RESULTS})",
+            type=openapi.TYPE_INTEGER,
+        ),
+    ],
+    responses={200: ChildSearchResultSerializer(many=True)},
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def child_search(request):
+    params = request.query_params
+    q, phone = params.get("q", "").strip(), params.get("phone", "").strip()
+    if not q and not phone:
+        return Response(
+            {"error": "Provide q and/or phone"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    facility = params.get("facility")
+    if facility and not facility.isdigit():
+        return Response(
+            {"error": "facility must be an id"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = params.get("limit", "")
+    limit = int(limit) if limit.isdigit() else 20
+    children = search_children(q, phone, facility and int(facility), limit)
+    serializer = ChildSearchResultSerializer(children, many=True)
+    return Response({"results": serializer.data})
 
 
 @swagger_auto_schema(
     method="get",
     operation_summary="Get Child Vaccinations",
-    manual_parameters=[auth_param],
+    manual_parameters=[auth_param, *list_params],
     responses={200: VaccinationSerializer(many=True)},
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def child_vaccinations(request, child_id):
-    child = get_object_or_404(Child, id=child_id)
+    child = get_object_or_404(Child.objects.only("id"), id=child_id)
     vaccinations = Vaccination.objects.filter(child=child)
-    serializer = VaccinationSerializer(vaccinations, many=True)
-    return Response(serializer.data)
+    return list_response(request, vaccinations, VaccinationSerializer)
 
 
 # -------------------------------
@@ -184,6 +441,10 @@ def child_vaccinations(request, child_id):
 @swagger_auto_schema(
     method="patch",
     operation_summary="Update Vaccination Record",
+    operation_description=(
+        "Recording a dose (status or actual_date) reschedules the child's "
+        "later doses of the same series to keep their minimum spacing."
+    ),
     manual_parameters=[auth_param],
     request_body=VaccinationSerializer,
     responses={200: VaccinationSerializer},
@@ -194,24 +455,151 @@ def update_vaccination(request, vac_id):
     vaccination = get_object_or_404(Vaccination, id=vac_id)
     serializer = VaccinationSerializer(vaccination, data=request.data, partial=True)
     if serializer.is_valid():
-        serializer.save(health_worker=request.user, last_updated=now())
+        with transaction.atomic():
+            serializer.save(health_worker=request.user, last_updated=now())
+            if {"status", "actual_date"} & set(serializer.validated_data):
+                reschedule_after([vaccination])
         return Response(serializer.data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(None)
+@swagger_auto_schema(
+    method="post",
+    operation_summary="Record Vaccinations in Bulk",
+    operation_description=(
+        "Records a clinic session's doses in one request. Each item has "
+        "`vac_id` and any of status, actual_date, batch_number, geo_lat and "
+        "geo_long. All valid items are saved in one transaction; a result is "
+        "returned for every item."
+    ),
+    manual_parameters=[auth_param],
+    request_body=VaccinationEditSerializer(many=True),
+    responses={200: "Per-item results", 400: "Payload is not a list"},
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_update_vaccinations(request):
+    if not isinstance(request.data, list):
+        return Response(
+            {"error": "Expected a list of vaccination updates"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    results = apply_vaccination_edits(request.data, request.user)
+    return Response({"results": results})
+
+
+# -------------------------------
+# Offline Sync
+# -------------------------------
+@swagger_auto_schema(
+    method="get",
+    operation_summary="Delta Sync for a Facility",
+    operation_description=(
+        "Children, vaccinations and deletions (tombstones) of the facility "
+        "changed since `token`, plus its vaccination days. Send the returned "
+        "`token` on the next call; repeat while `has_more` is true."
+    ),
+    manual_parameters=[
+        auth_param,
+        openapi.Parameter(
+            "facility", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=True
+        ),
+        openapi.Parameter(
+            "token",
+            openapi.IN_QUERY,
+            description="Token from the previous sync (omit for a full sync)",
+            type=openapi.TYPE_STRING,
+        ),
+        openapi.Parameter(
+            "limit",
+            openapi.IN_QUERY,
+            description="Maximum rows per feed",
+            type=openapi.TYPE_INTEGER,
+        ),
+    ],
+    responses={400: "Invalid facility or token"},
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    facility_id = request.query_params.get("facility", "")
+    if not facility_id.isdigit():
+        return Response(
+            {"error": "facility is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    facility = get_object_or_404(Facility, id=facility_id)
+    try:
+        rows, token, has_more = facility_changes(
+            facility.id, request.query_params.get("token"), get_limit(request)
+        )
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        {
+            "facility": facility.id,
+            "token": token,
+            "has_more": has_more,
+            "children": ChildSerializer(rows["children"], many=True).data,
+            "vaccinations": VaccinationSerializer(rows["vaccinations"], many=True).data,
+            "tombstones": TombstoneSerializer(rows["tombstones"], many=True).data,
+            "facility_days": rows["facility_days"],
+        }
+    )
+
+
+@query_budget(None)
+@swagger_auto_schema(
+    method="post",
+    operation_summary="Upload Offline Vaccination Edits",
+    operation_description=(
+        "Applies a batch of vaccination updates recorded offline. Each edit "
+        "has `vac_id`, the `last_updated` value the device last synced and the "
+        "changed fields. Edits to rows changed on the server since are "
+        "returned as conflicts with the server version."
+    ),
+    manual_parameters=[auth_param],
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "edits": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(type=openapi.TYPE_OBJECT),
+            )
+        },
+        required=["edits"],
+    ),
+    responses={200: "Per-edit results"},
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def sync_upload(request):
+    edits = request.data.get("edits") if isinstance(request.data, dict) else None
+    if not isinstance(edits, list):
+        return Response(
+            {"error": "edits must be a list"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    results = apply_vaccination_edits(edits, request.user, detect_conflicts=True)
+    return Response({"results": results})
+
+
 # -------------------------------
 # SMS Handling (Trigger Reminder)
 # -------------------------------
 @swagger_auto_schema(
     method="post",
     operation_summary="Send SMS Reminder",
+    operation_description=(
+        "Queues the reminder and returns immediately; the send_queued_sms "
+        "worker delivers it and records the outcome in the SMS log."
+    ),
     manual_parameters=[auth_param],
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={"message": openapi.Schema(type=openapi.TYPE_STRING)},
         required=[],
     ),
-    responses={201: SMSLogSerializer},
+    responses={202: OutboundMessageSerializer},
 )
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -221,11 +609,10 @@ def send_sms(request, child_id):
         "message", f"Reminder: {child.full_name} has an immunization due soon."
     )
 
-    # TODO: integrate real SMS provider (Termii, Twilio, Africa’s Talking)
-    sms_status = "sent"  # assume success for now
-
-    sms_log = SMSLog.objects.create(child=child, message=message, status=sms_status)
-    return Response(SMSLogSerializer(sms_log).data, status=status.HTTP_201_CREATED)
+    queued = enqueue(child.caregiver_contact, message, [child.id])
+    return Response(
+        OutboundMessageSerializer(queued).data, status=status.HTTP_202_ACCEPTED
+    )
 
 
 # ---------- Reporting ----------
@@ -248,23 +635,97 @@ def compliance_rate(request):
     """
     Compliance = % of given vaccines that were administered on or before scheduled_date
     """
-    total = Vaccination.objects.filter(status="given").count()
+    total, on_time = compliance_counts()
     if total == 0:
         return Response({"compliance_rate": 0})
 
-    on_time = Vaccination.objects.filter(
-        status="given", actual_date__lte=F("scheduled_date")
-    ).count()
-
     rate = round((on_time / total) * 100, 2)
     return Response({"compliance_rate": rate})
 
 
+@swagger_auto_schema(
+    method="get",
+    operation_summary="Coverage Report by Geographic Level",
+    operation_description=(
+        "Compliance, dropout and defaulter counts for every state, LGA, ward "
+        "or facility matching the filters, in one response."
+    ),
+    manual_parameters=[
+        auth_param,
+        openapi.Parameter(
+            "level",
+            openapi.IN_QUERY,
+            description="state, lga, ward or facility",
+            type=openapi.TYPE_STRING,
+            default="state",
+        ),
+        openapi.Parameter("state", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter("lga", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter("ward", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter(
+            "series",
+            openapi.IN_QUERY,
+            description="Vaccine series used for the dropout rate",
+            type=openapi.TYPE_STRING,
+            default="Penta",
+        ),
+    ],
+    responses={400: "Invalid level or unknown series"},
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def coverage(request):
+    level = request.query_params.get("level", "state")
+    if level not in COVERAGE_LEVELS:
+        return Response(
+            {"error": f"level must be one of {', '.join(COVERAGE_LEVELS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    filters = {f: request.query_params.get(f) for f in COVERAGE_FILTERS}
+    series = request.query_params.get("series", "Penta")
+    doses = get_catalogue().get_series(series)
+    if not doses:
+        return Response(
+            {"error": f"No vaccines found for series '{series}'"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(coverage_report(level, filters, doses))
+
+
 @swagger_auto_schema(
     method="get",
     operation_summary="List Defaulters",
-    manual_parameters=[auth_param],
-    responses={200: ChildSerializer(many=True)},
+    operation_description=(
+        "Children with at least one missed dose, with the missed doses listed. "
+        "Paginated by `cursor` (pass back `next_cursor`); `output=ndjson` "
+        "streams every match as one JSON object per line instead."
+    ),
+    manual_parameters=[
+        auth_param,
+        openapi.Parameter("facility", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter("lga", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter(
+            "vaccine",
+            openapi.IN_QUERY,
+            description="Missed vaccine id or series name",
+            type=openapi.TYPE_STRING,
+        ),
+        openapi.Parameter(
+            "days_overdue",
+            openapi.IN_QUERY,
+            description="Only doses scheduled at least this many days ago",
+            type=openapi.TYPE_INTEGER,
+        ),
+        openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter("limit", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter(
+            "output",
+            openapi.IN_QUERY,
+            description="json (default) or ndjson",
+            type=openapi.TYPE_STRING,
+        ),
+    ],
+    responses={200: DefaulterSerializer(many=True)},
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -272,14 +733,51 @@ def defaulters(request):
     """
     List children who missed at least one vaccine
     """
-    child_ids = (
-        Vaccination.objects.filter(status="missed")
-        .values_list("child_id", flat=True)
-        .distinct()
+    params = request.query_params
+    facility = params.get("facility")
+    if facility and not facility.isdigit():
+        return Response(
+            {"error": "facility must be an id"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    missed = Vaccination.objects.filter(status="missed")
+    if facility:
+        missed = missed.filter(child__facility_id=int(facility))
+    if params.get("lga"):
+        missed = missed.filter(child__facility__lga=params["lga"])
+    vaccine = params.get("vaccine")
+    if vaccine:
+        if vaccine.isdigit():
+            missed = missed.filter(vaccine_id=vaccine)
+        else:
+            missed = missed.filter(vaccine__series__iexact=vaccine)
+    if params.get("days_overdue", "").isdigit():
+        cutoff = datetime.date.today() - timedelta(days=int(params["days_overdue"]))
+        missed = missed.filter(scheduled_date__lte=cutoff)
+
+    children = (
+        Child.objects.filter(Exists(missed.filter(child_id=OuterRef("pk"))))
+        .prefetch_related(
+            Prefetch(
+                "vaccinations",
+                queryset=missed.select_related("vaccine").order_by("scheduled_date"),
+                to_attr="missed_doses",
+            )
+        )
+        .order_by("id")
     )
-    children = Child.objects.filter(id__in=child_ids)
-    serializer = ChildSerializer(children, many=True)
-    return Response(serializer.data)
+
+    if params.get("output") == "ndjson":
+
+        def rows():
+            for child in children.iterator(chunk_size=500):
+                data = DefaulterSerializer(child).data
+                yield json.dumps(data, cls=DjangoJSONEncoder) + "\n"
+
+        return StreamingHttpResponse(rows(), content_type="application/x-ndjson")
+
+    page, next_cursor = cursor_paginate(children, request)
+    serializer = DefaulterSerializer(page, many=True)
+    return Response({"results": serializer.data, "next_cursor": next_cursor})
 
 
 @swagger_auto_schema(
@@ -305,30 +803,21 @@ def dropout_rate(request, vaccine_name: str):
     Dropout = (children who got first dose but not last dose) / (children who got first dose) * 100
     Example: /api/reports/dropout_rate/Penta/
     """
-    # Get vaccine series
-    vaccines = VaccineMaster.objects.filter(name__icontains=vaccine_name)
+    doses = get_catalogue().get_series(vaccine_name)
 
-    if not vaccines.exists():
+    if not doses:
         return Response(
             {"error": f"No vaccines found for series '{vaccine_name}'"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # Find first and last dose in the series
-    first_dose = vaccines.aggregate(Min("dose_number"))["dose_number__min"]
-    last_dose = vaccines.aggregate(Max("dose_number"))["dose_number__max"]
-
-    if first_dose is None or last_dose is None or first_dose == last_dose:
+    if len(doses) < 2:
         return Response(
             {"error": f"Series '{vaccine_name}' does not have multiple doses"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    first_vaccine = vaccines.filter(dose_number=first_dose).first()
-    last_vaccine = vaccines.filter(dose_number=last_dose).first()
-
-    started = Vaccination.objects.filter(vaccine=first_vaccine, status="given").count()
-    completed = Vaccination.objects.filter(vaccine=last_vaccine, status="given").count()
+    started, completed = dropout_counts({doses[0].series: doses})[doses[0].series]
 
     if started == 0:
         return Response({"dropout_rate": 0})
@@ -364,24 +853,11 @@ def dropout_rate(request, vaccine_name: str):
 @permission_classes([IsAuthenticated])
 def dropout_rates(request):
     response = []
-    # Group vaccines by prefix before digits (e.g., Penta1, Penta2 → "Penta")
-    vaccine_series = set(VaccineMaster.objects.values_list("name", flat=True))
-    prefixes = {name.rstrip("0123456789") for name in vaccine_series}
-
-    for prefix in prefixes:
-        doses = VaccineMaster.objects.filter(name__icontains=prefix).order_by("order")
-        if doses.count() < 2:
-            continue
-
-        first_dose = doses.first()
-        last_dose = doses.last()
+    series = get_catalogue().multi_dose_series()
+    counts = dropout_counts(series)
 
-        first_count = Vaccination.objects.filter(
-            vaccine=first_dose, status="given"
-        ).count()
-        last_count = Vaccination.objects.filter(
-            vaccine=last_dose, status="given"
-        ).count()
+    for name, doses in series.items():
+        first_count, last_count = counts[name]
 
         dropout_rate = None
         if first_count > 0:
@@ -389,9 +865,9 @@ def dropout_rates(request):
 
         response.append(
             {
-                "vaccine_series": prefix,
-                "first_dose": first_dose.name,
-                "last_dose": last_dose.name,
+                "vaccine_series": name,
+                "first_dose": doses[0].name,
+                "last_dose": doses[-1].name,
                 "first_count": first_count,
                 "last_count": last_count,
                 "dropout_rate": dropout_rate,
@@ -399,3 +875,102 @@ def dropout_rates(request):
         )
 
     return JsonResponse(response, safe=False)
+
+
+# -------------------------------
+# Registry Export
+# -------------------------------
+@swagger_auto_schema(
+    method="get",
+    operation_summary="Export Registry (Admin Only)",
+    operation_description=(
+        "Streams every dose joined with its child, facility and vaccine. "
+        "`output` is csv (default), ndjson, parquet or arrow (Arrow IPC "
+        "stream); parquet and arrow need pyarrow on the server. `gzip=true` "
+        "compresses the stream. Dates filter on scheduled_date."
+    ),
+    manual_parameters=[
+        auth_param,
+        openapi.Parameter(
+            "output",
+            openapi.IN_QUERY,
+            type=openapi.TYPE_STRING,
+            enum=list(FORMATS),
+        ),
+        openapi.Parameter("gzip", openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter(
+            "facility",
+            openapi.IN_QUERY,
+            description="Facility id or code",
+            type=openapi.TYPE_STRING,
+        ),
+        openapi.Parameter("state", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter("lga", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter(
+            "from", openapi.IN_QUERY, type=openapi.TYPE_STRING, format="date"
+        ),
+        openapi.Parameter(
+            "to", openapi.IN_QUERY, type=openapi.TYPE_STRING, format="date"
+        ),
+    ],
+    responses={200: "Export file", 400: "Invalid parameters", 403: "Unauthorized"},
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_registry(request):
+    if request.user.role != "admin":
+        return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
+    params = request.query_params
+    fmt = params.get("output", "csv")
+    compress = params.get("gzip", "").lower() in ("1", "true", "yes")
+    try:
+        dates = {
+            key: datetime.date.fromisoformat(params[key])
+            for key in ("from", "to")
+            if params.get(key)
+        }
+        parts = stream_export(
+            fmt,
+            export_rows(
+                facility=params.get("facility"),
+                state=params.get("state"),
+                lga=params.get("lga"),
+                date_from=dates.get("from"),
+                date_to=dates.get("to"),
+            ),
+            compress=compress,
+        )
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    except ImproperlyConfigured as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(
+        parts,
+        content_type="application/gzip" if compress else FORMATS[fmt][0],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename(fmt, compress)}"'
+    )
+    return response
+
+
+# -------------------------------
+# Monitoring
+# -------------------------------
+@require_GET
+def metrics(request):
+    """
+    Prometheus metrics of the request instrumentation middleware, served
+    only to scrapers sending ``Authorization: Bearer <METRICS_TOKEN>``.
+    The client address is not checked: behind a proxy it is the proxy's.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    given = request.META.get("HTTP_AUTHORIZATION", "").encode()
+    if not token or not hmac.compare_digest(given, f"Bearer {token}".encode()):
+        response = JsonResponse({"error": "Unauthorized"}, status=401)
+        response["WWW-Authenticate"] = "Bearer"
+        return response
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
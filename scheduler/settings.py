@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.InstrumentationMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -121,6 +122,91 @@ SIMPLE_JWT = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Rows inserted per transaction by the batch child registration endpoint
+BATCH_REGISTRATION_CHUNK_SIZE = 1000
+
+# Child registration numbers leased per facility by each process (1 = no
+# leasing). A worker only touches the facility row once per block; numbers
+# left in a block when the worker exits are skipped
+UID_LEASE_BLOCK_SIZE = 10
+
+# Seconds each process keeps a facility calendar, and the cache alias
+# (shared by all workers, optional) processes fill their misses from
+FACILITY_CALENDAR_TIMEOUT = 60
+FACILITY_CALENDAR_CACHE = None
+
+# Seconds a process trusts its vaccine catalogue snapshot, and the cache
+# alias (shared by all workers, optional) holding the catalogue version it
+# then checks; without one the process reloads the catalogue instead
+CATALOGUE_TIMEOUT = 30
+CATALOGUE_CACHE = None
+
+# Serve reports from the summary tables (refresh_report_summaries) once built
+REPORTS_USE_SUMMARIES = True
+
+# Outbound SMS: provider ("fake", "twilio", "termii", "africastalking" or a
+# dotted path), its keyword options (credentials, sender, rate_limit per
+# second), worker concurrency and retry policy
+SMS_PROVIDER = "fake"
+SMS_PROVIDER_OPTIONS = {}
+SMS_MAX_IN_FLIGHT = 20
+SMS_MAX_ATTEMPTS = 5
+SMS_RETRY_BASE_SECONDS = 30
+
+# Reminder SMS text; {facility} and {doses} are filled per caregiver
+# REMINDER_TEMPLATE = "Immunization reminder from {facility}: {doses}."
+
+# Default and hard maximum page sizes for list endpoints
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# Seconds a geographic coverage report is cached
+REPORT_CACHE_TIMEOUT = 300
+
+# Request instrumentation: log requests running more SQL queries than the
+# budget (None disables; views can override it with
+# api.middleware.query_budget, which exempts the batch write endpoints),
+# add Server-Timing headers, and the bearer token scrapers must send to
+# read /metrics (empty disables the endpoint)
+REQUEST_QUERY_BUDGET = 50
+SERVER_TIMING_HEADER = True
+METRICS_TOKEN = ""
+
+# DHIS2 aggregate reporting: server and credentials for dataValueSets
+# pushes, the identifier scheme used for org units and category option
+# combos (the facility code and age band name unless overridden), and the
+# data element UID of each vaccine dose, keyed "<vaccine><dose>" e.g.
+# {"Penta1": "fClA2Erf6IO"}. Doses of unmapped vaccines are not reported.
+DHIS2_URL = ""
+DHIS2_USERNAME = ""
+DHIS2_PASSWORD = ""
+DHIS2_ID_SCHEME = "CODE"
+DHIS2_DATA_ELEMENTS = {}
+DHIS2_AGE_BAND_COMBOS = {}
+DHIS2_CHUNK_SIZE = 5000
+
+# Country calling code added to local caregiver numbers ("0803...") when
+# normalizing them to E.164 for child search
+PHONE_COUNTRY_CODE = "234"
+
+# Children born this many days apart can still be flagged as the same child
+# when their names sound alike or their caregiver numbers match
+DUPLICATE_DOB_WINDOW_DAYS = 31
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Facility calendars and the vaccine catalogue are cached in each process.
+# To share them between workers, add a cache every process can reach (see
+# "Caching" in README.md) and name it in FACILITY_CALENDAR_CACHE and
+# CATALOGUE_CACHE.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/